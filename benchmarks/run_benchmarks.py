@@ -0,0 +1,411 @@
+"""编辑和文件操作热点路径的无界面基准测试
+
+用法（在仓库根目录运行）：
+    python benchmarks/run_benchmarks.py                      运行并与 baseline.json 比较
+    python benchmarks/run_benchmarks.py --save-baseline      运行并把结果保存为新的基准
+    python benchmarks/run_benchmarks.py --lines 1000,10000 --dirs 10,100 --output result.json
+    python benchmarks/run_benchmarks.py --lines "" --dirs "" --compressed 100000   只测压缩存储
+    python benchmarks/run_benchmarks.py --lines "" --dirs "" --compressed "" --import 1000000   只测导入
+
+以 QT_QPA_PLATFORM=offscreen 创建真实的主窗口，对生成的中英混排小说（1k 到 1M 行）
+和 10 到 10k 个文件的目录测量各操作的延迟分位数和峰值内存，结果以 JSON 输出。
+另外对同一本小说比较普通 .txt 与按块压缩的 .txz（zlib、lzma）的压缩率和读写延迟，
+并测量把 GB18030、UTF-16 编码的外部文件导入为 UTF-8 的吞吐量和峰值内存。
+与基准相比 p50 和 p90 都变慢超过阈值的操作记为退化，此时以状态码 1 退出。
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from PyQt5.QtCore import QSettings  # noqa: E402
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+import core.settings  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+DEFAULT_LINES = '1000,10000,100000,1000000'
+DEFAULT_DIRS = '10,100,1000,10000'
+DEFAULT_COMPRESSED = '10000,100000'
+DEFAULT_IMPORT = '100000,1000000'
+IMPORT_ENCODINGS = ('gb18030', 'utf-16')
+# 低于这个差值（毫秒）的变化视为噪声
+NOISE_FLOOR_MS = 0.05
+WAIT_TIMEOUT = 600
+
+CJK_WORDS = ['他', '她', '说道', '忽然', '天空', '剑光', '少年', '师父', '江湖', '月色',
+             '城门', '沉默', '笑了笑', '转身', '离开', '心中', '一阵', '寒意', '远处', '传来']
+ASCII_WORDS = ['HP', 'Level', 'OK', 'GPS', 'No.7', 'Alpha', 'system', '2024', 'v1.0', 'AI']
+PUNCTUATION = ['，', '。', '！', '？', '……', '“', '”', ' ']
+
+
+def generate_line(rng):
+    words = rng.choices(CJK_WORDS, k=rng.randint(6, 24))
+    if rng.random() < 0.3:
+        words.insert(rng.randrange(len(words)), rng.choice(ASCII_WORDS))
+    words.append(rng.choice(PUNCTUATION))
+    return ''.join(words)
+
+
+def generate_novel(path, line_count, seed=0):
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8') as f:
+        for _ in range(line_count):
+            f.write(generate_line(rng) + '\n')
+
+
+def generate_directory(path, file_count, seed=0):
+    rng = random.Random(seed)
+    os.makedirs(path, exist_ok=True)
+    for i in range(file_count):
+        with open(os.path.join(path, f'第{i:05d}章.txt'), 'w', encoding='utf-8') as f:
+            f.write(generate_line(rng) + '\n')
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    position = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[position]
+
+
+def summarize(samples, peak_bytes):
+    values = sorted(sample * 1000 for sample in samples)
+    return {
+        'samples': len(values),
+        'mean_ms': round(sum(values) / len(values), 4),
+        'p50_ms': round(percentile(values, 0.50), 4),
+        'p90_ms': round(percentile(values, 0.90), 4),
+        'p99_ms': round(percentile(values, 0.99), 4),
+        'max_ms': round(values[-1], 4),
+        'peak_kb': round(peak_bytes / 1024, 1),
+    }
+
+
+class Bench:
+    """创建隔离的主窗口并执行各项测量"""
+
+    def __init__(self, work_dir, seed=0):
+        self.work_dir = work_dir
+        self.rng = random.Random(seed)
+        self.results = {}
+        self.compression = {}  # 格式和行数 -> 文件大小与压缩率
+        self.imports = {}  # 编码和行数 -> 导入吞吐量
+        self.app = QApplication.instance() or QApplication(sys.argv)
+        # 设置写到临时目录中的 ini 文件，不影响真实的用户设置
+        ini_path = os.path.join(work_dir, 'settings.ini')
+        core.settings.QSettings = lambda *args: QSettings(ini_path, QSettings.IniFormat)
+        novel_dir = os.path.join(work_dir, 'novels')
+        os.makedirs(novel_dir, exist_ok=True)
+        seed_settings = QSettings(ini_path, QSettings.IniFormat)
+        seed_settings.setValue('novel_directory', novel_dir)
+        seed_settings.setValue('show_status', True)
+        seed_settings.sync()
+
+        from ui.main_window import FakeConsole
+        self.window = FakeConsole()
+        self.window.show()
+        self.novel_dir = novel_dir
+
+    def wait_until(self, condition):
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        while not condition():
+            if time.monotonic() > deadline:
+                raise TimeoutError('等待后台操作超时')
+            self.app.processEvents()
+            time.sleep(0.0005)
+
+    def drain(self, worker):
+        """等待后台线程处理完已提交的所有请求"""
+        done = []
+        worker.submit('bench_drain', lambda: None, callback=lambda request: done.append(True))
+        self.wait_until(lambda: done)
+
+    def drain_all(self):
+        self.drain(self.window.io_worker)
+        self.drain(self.window.index_worker)
+
+    def measure(self, name, operation, count, setup=None):
+        """执行 count 次 operation 记录延迟，再单独执行一次记录峰值内存"""
+        samples = []
+        for _ in range(count):
+            argument = setup() if setup is not None else None
+            started = time.perf_counter()
+            operation(argument)
+            samples.append(time.perf_counter() - started)
+        # tracemalloc 本身会拖慢执行，内存单独测一次
+        argument = setup() if setup is not None else None
+        tracemalloc.start()
+        try:
+            operation(argument)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.results[name] = summarize(samples, peak)
+        self.drain_all()
+        print(f"  {name:<48} p50 {self.results[name]['p50_ms']:>10.3f} ms"
+              f"  p99 {self.results[name]['p99_ms']:>10.3f} ms"
+              f"  峰值 {self.results[name]['peak_kb']:>10.1f} KB", flush=True)
+
+    def open_file(self, filename):
+        opened = []
+        self.window.flush_editor_edits()
+        self.window.file_manager.open_file(filename, lambda error: opened.append(error))
+        self.wait_until(lambda: opened)
+        if opened[0] is not None:
+            raise opened[0]
+
+    def show_content(self):
+        self.window.show_current_content()
+        self.wait_until(lambda: not self.window._editor_loading)
+
+    def run_novel(self, line_count, samples):
+        window = self.window
+        filename = f'novel_{line_count}.txt'
+        print(f"生成 {line_count} 行的小说…", flush=True)
+        generate_novel(os.path.join(self.novel_dir, filename), line_count, seed=line_count)
+        window._reset_search_index(self.novel_dir)
+        self.drain_all()
+        tag = f'[lines={line_count}]'
+        open_count = max(1, min(samples, 5))
+
+        def total():
+            return window.file_manager.document.line_count
+
+        def evict():
+            # 每次都从磁盘打开，不能从文档缓存中取回上一次打开的文档
+            manager = window.file_manager
+            manager.close_file(save=False)
+            entry = manager.cache.pop(os.path.join(manager.novel_dir, filename))
+            if entry is not None:
+                manager._release(entry, save=False)
+            self.drain_all()
+
+        self.measure(f'open_file{tag}', lambda _: self.open_file(filename), open_count,
+                     setup=evict)
+
+        self.measure(f'show_current_content{tag}', lambda _: self.show_content(), open_count)
+        self.measure(f'move_to_line{tag}', window.move_to_line, samples,
+                     setup=lambda: self.rng.randrange(total()))
+
+        def append_line(text):
+            window.current_line_number = -1
+            window.update_file_content(text)
+
+        def edit_line(arguments):
+            window.current_line_number, text = arguments
+            window.update_file_content(text)
+
+        self.measure(f'update_file_content[append]{tag}', append_line, samples,
+                     setup=lambda: generate_line(self.rng))
+        self.measure(f'update_file_content[edit]{tag}', edit_line, samples,
+                     setup=lambda: (self.rng.randrange(total()), generate_line(self.rng)))
+        self.measure(f'undo_last_input{tag}', lambda _: window.undo_last_input(), samples)
+        window.file_manager.close_file(save=False)
+        self.drain_all()
+        os.remove(os.path.join(self.novel_dir, filename))
+
+    def run_directory(self, file_count, samples):
+        from core.file_manager import FileManager
+        path = os.path.join(self.work_dir, f'dir_{file_count}')
+        print(f"生成 {file_count} 个文件的目录…", flush=True)
+        generate_directory(path, file_count, seed=file_count)
+        manager = FileManager(self.window.settings)
+        manager.novel_dir = path
+        self.measure(f'FileManager.list_files[files={file_count}]',
+                     lambda _: manager.list_files(), max(1, min(samples, 20)))
+        shutil.rmtree(path, ignore_errors=True)
+
+    def run_compressed(self, line_count, samples):
+        """同一本小说分别存为 .txt 和 .txz（zlib、lzma），比较大小和读写延迟"""
+        from core.compressed_file import create_compressed_from, CODECS
+        from core.document import Document
+        from core.file_manager import FileManager
+        from core.line_index import LineIndex, FileLines
+        path = os.path.join(self.work_dir, f'compressed_{line_count}')
+        os.makedirs(path, exist_ok=True)
+        print(f"生成 {line_count} 行的小说并压缩…", flush=True)
+        plain_path = os.path.join(path, 'novel.txt')
+        generate_novel(plain_path, line_count, seed=line_count)
+        plain_bytes = os.path.getsize(plain_path)
+        names = {'txt': 'novel.txt'}
+        for codec in CODECS:
+            names[codec] = f'novel_{codec}.txz'
+            source = Document(FileLines(plain_path, LineIndex.build(plain_path)))
+            started = time.perf_counter()
+            create_compressed_from(source.snapshot(), os.path.join(path, names[codec]), codec)
+            elapsed = time.perf_counter() - started
+            source.close()
+            compressed_bytes = os.path.getsize(os.path.join(path, names[codec]))
+            self.compression[f'{codec}[lines={line_count}]'] = {
+                'plain_bytes': plain_bytes,
+                'compressed_bytes': compressed_bytes,
+                'ratio': round(compressed_bytes / plain_bytes, 4),
+                'compress_mb_per_s': round(plain_bytes / 1024 / 1024 / elapsed, 2),
+            }
+            print(f"  {codec:<5} {plain_bytes / 1024:>10.0f} KB -> {compressed_bytes / 1024:>10.0f} KB"
+                  f"  ({compressed_bytes / plain_bytes:.1%})", flush=True)
+
+        manager = FileManager(self.window.settings)
+        manager.novel_dir = path
+        for kind, name in names.items():
+            tag = f'[format={kind},lines={line_count}]'
+            self.measure(f'open_file{tag}', lambda _: manager.open_file(name), max(1, min(samples, 5)),
+                         setup=lambda: manager.close_file(save=False))
+            manager.open_file(name)
+            document = manager.document
+            self.measure(f'read_line[random]{tag}', document.get_line, samples,
+                         setup=lambda: self.rng.randrange(document.line_count))
+
+            def read_tail(lines):
+                # 新的副本没有缓存，读最后一行要从磁盘取（压缩文件要解压最后一块）
+                try:
+                    return lines[len(lines) - 1]
+                finally:
+                    lines.close()
+
+            self.measure(f'read_tail{tag}', read_tail, samples,
+                         setup=lambda: document.original.clone())
+
+            def save_edit(arguments):
+                line_number, text = arguments
+                document.set_line(line_number, text)
+                manager.save_document(force=True)
+
+            self.measure(f'save[edit]{tag}', save_edit, max(1, min(samples, 50)),
+                         setup=lambda: (self.rng.randrange(document.line_count), generate_line(self.rng)))
+            manager.close_file(save=False)
+        shutil.rmtree(path, ignore_errors=True)
+
+    def run_import(self, line_count, samples):
+        """把同一本小说存成不同编码的外部文件，测量导入为 UTF-8 的耗时、吞吐量和峰值内存"""
+        from core.text_import import import_text
+        path = os.path.join(self.work_dir, f'import_{line_count}')
+        os.makedirs(path, exist_ok=True)
+        print(f"生成 {line_count} 行的外部文件…", flush=True)
+        plain_path = os.path.join(path, 'novel.txt')
+        generate_novel(plain_path, line_count, seed=line_count)
+        target = os.path.join(path, 'imported.txt')
+        for encoding in IMPORT_ENCODINGS:
+            source = os.path.join(path, f'novel_{encoding}.txt')
+            with open(plain_path, 'r', encoding='utf-8') as f, open(source, 'w', encoding=encoding) as out:
+                shutil.copyfileobj(f, out)
+            tag = f'[encoding={encoding},lines={line_count}]'
+            imported = []
+            self.measure(f'import_text{tag}', lambda _: imported.append(import_text(source, target)),
+                         max(1, min(samples, 5)))
+            mb_per_s = sorted(result.mb_per_s for result in imported)[len(imported) // 2]
+            self.imports[tag[1:-1]] = {
+                'source_bytes': os.path.getsize(source),
+                'detected': imported[-1].encoding,
+                'mb_per_s': round(mb_per_s, 2),
+            }
+            print(f"  {encoding:<8} 识别为 {imported[-1].encoding:<8} {mb_per_s:>8.1f} MB/s", flush=True)
+        shutil.rmtree(path, ignore_errors=True)
+
+    def close(self):
+        self.window.close()
+        self.app.processEvents()
+
+
+def compare(results, baseline, threshold):
+    """返回退化的操作列表 [(名称, 基准 p50, 当前 p50)]"""
+    regressions = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if previous is None:
+            print(f"  新增    {name}")
+            continue
+        slower = all(current[key] > previous[key] * (1 + threshold) and
+                     current[key] - previous[key] > NOISE_FLOOR_MS
+                     for key in ('p50_ms', 'p90_ms'))
+        change = (current['p50_ms'] / previous['p50_ms'] - 1) * 100 if previous['p50_ms'] else 0.0
+        status = '退化' if slower else '正常'
+        print(f"  {status}    {name:<48} p50 {previous['p50_ms']:.3f} -> "
+              f"{current['p50_ms']:.3f} ms ({change:+.1f}%)")
+        if slower:
+            regressions.append((name, previous['p50_ms'], current['p50_ms']))
+    return regressions
+
+
+def parse_counts(text):
+    return [int(part) for part in text.split(',') if part.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='编辑和文件操作的无界面基准测试')
+    parser.add_argument('--lines', default=DEFAULT_LINES, help='小说行数，逗号分隔')
+    parser.add_argument('--dirs', default=DEFAULT_DIRS, help='目录中的文件数，逗号分隔')
+    parser.add_argument('--compressed', default=DEFAULT_COMPRESSED,
+                        help='比较 .txt 与压缩存储时的小说行数，逗号分隔')
+    parser.add_argument('--import', dest='imports', default=DEFAULT_IMPORT,
+                        help='测量导入外部编码文件时的小说行数，逗号分隔')
+    parser.add_argument('--samples', type=int, default=200, help='每项操作的采样次数')
+    parser.add_argument('--output', help='把结果写入这个 JSON 文件')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='用于比较的基准结果')
+    parser.add_argument('--save-baseline', action='store_true', help='把本次结果保存为基准')
+    parser.add_argument('--threshold', type=float, default=0.2, help='判为退化的变慢比例')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='cmd_writer_bench_')
+    try:
+        bench = Bench(work_dir)
+        try:
+            for line_count in parse_counts(args.lines):
+                bench.run_novel(line_count, args.samples)
+            for file_count in parse_counts(args.dirs):
+                bench.run_directory(file_count, args.samples)
+            for line_count in parse_counts(args.compressed):
+                bench.run_compressed(line_count, args.samples)
+            for line_count in parse_counts(args.imports):
+                bench.run_import(line_count, args.samples)
+        finally:
+            bench.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'results': bench.results,
+        'compression': bench.compression,
+        'import': bench.imports,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"已保存基准: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("没有基准结果，使用 --save-baseline 保存本次结果")
+        return 0
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    print(f"与基准比较（阈值 {args.threshold:.0%}）:")
+    regressions = compare(bench.results, baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} 项操作退化")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,365 @@
+import lzma
+import os
+import struct
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+COMPRESSED_SUFFIX = '.txz'
+MAGIC = b'CWZ1'
+# 头部：魔数、压缩方式、块索引的偏移和块数
+HEADER = struct.Struct('<4sB3xQQ')
+# 块索引中每块的 (数据偏移, 压缩后长度, 行数, 原始字节数)
+ENTRY_FIELDS = 4
+# 每块原始文本的大致字节数，块总是在行边界结束
+BLOCK_BYTES = 64 * 1024
+# 每个实例缓存的已解压块数
+CACHE_BLOCKS = 8
+# 失效的块超过这个大小且超过有效数据时，写回时整体重写一次
+COMPACT_MIN_BYTES = 1024 * 1024
+
+CODEC_ZLIB = 'zlib'
+CODEC_LZMA = 'lzma'
+CODECS = {
+    CODEC_ZLIB: (1, lambda data: zlib.compress(data, 6), zlib.decompress),
+    CODEC_LZMA: (2, lambda data: lzma.compress(data, preset=6), lzma.decompress),
+}
+_CODEC_NAMES = {codec_id: name for name, (codec_id, _, _) in CODECS.items()}
+
+
+def is_compressed(path):
+    return path.endswith(COMPRESSED_SUFFIX)
+
+
+def create_compressed(file_path, codec=CODEC_ZLIB):
+    """创建一个空的压缩文件"""
+    with open(file_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, CODECS[codec][0], HEADER.size, 0))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def create_compressed_from(snapshot, file_path, codec=CODEC_ZLIB):
+    """把文档快照逐批压缩写成新的压缩文件，内存占用与文件大小无关"""
+    try:
+        with open(file_path + '.tmp', 'wb') as f:
+            f.write(HEADER.pack(MAGIC, CODECS[codec][0], 0, 0))
+            entries = _write_blocks(f, snapshot.iter_lines(), codec)
+            _finish_file(f, codec, entries)
+        os.replace(file_path + '.tmp', file_path)
+    finally:
+        snapshot.close()
+
+
+def _write_blocks(f, lines, codec):
+    """把 lines 按 BLOCK_BYTES 切块压缩后写在 f 的当前位置，返回块索引条目"""
+    compress = CODECS[codec][1]
+    entries = array('Q')
+    batch = []
+    size = 0
+
+    def flush():
+        raw = b''.join(batch)
+        data = compress(raw)
+        entries.extend((f.tell(), len(data), len(batch), len(raw)))
+        f.write(data)
+
+    for line in lines:
+        raw = (line + '\n').encode('utf-8')
+        batch.append(raw)
+        size += len(raw)
+        if size >= BLOCK_BYTES:
+            flush()
+            batch = []
+            size = 0
+    if batch:
+        flush()
+    return entries
+
+
+def _finish_file(f, codec, entries):
+    """在文件末尾写出块索引并更新头部，之后的读取都以新的索引为准"""
+    f.seek(0, os.SEEK_END)
+    index_offset = f.tell()
+    entries.tofile(f)
+    f.flush()
+    os.fsync(f.fileno())
+    f.seek(0)
+    f.write(HEADER.pack(MAGIC, CODECS[codec][0], index_offset, len(entries) // ENTRY_FIELDS))
+    f.flush()
+    os.fsync(f.fileno())
+
+
+class CompressedLines:
+    """按块压缩存储的文本文件，作为只读的行序列访问
+
+    文件依次为头部、各自独立压缩的数据块和块索引，头部指向最新的块索引。
+    取某一行只需在各块的起始行上二分查找，解压这一块即可，最近用过的块
+    保留在缓存中；读最后几行只解压最后一块。接口与 FileLines 相同，
+    Document 可以直接把它作为原始缓冲区。
+    """
+
+    def __init__(self, file_path, codec, entries):
+        self.file_path = file_path
+        self.codec = codec
+        self.entries = entries
+        self._decompress = CODECS[codec][2]
+        self._starts = array('Q')
+        total = 0
+        for number in range(len(entries) // ENTRY_FIELDS):
+            self._starts.append(total)
+            total += entries[number * ENTRY_FIELDS + 2]
+        self._count = total
+        self._file = None
+        self._cache = OrderedDict()  # 块编号 -> 解压后的行列表
+
+    @classmethod
+    def load(cls, file_path):
+        """只读取头部和块索引，不解压任何数据块"""
+        with open(file_path, 'rb') as f:
+            magic, codec_id, index_offset, block_count = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or codec_id not in _CODEC_NAMES:
+                raise ValueError(f"不是有效的压缩文件: {os.path.basename(file_path)}")
+            f.seek(index_offset)
+            entries = array('Q')
+            entries.fromfile(f, block_count * ENTRY_FIELDS)
+        return cls(file_path, _CODEC_NAMES[codec_id], entries)
+
+    @classmethod
+    def empty(cls, file_path, codec=CODEC_ZLIB):
+        return cls(file_path, codec, array('Q'))
+
+    @property
+    def block_count(self):
+        return len(self._starts)
+
+    @property
+    def data_bytes(self):
+        """有效数据块压缩后的总字节数"""
+        return sum(self.entries[1::ENTRY_FIELDS])
+
+    @property
+    def raw_bytes(self):
+        return sum(self.entries[3::ENTRY_FIELDS])
+
+    def unit_span(self, number):
+        """第 number 块在序列中的 (起始行, 行数)"""
+        return self._starts[number], self.entries[number * ENTRY_FIELDS + 2]
+
+    def units_within(self, start, stop):
+        """完整落在 [start, stop) 行之内的块编号"""
+        number = bisect_left(self._starts, start)
+        while number < self.block_count and sum(self.unit_span(number)) <= stop:
+            yield number
+            number += 1
+
+    def read_block_data(self, number):
+        """第 number 块压缩后的原始字节，重写文件时原样复制"""
+        offset, length = self.entries[number * ENTRY_FIELDS:number * ENTRY_FIELDS + 2]
+        return self._read(offset, length)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, _ = item.indices(len(self))
+            return self.read_range(start, stop)
+        if item < 0 or item >= self._count:
+            raise IndexError(f"行号超出范围: {item}")
+        number = bisect_right(self._starts, item) - 1
+        return self._block(number)[item - self._starts[number]]
+
+    def read_range(self, start, stop):
+        lines = []
+        number = bisect_right(self._starts, start) - 1
+        while start < stop and number < self.block_count:
+            block_start = self._starts[number]
+            block_stop = min(stop, block_start + self.entries[number * ENTRY_FIELDS + 2])
+            if start < block_stop:
+                lines.extend(self._block(number)[start - block_start:block_stop - block_start])
+                start = block_stop
+            number += 1
+        return lines
+
+    def find_lines(self, text, start=0, stop=None):
+        """逐块解压查找包含 text 的行号，同一时间只解压一块"""
+        if stop is None or stop > self._count:
+            stop = self._count
+        found = []
+        for number in range(self.block_count):
+            block_start, block_lines = self.unit_span(number)
+            if block_start + block_lines <= start or block_start >= stop:
+                continue
+            lines = self._block(number)
+            first = max(start, block_start)
+            last = min(stop, block_start + block_lines)
+            found.extend(line_number for line_number in range(first, last)
+                         if text in lines[line_number - block_start])
+        return found
+
+    def clone(self):
+        """共享块索引但使用独立文件句柄和缓存的副本"""
+        return CompressedLines(self.file_path, self.codec, self.entries)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._cache.clear()
+
+    def _block(self, number):
+        lines = self._cache.get(number)
+        if lines is not None:
+            self._cache.move_to_end(number)
+            return lines
+        data = self._decompress(self.read_block_data(number))
+        lines = data.decode('utf-8').split('\n')
+        lines.pop()  # 每块都以换行符结尾
+        self._cache[number] = lines
+        if len(self._cache) > CACHE_BLOCKS:
+            self._cache.popitem(last=False)
+        return lines
+
+    def _read(self, offset, length):
+        if self._file is None:
+            self._file = open(self.file_path, 'rb')
+        self._file.seek(offset)
+        return self._file.read(length)
+
+
+class CompressedWriteJob:
+    """把压缩文件文档的快照写回磁盘，接口与 SnapshotWriteJob 相同
+
+    仍原样保留的块不解压也不重新压缩；被编辑过的块和新增的内容压缩成新块，
+    连同新的块索引追加到文件末尾，replace() 时才改写头部指向新索引。
+    不足 BLOCK_BYTES 的块与相邻的新内容（或同样不足的块）一起重新压缩，
+    在末尾追加的行和最后一块合成一块，不会每次保存都多出一个小块。
+    旧块留在文件中，失效的数据太多时改为写一个新文件整体替换；
+    放弃的任务会截掉自己追加的数据。
+    """
+
+    def __init__(self, file_path, snapshot, edit_count):
+        self.file_path = file_path
+        self.snapshot = snapshot
+        self.edit_count = edit_count
+        self.codec = snapshot.original.codec
+        self.entries = None
+        self.temp_path = None
+        self._index_offset = None
+        self._append_offset = None  # 追加写入前的文件大小
+        self._end_offset = None  # 追加写入后的文件大小
+
+    def run(self):
+        original = self.snapshot.original
+        try:
+            segments = self._plan()
+            file_size = os.path.getsize(self.file_path)
+            kept = sum(original.entries[number * ENTRY_FIELDS + 1]
+                       for _, _, number in segments if number is not None)
+            garbage = file_size - HEADER.size - kept
+            if garbage > max(COMPACT_MIN_BYTES, kept):
+                self.temp_path = self.file_path + '.tmp'
+                f = open(self.temp_path, 'wb')
+                f.write(HEADER.pack(MAGIC, CODECS[self.codec][0], 0, 0))
+            else:
+                f = open(self.file_path, 'r+b')
+                self._append_offset = f.seek(0, os.SEEK_END)
+            with f:
+                entries = array('Q')
+                for start, stop, number in segments:
+                    if number is None:
+                        entries.extend(_write_blocks(f, self.snapshot.iter_lines(start, stop),
+                                                     self.codec))
+                    elif self.temp_path is not None:
+                        data = original.read_block_data(number)
+                        block = number * ENTRY_FIELDS
+                        entries.extend((f.tell(), len(data)) + tuple(original.entries[block + 2:block + 4]))
+                        f.write(data)
+                    else:
+                        entries.extend(original.entries[number * ENTRY_FIELDS:(number + 1) * ENTRY_FIELDS])
+                self.entries = entries
+                if self.temp_path is not None:
+                    _finish_file(f, self.codec, entries)
+                else:
+                    self._index_offset = f.tell()
+                    entries.tofile(f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                    self._end_offset = f.tell()
+        except Exception:
+            self.discard()
+            raise
+        finally:
+            self.snapshot.close()
+
+    def _plan(self):
+        """在 split_by_units() 的基础上把不足 BLOCK_BYTES 的块并入相邻要重新压缩的内容"""
+        plan = []
+        for start, stop, number in self.snapshot.split_by_units():
+            if plan and self._joins(plan[-1][2], number):
+                plan[-1] = (plan[-1][0], stop, None)
+            else:
+                plan.append((start, stop, number))
+        return plan
+
+    def _joins(self, previous, number):
+        """块 number（None 表示要重新压缩的行）能否与前一段合成一块重新压缩"""
+        entries = self.snapshot.original.entries
+        if number is None:
+            # 新内容接在未满的块后面时与它一起压缩
+            return previous is None or entries[previous * ENTRY_FIELDS + 3] < BLOCK_BYTES
+        raw_bytes = entries[number * ENTRY_FIELDS + 3]
+        if raw_bytes >= BLOCK_BYTES:
+            return False
+        # 并入要重新压缩的内容，或与前一个未满的块合并后仍不超过 BLOCK_BYTES
+        return previous is None or entries[previous * ENTRY_FIELDS + 3] + raw_bytes <= BLOCK_BYTES
+
+    def replace(self):
+        """让文件指向新的块索引（或用整体重写的新文件替换原文件）"""
+        if self.temp_path is not None:
+            os.replace(self.temp_path, self.file_path)
+            self.temp_path = None
+            return
+        with open(self.file_path, 'r+b') as f:
+            f.write(HEADER.pack(MAGIC, CODECS[self.codec][0], self._index_offset,
+                                len(self.entries) // ENTRY_FIELDS))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def open_lines(self):
+        return CompressedLines(self.file_path, self.codec, self.entries)
+
+    def fallback_lines(self, lines):
+        """替换完成前和替换失败时整体重写的内容在临时文件中；追加写入的块在原文件中，照常读取"""
+        if self.temp_path is None:
+            return lines
+        return CompressedLines(self.temp_path, self.codec, self.entries)
+
+    def discard(self):
+        if self.temp_path and os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+        self.temp_path = None
+        if self._append_offset is not None:
+            self._truncate_appended()
+            self._append_offset = None
+
+    def _truncate_appended(self):
+        """截掉本任务追加的块和索引
+
+        在 I/O 线程中按提交顺序执行。之后的任务已经在后面追加了数据，
+        或者头部已经指向这段数据时不截断，留到下次整体重写时清理。
+        """
+        try:
+            with open(self.file_path, 'r+b') as f:
+                size = f.seek(0, os.SEEK_END)
+                if self._end_offset is not None and size != self._end_offset:
+                    return
+                f.seek(0)
+                _, _, index_offset, block_count = HEADER.unpack(f.read(HEADER.size))
+                if index_offset + block_count * ENTRY_FIELDS * 8 > self._append_offset:
+                    return
+                f.truncate(self._append_offset)
+        except (OSError, struct.error):
+            pass
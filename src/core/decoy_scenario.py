@@ -0,0 +1,173 @@
+import random
+from datetime import datetime, timedelta
+from itertools import islice
+
+# 组件列表，大小直接以数值（MB）保存
+COMPONENTS = [
+    ('System Components', [
+        ('msvcrt.dll', 2.1), ('ntdll.dll', 4.8),
+        ('kernel32.dll', 3.2), ('user32.dll', 2.8),
+        ('shell32.dll', 5.7), ('advapi32.dll', 1.9),
+        ('gdi32.dll', 2.4), ('oleaut32.dll', 1.8)
+    ]),
+    ('Device Drivers', [
+        ('nvlddmkm.sys', 185.4), ('USBXHCI.SYS', 12.8),
+        ('ACPI.sys', 8.7), ('volmgr.sys', 4.2),
+        ('tcpip.sys', 15.6), ('ndis.sys', 9.9),
+        ('disk.sys', 6.4), ('storahci.sys', 7.8)
+    ]),
+    ('Security Updates', [
+        ('KB5032189.exe', 248.6), ('KB5032190.exe', 156.3),
+        ('KB5032192.exe', 324.1), ('SecurityUpdate.exe', 89.7),
+        ('CriticalUpdate.exe', 167.2)
+    ])
+]
+
+SYSTEM_INFO = [
+    "[INFO] Windows Version: Windows 10 Pro 21H2",
+    "[INFO] System Architecture: x64",
+    "[INFO] Processor: Intel(R) Core(TM) i7-10700K",
+    "[INFO] Memory: 16.0 GB RAM",
+    None,  # 系统盘剩余空间每轮随机生成
+    "[INFO] Network Adapter: Intel(R) Wi-Fi 6 AX201 160MHz"
+]
+
+CLEANUP_TASKS = [
+    "[INFO] Finalizing system updates...",
+    "[INFO] Cleaning up temporary files...",
+    "[INFO] Updating system registry...",
+    "[INFO] Verifying system integrity...",
+    "[SUCCESS] System integrity check passed",
+    "[SUCCESS] All updates have been installed successfully",
+    "[INFO] System is up to date and secure"
+]
+
+# 预先生成所有进度条
+PROGRESS_STEPS = range(0, 101, 2)
+PROGRESS_BARS = {p: '█' * (p // 5) + '░' * (20 - p // 5) for p in PROGRESS_STEPS}
+
+
+def format_eta(eta_seconds):
+    if eta_seconds < 60:
+        return f"{eta_seconds} seconds"
+    elif eta_seconds < 3600:
+        return f"{eta_seconds // 60} minutes {eta_seconds % 60} seconds"
+    else:
+        hours = eta_seconds // 3600
+        minutes = (eta_seconds % 3600) // 60
+        return f"{hours} hours {minutes} minutes"
+
+
+class DecoyScenario:
+    """伪装下载日志的生成器
+
+    events() 按顺序产生 (距上一行的秒数, 文本)，本身不做任何等待，
+    由调用方按延迟调度。时间戳使用 start_time 加上虚拟流逝时间，
+    因此相同的 seed 和 start_time 总会得到完全相同的输出。
+    """
+
+    def __init__(self, seed=None, start_time=None, base_speed=5.0):
+        self.rng = random.Random(seed)
+        self.start_time = start_time or datetime.now()
+        self.base_speed = base_speed  # 基础下载速度（MB/s）
+        self.elapsed = 0.0  # 虚拟流逝时间（秒）
+        self._pending_delay = 0.0
+
+    def take(self, count):
+        """取出前 count 个事件，便于测试和基准测试"""
+        return list(islice(self.events(), count))
+
+    def skip(self, seconds):
+        """虚拟时钟前移 seconds 秒而不产生输出，用于长时间暂停后对齐时间戳"""
+        self.elapsed += seconds
+
+    def events(self):
+        """无限循环产生日志事件"""
+        for item in self._cycles():
+            if isinstance(item, float):
+                self._pending_delay += item
+                continue
+            delay, self._pending_delay = self._pending_delay, 0.0
+            self.elapsed += delay
+            yield delay, item
+
+    def _cycles(self):
+        # 产生的数值表示等待的秒数，字符串表示一行输出
+        while True:
+            yield from self._system_info()
+            for category, file_list in COMPONENTS:
+                yield from self._category(category, file_list)
+            yield from self._cleanup_tasks()
+
+            # 添加循环提示
+            yield "\n[INFO] ===================================="
+            yield "[INFO] Starting next update cycle..."
+            yield "[INFO] ====================================\n"
+            yield 2.0  # 在开始新的循环前暂停2秒
+
+    def _speed(self):
+        speed = self.base_speed + self.rng.uniform(-0.5, 0.5)
+        if self.rng.random() < 0.1:  # 10%概率发生较大波动
+            speed *= self.rng.uniform(0.5, 1.5)
+        return speed
+
+    def _system_info(self):
+        yield "[INFO] System Update Service Started"
+        yield "[INFO] Initializing update components..."
+        yield 1.0
+        for info in SYSTEM_INFO:
+            if info is None:
+                info = f"[INFO] System Drive: C:\\ ({self.rng.randint(50, 200)} GB free of 512 GB)"
+            yield info
+            yield 0.2
+
+    def _category(self, category, file_list):
+        yield f"\n[INFO] Processing {category}..."
+        yield f"[INFO] Found {len(file_list)} components to update"
+        yield 1.0
+        for file, size in file_list:
+            yield from self._file(file, size)
+        yield f"[SUCCESS] {category} processing completed"
+        yield "[INFO] Verifying system stability..."
+        yield 1.0
+        yield f"[SUCCESS] System stable after {category} update\n"
+
+    def _file(self, file, size):
+        size_text = f"{size} MB"
+        yield f"[INFO] Verifying: {file}"
+        yield f"[INFO] Component size: {size_text}"
+        yield 0.5
+
+        if self.rng.random() < 0.2:  # 20%概率需要重试
+            yield f"[WARNING] Connection timeout while downloading {file}"
+            yield "[INFO] Retrying in 3 seconds..."
+            yield 3.0
+
+        for percentage in PROGRESS_STEPS:
+            progress = PROGRESS_BARS[percentage]
+            speed = self._speed()
+            if percentage < 100:
+                remaining = size * (100 - percentage) / 100
+                eta = format_eta(int(remaining / speed))
+                yield (f"\r[{self._next_timestamp()}] {file} - [{progress}] {percentage}% - "
+                       f"{speed:.1f} MB/s - ETA: {eta}")
+            else:
+                yield (f"\r[{self._next_timestamp()}] {file} - [{progress}] 100% - "
+                       f"Download Complete - Total size: {size_text}")
+            yield 0.1
+
+        yield ""
+        yield f"[INFO] Installing {file}..."
+        yield 0.3
+        yield f"[SUCCESS] Installation completed for {file}\n"
+        yield 0.5
+
+    def _next_timestamp(self):
+        """下一行输出时刻的时间戳（加上尚未计入的等待时间）"""
+        return (self.start_time +
+                timedelta(seconds=self.elapsed + self._pending_delay)).strftime('%H:%M:%S')
+
+    def _cleanup_tasks(self):
+        for task in CLEANUP_TASKS:
+            yield task
+            yield self.rng.uniform(0.5, 1.2)
@@ -0,0 +1,277 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from core.instrumentation import metrics
+from core.line_index import LineIndex, FileLines
+
+# 磁盘同步（fsync）策略
+FSYNC_ALWAYS = 'always'   # 每次写入后同步
+FSYNC_BATCH = 'batch'     # 按时间间隔批量同步
+FSYNC_ON_CLOSE = 'close'  # 只在关闭文件时同步
+FSYNC_POLICIES = (FSYNC_ALWAYS, FSYNC_BATCH, FSYNC_ON_CLOSE)
+
+
+class IORequest:
+    """一次 I/O 请求，记录排队深度、等待时间和执行时间"""
+
+    def __init__(self, name, fn, args, callback=None, queue_depth=0):
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.callback = callback
+        self.queue_depth = queue_depth
+        self.submitted_at = time.perf_counter()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+
+    def execute(self):
+        self.started_at = time.perf_counter()
+        try:
+            self.result = self.fn(*self.args)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished_at = time.perf_counter()
+
+    @property
+    def wait_ms(self):
+        return (self.started_at - self.submitted_at) * 1000
+
+    @property
+    def run_ms(self):
+        return (self.finished_at - self.started_at) * 1000
+
+    @property
+    def latency_ms(self):
+        return (self.finished_at - self.submitted_at) * 1000
+
+
+class IOStats:
+    """按请求名称汇总的 I/O 延迟统计"""
+
+    def __init__(self):
+        self._stats = {}
+
+    def record(self, request):
+        stat = self._stats.setdefault(request.name, {
+            'count': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+            'last_ms': 0.0, 'max_queue_depth': 0
+        })
+        latency = request.latency_ms
+        stat['count'] += 1
+        stat['errors'] += request.error is not None
+        stat['total_ms'] += latency
+        stat['max_ms'] = max(stat['max_ms'], latency)
+        stat['last_ms'] = latency
+        stat['max_queue_depth'] = max(stat['max_queue_depth'], request.queue_depth)
+        if metrics.enabled:
+            metrics.record(f'io.wait.{request.name}', request.wait_ms / 1000)
+            metrics.record(f'io.run.{request.name}', request.run_ms / 1000)
+
+    def snapshot(self):
+        result = {}
+        for name, stat in self._stats.items():
+            result[name] = dict(stat, avg_ms=stat['total_ms'] / stat['count'])
+        return result
+
+
+class InlineExecutor:
+    """在调用线程中立即执行请求的执行器，接口与 IOWorker 相同
+
+    没有 Qt 事件循环时（脚本、基准测试）使用；没有回调的请求出错时直接抛出异常。
+    """
+
+    def __init__(self):
+        self.stats = IOStats()
+
+    @property
+    def queue_depth(self):
+        return 0
+
+    def submit(self, name, fn, *args, callback=None):
+        request = IORequest(name, fn, args, callback)
+        request.execute()
+        self.stats.record(request)
+        if callback is not None:
+            callback(request)
+        elif request.error is not None:
+            raise request.error
+        return request
+
+
+class SnapshotWriteJob:
+    """把文档快照写入同目录临时文件的任务，可以在 I/O 线程中执行
+
+    为保证替换的原子性，临时文件在改名前总是会 fsync。
+    给出 line_index 时写完后核对文件大小，原文件的换行符与本机不同时
+    在 I/O 线程中为新文件重新建立索引，写回后的文档直接使用它。
+    """
+
+    def __init__(self, file_path, snapshot, edit_count, line_index=None):
+        self.file_path = file_path
+        self.temp_path = None
+        self.snapshot = snapshot
+        self.edit_count = edit_count
+        self.line_index = line_index
+        self._expected_bytes = line_index.total_bytes if line_index is not None else None
+        self.error = None
+
+    def run(self):
+        try:
+            fd, self.temp_path = tempfile.mkstemp(
+                suffix='.tmp', dir=os.path.dirname(self.file_path))
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                for line in self.snapshot.iter_lines():
+                    f.write(line)
+                    f.write('\n')
+                f.flush()
+                os.fsync(f.fileno())
+            # mkstemp 创建的文件权限较严格，沿用原文件的权限
+            if os.path.exists(self.file_path):
+                shutil.copymode(self.file_path, self.temp_path)
+            if (self._expected_bytes is not None and
+                    os.path.getsize(self.temp_path) != self._expected_bytes):
+                self.line_index = LineIndex.build(self.temp_path)
+        except Exception as e:
+            self.error = e
+            self.discard()
+            raise
+        finally:
+            self.snapshot.close()
+
+    def replace(self):
+        """用临时文件原子地替换目标文件"""
+        os.replace(self.temp_path, self.file_path)
+        self.temp_path = None
+
+    def open_lines(self):
+        """写回后的文件内容，在界面线程中调用（复制仍在随编辑更新的行索引）"""
+        return FileLines(self.file_path, self.line_index.copy())
+
+    def fallback_lines(self, lines):
+        """替换完成前和替换失败时写好的内容在临时文件中，读取临时文件"""
+        return FileLines(self.temp_path, lines.index)
+
+    def discard(self):
+        if self.temp_path and os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+        self.temp_path = None
+
+
+class PendingLines:
+    """写回任务替换磁盘文件期间文档使用的原始缓冲区
+
+    界面线程先让文档指向写好的新内容，I/O 线程随后才替换文件。替换完成
+    （ready 被设置）之前读取 fallback，即写回任务的临时文件，不等待 I/O 队列；
+    只有 I/O 线程正在执行替换的那一刻，读取才会在锁上等待。
+    替换失败时继续读取临时文件，stale_path 记录这个临时文件，文档下次重置或关闭后删除。
+    """
+
+    def __init__(self, lines, fallback, ready=None, lock=None):
+        self.lines = lines
+        self.fallback = fallback
+        self.ready = ready or threading.Event()
+        self.stale_path = None
+        self._clones = []  # 替换完成前创建的副本，替换时一起切换
+        self._lock = lock or threading.Lock()
+
+    def swap(self, replace, stale_path):
+        """在 I/O 线程中调用 replace() 替换文件，之后读取改为 lines；替换失败时一直读取 fallback"""
+        with self._lock:
+            try:
+                for pending in [self] + self._clones:
+                    # Windows 上打开着的临时文件无法改名，替换前先关闭
+                    if pending.fallback is not pending.lines:
+                        pending.fallback.close()
+                try:
+                    replace()
+                except Exception:
+                    for pending in [self] + self._clones:
+                        pending.lines = pending.fallback
+                    self.stale_path = stale_path
+                    raise
+            finally:
+                self.ready.set()
+                self._clones = []
+
+    def _current(self):
+        return self.lines if self.ready.is_set() else self.fallback
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __getitem__(self, item):
+        if self.ready.is_set():
+            return self.lines[item]
+        with self._lock:
+            return self._current()[item]
+
+    def __getattr__(self, name):
+        if self.ready.is_set():
+            return getattr(self.lines, name)
+        value = getattr(self.fallback, name)
+        if not callable(value):
+            return value
+
+        def call(*args, **kwargs):
+            with self._lock:
+                return getattr(self._current(), name)(*args, **kwargs)
+        return call
+
+    def clone(self):
+        with self._lock:
+            if self.ready.is_set():
+                return self.lines.clone()
+            lines = self.lines.clone()
+            fallback = lines if self.fallback is self.lines else self.fallback.clone()
+            pending = PendingLines(lines, fallback, self.ready, self._lock)
+            self._clones.append(pending)
+            return pending
+
+    def close(self):
+        with self._lock:
+            self.lines.close()
+            if self.fallback is not self.lines:
+                self.fallback.close()
+
+
+def stale_path_of(lines):
+    """替换失败后遗留、在文档不再读取后需要删除的临时文件"""
+    return lines.stale_path if isinstance(lines, PendingLines) else None
+
+
+def remove_stale_file(path):
+    if path is not None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def read_snapshot_text(snapshot):
+    """在 I/O 线程中读取文档快照的完整文本"""
+    try:
+        return snapshot.text()
+    finally:
+        snapshot.close()
+
+
+def read_snapshot_lines(snapshot, start, stop):
+    """在 I/O 线程中读取文档快照 [start, stop) 范围内的行"""
+    try:
+        return snapshot.get_lines(start, stop)
+    finally:
+        snapshot.close()
+
+
+def search_snapshot(snapshot, text):
+    """在 I/O 线程中查找文档快照中包含 text 的行号"""
+    try:
+        return snapshot.find_lines(text)
+    finally:
+        snapshot.close()
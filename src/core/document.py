@@ -0,0 +1,273 @@
+from bisect import bisect_right
+
+from core.line_index import line_byte_length
+
+# 片段所在的缓冲区
+ORIGINAL = 0
+ADDED = 1
+# 迭代时每次从缓冲区中取出的最多行数，避免一次读出整个原始文件
+ITER_BATCH_LINES = 4096
+
+
+class Document:
+    """按行组织的内存文档（行级片段表）
+
+    打开文件后原始行保存在只读的 original 缓冲区，之后所有新增或修改的行
+    只追加到 added 缓冲区，文档本身由若干片段 (缓冲区, 起始行, 行数) 拼接而成。
+    定位某一行只需在片段起始行上二分查找，编辑只需拆分/替换少量片段，
+    与文件大小无关；写回磁盘由 FileManager 单独完成。
+
+    original 可以是普通列表，也可以是按行索引读取磁盘文件的 FileLines。
+    若提供 line_index，则每次编辑都会同步更新它，使其始终描述写回后的文件布局。
+    通过 add_listener 注册的回调会在每次编辑后收到 (起始行, 旧行, 新行)。
+    """
+
+    def __init__(self, lines=None, line_index=None):
+        self.line_index = line_index
+        self.listeners = []
+        self.edit_count = 0  # 累计编辑次数，用来判断快照是否过期
+        self.reset(lines if lines is not None else [])
+
+    def reset(self, lines):
+        """用新的原始行重置文档"""
+        self._buffers = (lines, [])
+        self.added_chars = 0  # added 缓冲区中的字符总数，用来估算内存占用
+        self._pieces = []
+        if len(lines):
+            self._pieces.append([ORIGINAL, 0, len(lines)])
+        self._starts = []
+        self._line_count = 0
+        self._rebuild_starts(0)
+        self.dirty = False
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def snapshot(self):
+        """当前内容的只读快照，可以交给后台线程迭代"""
+        original = self.original
+        if hasattr(original, 'clone'):
+            original = original.clone()  # 后台线程使用独立的文件句柄
+        snapshot = Document()
+        snapshot._buffers = (original, self._buffers[ADDED])
+        snapshot._pieces = [list(piece) for piece in self._pieces]
+        snapshot._starts = list(self._starts)
+        snapshot._line_count = self._line_count
+        return snapshot
+
+    def close(self):
+        """释放 original 持有的文件句柄"""
+        if hasattr(self.original, 'close'):
+            self.original.close()
+
+    @property
+    def added_line_count(self):
+        return len(self._buffers[ADDED])
+
+    @property
+    def original(self):
+        return self._buffers[ORIGINAL]
+
+    @classmethod
+    def from_text(cls, content):
+        return cls(content.splitlines())
+
+    @property
+    def line_count(self):
+        return self._line_count
+
+    def __len__(self):
+        return self._line_count
+
+    def get_line(self, line_number):
+        """获取指定行的内容"""
+        if line_number < 0 or line_number >= self._line_count:
+            raise IndexError(f"行号超出范围: {line_number}")
+        index = bisect_right(self._starts, line_number) - 1
+        buffer, start, _ = self._pieces[index]
+        return self._buffers[buffer][start + line_number - self._starts[index]]
+
+    def iter_lines(self, start=0, stop=None):
+        """按顺序迭代 [start, stop) 范围内的行"""
+        if stop is None or stop > self._line_count:
+            stop = self._line_count
+        if start >= stop:
+            return
+        index = bisect_right(self._starts, start) - 1
+        offset = start - self._starts[index]
+        remaining = stop - start
+        while remaining > 0:
+            buffer, piece_start, count = self._pieces[index]
+            take = min(count - offset, remaining)
+            first = piece_start + offset
+            lines = self._buffers[buffer]
+            for batch_start in range(first, first + take, ITER_BATCH_LINES):
+                yield from lines[batch_start:min(batch_start + ITER_BATCH_LINES, first + take)]
+            remaining -= take
+            index += 1
+            offset = 0
+
+    def original_runs(self):
+        """原始缓冲区中仍按原顺序连续保留的各段，依次返回 (文档行号, 原始行号, 行数)"""
+        run = None
+        for (buffer, piece_start, count), doc_start in zip(self._pieces, self._starts):
+            if buffer != ORIGINAL:
+                continue
+            if run is not None and run[0] + run[2] == doc_start and run[1] + run[2] == piece_start:
+                run[2] += count
+                continue
+            if run is not None:
+                yield tuple(run)
+            run = [doc_start, piece_start, count]
+        if run is not None:
+            yield tuple(run)
+
+    def find_lines(self, text):
+        """返回包含 text 的所有行号
+
+        原始缓冲区支持 find_lines 时（如内存映射的 FileLines）直接在字节上搜索，
+        只有新增或修改过的行才逐行比较。
+        """
+        found = []
+        for (buffer, piece_start, count), doc_start in zip(self._pieces, self._starts):
+            lines = self._buffers[buffer]
+            if hasattr(lines, 'find_lines'):
+                found.extend(doc_start + hit - piece_start
+                             for hit in lines.find_lines(text, piece_start, piece_start + count))
+            else:
+                found.extend(doc_start + i for i, line in
+                             enumerate(lines[piece_start:piece_start + count]) if text in line)
+        return found
+
+    def split_by_units(self):
+        """按原始缓冲区的存储单元把文档分段，用于只重写被编辑过的单元
+
+        原始缓冲区（章节项目的分块、压缩文件的数据块等）需提供
+        units_within(start, stop) 和 unit_span(number)。返回 [(起始行, 结束行, 单元编号)]，
+        仍原样保留的单元给出编号，其余的行（被编辑过的单元和新增的内容）编号为 None。
+        """
+        original = self.original
+        segments = []
+        position = 0
+        for doc_start, original_start, count in self.original_runs():
+            for number in original.units_within(original_start, original_start + count):
+                unit_start, unit_lines = original.unit_span(number)
+                doc_unit = doc_start + unit_start - original_start
+                if doc_unit > position:
+                    segments.append((position, doc_unit, None))
+                segments.append((doc_unit, doc_unit + unit_lines, number))
+                position = doc_unit + unit_lines
+        if position < self._line_count:
+            segments.append((position, self._line_count, None))
+        return segments
+
+    def get_lines(self, start=0, stop=None):
+        return list(self.iter_lines(start, stop))
+
+    def text(self):
+        """返回完整文本，非空文档以换行符结尾"""
+        if not self._line_count:
+            return ""
+        return '\n'.join(self.iter_lines()) + '\n'
+
+    def replace_lines(self, start, count, new_lines):
+        """用 new_lines 替换从 start 开始的 count 行，返回被替换掉的旧行"""
+        if start < 0 or start > self._line_count:
+            raise IndexError(f"行号超出范围: {start}")
+        count = max(0, min(count, self._line_count - start))
+        old_lines = self.get_lines(start, start + count)
+        if not count and not new_lines:
+            return old_lines
+
+        first = self._split(start)
+        last = self._split(start + count)
+        replacement = []
+        if new_lines:
+            added = self._buffers[ADDED]
+            replacement.append([ADDED, len(added), len(new_lines)])
+            added.extend(new_lines)
+            self.added_chars += sum(map(len, new_lines))
+        self._pieces[first:last] = replacement
+        if self.line_index is not None:
+            self.line_index.replace(
+                start, count, [line_byte_length(line) for line in new_lines])
+
+        # 与前一个连续的追加片段合并，避免连续输入时片段数量不断增长
+        if replacement and first > 0:
+            prev = self._pieces[first - 1]
+            if prev[0] == ADDED and prev[1] + prev[2] == replacement[0][1]:
+                prev[2] += replacement[0][2]
+                del self._pieces[first]
+                first -= 1
+
+        self._rebuild_starts(max(0, first))
+        self.dirty = True
+        self.edit_count += 1
+        for callback in self.listeners:
+            callback(start, old_lines, new_lines)
+        return old_lines
+
+    def set_line(self, line_number, text):
+        return self.replace_lines(line_number, 1, [text])
+
+    def insert_line(self, line_number, text):
+        self.replace_lines(line_number, 0, [text])
+
+    def delete_line(self, line_number):
+        return self.replace_lines(line_number, 1, [])
+
+    def append_line(self, text):
+        self.replace_lines(self._line_count, 0, [text])
+
+    def set_text(self, content, start=0, stop=None):
+        """用 content 替换 [start, stop) 范围内的行（默认整个文档），返回 content 的行数"""
+        new_lines = content.splitlines()
+        self.update_lines(start, stop, new_lines)
+        return len(new_lines)
+
+    def update_lines(self, start, stop, new_lines):
+        """用 new_lines 替换 [start, stop) 范围内的行，只替换首尾相同部分之间真正变化的行"""
+        if stop is None or stop > self._line_count:
+            stop = self._line_count
+        old_lines = self.get_lines(start, stop)
+        prefix = 0
+        limit = min(len(old_lines), len(new_lines))
+        while prefix < limit and old_lines[prefix] == new_lines[prefix]:
+            prefix += 1
+        suffix = 0
+        limit -= prefix
+        while (suffix < limit and
+               old_lines[-1 - suffix] == new_lines[-1 - suffix]):
+            suffix += 1
+        self.replace_lines(start + prefix, len(old_lines) - prefix - suffix,
+                           new_lines[prefix:len(new_lines) - suffix])
+
+    def mark_clean(self):
+        self.dirty = False
+
+    def _split(self, line_number):
+        """确保 line_number 处是片段边界，返回以该行开头的片段下标"""
+        if line_number >= self._line_count:
+            return len(self._pieces)
+        index = bisect_right(self._starts, line_number) - 1
+        offset = line_number - self._starts[index]
+        if offset == 0:
+            return index
+        buffer, start, count = self._pieces[index]
+        self._pieces[index] = [buffer, start, offset]
+        self._pieces.insert(index + 1, [buffer, start + offset, count - offset])
+        self._starts.insert(index + 1, line_number)
+        return index + 1
+
+    def _rebuild_starts(self, from_index):
+        """从 from_index 起重新计算各片段的起始行号"""
+        del self._starts[from_index:]
+        total = self._starts[-1] + self._pieces[from_index - 1][2] if from_index else 0
+        for piece in self._pieces[from_index:]:
+            self._starts.append(total)
+            total += piece[2]
+        self._line_count = total
@@ -0,0 +1,76 @@
+from collections import OrderedDict
+
+from core.undo import LINE_OVERHEAD
+
+# 行索引中每行占用的字节数（长度数组和文件行读取器各一份）
+INDEX_BYTES_PER_LINE = 16
+
+
+class OpenDocument:
+    """一个已打开文件的全部内存状态"""
+
+    __slots__ = ('file_path', 'document', 'journal', 'undo_history', 'text_stats', 'signature')
+
+    def __init__(self, file_path, document, journal=None, undo_history=None, text_stats=None):
+        self.file_path = file_path
+        self.document = document
+        self.journal = journal
+        self.undo_history = undo_history
+        self.text_stats = text_stats
+        self.signature = None  # 放入缓存时文件的大小和修改时间
+
+    @property
+    def memory_bytes(self):
+        """内存占用的估计值：新增的行、行索引和撤销历史"""
+        document = self.document
+        size = (document.added_chars * 2 + LINE_OVERHEAD * document.added_line_count +
+                INDEX_BYTES_PER_LINE * document.line_count)
+        if self.undo_history is not None:
+            size += self.undo_history.total_bytes
+        return size
+
+
+class DocumentCache:
+    """最近切换走的文档的 LRU 缓存
+
+    再次打开缓存中的文件时直接取回内存中的文档、日志和撤销历史，不读磁盘。
+    超过 max_bytes 或 max_entries 时按最久未使用的顺序淘汰，
+    淘汰的文档由调用方负责写回并释放。
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_entries=8):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # 文件路径 -> OpenDocument，最近使用的在末尾
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, file_path):
+        return file_path in self._entries
+
+    @property
+    def total_bytes(self):
+        return sum(entry.memory_bytes for entry in self._entries.values())
+
+    def put(self, entry):
+        """放入缓存，返回因此被淘汰的条目列表"""
+        self._entries[entry.file_path] = entry
+        self._entries.move_to_end(entry.file_path)
+        evicted = []
+        while len(self._entries) > self.max_entries or (
+                len(self._entries) > 1 and self.total_bytes > self.max_bytes):
+            evicted.append(self._entries.popitem(last=False)[1])
+        if entry.memory_bytes > self.max_bytes:
+            # 单个文档就超出预算时不缓存
+            evicted.append(self._entries.pop(entry.file_path))
+        return evicted
+
+    def pop(self, file_path):
+        return self._entries.pop(file_path, None)
+
+    def clear(self):
+        """清空缓存，返回所有条目"""
+        entries = list(self._entries.values())
+        self._entries.clear()
+        return entries
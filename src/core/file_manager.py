@@ -1,12 +1,63 @@
 import os
+import shutil
 from datetime import datetime
 
+from core.document import Document
+from core.line_index import LineIndex, FileLines
+from core.journal import EditJournal, file_signature
+from core.undo import UndoHistory
+from core.history_store import HistoryStore, remove_history
+from core.text_stats import TextStats, WritingSession, remove_stats
+from core.instrumentation import metrics
+from core.document_cache import OpenDocument, DocumentCache
+from core.novel_files import scan_novel_directory, NOVEL_SUFFIX, DOCUMENT_SUFFIXES
+from core.novel_project import (PROJECT_SUFFIX, ProjectLines, ProjectWriteJob, is_project,
+                                create_project, create_project_from)
+from core.compressed_file import (COMPRESSED_SUFFIX, CompressedLines, CompressedWriteJob,
+                                  is_compressed, create_compressed, create_compressed_from)
+from core.text_import import import_text, sniff_encoding, is_utf8
+from core.disk_io import (InlineExecutor, SnapshotWriteJob, PendingLines, stale_path_of,
+                          remove_stale_file, read_snapshot_text,
+                          read_snapshot_lines, search_snapshot)
+
 class FileManager:
-    def __init__(self, settings):
+    """管理当前打开的小说文件
+
+    所有磁盘读写都通过 io 执行器提交：界面中使用后台 IOWorker，
+    没有事件循环时使用 InlineExecutor 在调用线程中直接执行。
+    异步操作的结果通过回调返回，回调参数为错误对象（成功时为 None）。
+
+    切换到其他文件时，当前文件的文档、日志和撤销历史放进 DocumentCache，
+    切换回来时直接取回；被淘汰的文档先写回再释放。
+
+    章节项目（.novel 目录）与 .txt 文件一样作为一个文档打开，
+    current_file 是项目目录，写回时只重写被编辑过的分块。
+    压缩文件（.txz）按块压缩存储，读一行只解压一块，写回时只重新压缩被编辑过的块。
+    """
+
+    def __init__(self, settings, executor=None):
         self.settings = settings
         self.novel_dir = self.settings.load_novel_directory()
         self.ensure_novel_directory()
         self.current_file = None
+        self.document = None  # 当前文件的内存文档
+        self.journal = None  # 追加日志模式下当前文件的编辑日志
+        self.undo_history = None  # 当前文件的撤销历史
+        self.text_stats = None  # 当前文件的字数统计
+        self.session = WritingSession()  # 本次运行的字数增量
+        self.stats_handler = None  # 字数统计变化时的通知回调，参数为 TextStats（关闭文件时为 None）
+        self.storage_mode = self.settings.load_storage_mode()
+        self.fsync_policy = self.settings.load_fsync_policy()
+        self.io = executor or InlineExecutor()
+        self.error_handler = None  # 后台写入失败时的通知回调
+        self.file_listeners = []  # 磁盘上的文件内容变化（写回、新建、删除）后调用，参数为文件路径
+        self._loading_file = None
+        self._write_in_flight = False
+        self._write_again = False
+        self.cache = DocumentCache(self.settings.load_document_cache_memory() * 1024 * 1024)
+
+    def set_executor(self, executor):
+        self.io = executor
 
     def ensure_novel_directory(self):
         if not os.path.exists(self.novel_dir):
@@ -18,50 +69,599 @@ class FileManager:
 
     def list_files(self):
         files = []
-        for file in os.listdir(self.novel_dir):
-            file_path = os.path.join(self.novel_dir, file)
-            size = os.path.getsize(file_path)
-            modified_time = datetime.fromtimestamp(os.path.getmtime(file_path))
+        for entry in scan_novel_directory(self.novel_dir).values():
             files.append({
-                'name': file,
-                'size': size,
-                'modified': modified_time
+                'name': entry.name,
+                'size': entry.size,
+                'modified': datetime.fromtimestamp(entry.mtime)
             })
         return files
 
     def create_file(self, filename):
-        if not filename.endswith('.txt'):
-            filename += '.txt'
+        """新建并打开文件，文件名以 .novel 结尾时新建章节项目，以 .txz 结尾时新建压缩文件"""
+        if not filename.endswith(DOCUMENT_SUFFIXES):
+            filename += NOVEL_SUFFIX
         file_path = os.path.join(self.novel_dir, filename)
         if not os.path.exists(file_path):
-            with open(file_path, 'w', encoding='utf-8') as f:
-                pass
+            self._stash_current()
+            if is_project(file_path):
+                self.io.submit('create', create_project, file_path,
+                               callback=lambda request: self._on_file_written(file_path, request))
+                self.document = Document(ProjectLines.empty(file_path))
+            elif is_compressed(file_path):
+                codec = self.settings.load_compression_codec()
+                self.io.submit('create', create_compressed, file_path, codec,
+                               callback=lambda request: self._on_file_written(file_path, request))
+                self.document = Document(CompressedLines.empty(file_path, codec))
+            else:
+                self.io.submit('create', _create_empty_file, file_path,
+                               callback=lambda request: self._on_file_written(file_path, request))
+                self.document = Document(line_index=LineIndex())
             self.current_file = file_path
+            self._attach_undo_history(self._new_history_store(file_path))
+            self._attach_journal(EditJournal(file_path, self.fsync_policy))
+            # 新文件写出后以它作为历史的基准，同名文件遗留的历史随之作废
+            self.undo_history.store.rebase()
+            stats = TextStats()
+            self.document.add_listener(stats.record)
+            self._attach_text_stats(stats)
             return True, file_path
         return False, file_path
 
-    def open_file(self, filename):
-        if not filename.endswith('.txt'):
-            filename += '.txt'
+    def open_file(self, filename, callback=None):
+        if not filename.endswith(DOCUMENT_SUFFIXES):
+            filename += NOVEL_SUFFIX
         file_path = os.path.join(self.novel_dir, filename)
         if os.path.exists(file_path):
-            self.current_file = file_path
+            self.load_document(file_path, callback)
             return True
         return False
 
+    def load_document(self, file_path, callback=None, line_index=None):
+        """在 I/O 线程中建立行索引并创建文档，未修改的行按需从磁盘读取
+
+        文件在缓存中时直接切换过去，不读磁盘，callback 会立即被调用。
+        line_index 是调用方已经建好的行索引（例如导入时顺带生成的），有它时不再扫描文件。
+        """
+        self._loading_file = None
+        self._stash_current()
+        entry = self.cache.pop(file_path)
+        if entry is not None and entry.signature != _signature_or_none(file_path):
+            # 缓存期间文件被外部修改，以磁盘上的内容为准
+            self._release(entry, save=False)
+            entry = None
+        if entry is not None:
+            metrics.count('document_cache.hits')
+            self._attach(entry)
+            if callback is not None:
+                callback(None)
+            return
+        metrics.count('document_cache.misses')
+        self._loading_file = file_path
+        fsync_policy = self.fsync_policy
+        store = self._new_history_store(file_path)
+
+        def load():
+            stats = TextStats.load(file_path)
+            if is_project(file_path):
+                document = Document(ProjectLines.load(file_path))
+            elif is_compressed(file_path):
+                # 只读取块索引，行在用到时才按块解压
+                document = Document(CompressedLines.load(file_path))
+            else:
+                encoding = sniff_encoding(file_path)
+                if not is_utf8(encoding):
+                    raise ValueError(f"文件不是 UTF-8 编码（检测为 {encoding.upper()}），"
+                                     f"请用 /import 导入: {os.path.basename(file_path)}")
+                index = line_index
+                if index is None and stats is not None:
+                    # 文件未变化时统计缓存中保存的每行字节数就是行索引，不必扫描文件
+                    index = stats.line_index
+                if index is None:
+                    index = LineIndex.build(file_path)
+                document = Document(FileLines(file_path, index.copy()), index)
+            # 文件未变化时直接使用缓存的字数统计，否则扫描一遍并写入缓存
+            rebuilt = stats is None or stats.line_count != document.line_count
+            if rebuilt:
+                stats = TextStats.build(document.iter_lines())
+            if rebuilt or (document.line_index is not None and stats.line_index is None):
+                try:
+                    stats.save(file_path, document.line_index)
+                except OSError:
+                    pass
+            stats.line_index = None
+            document.add_listener(stats.record)
+            # 重放上次遗留的编辑日志，保证已经输入的内容不会丢失
+            journal = EditJournal(file_path, fsync_policy)
+            replayed = journal.replay(document)
+            if replayed:
+                document.dirty = True
+            # 磁盘上的撤销历史只预先读出最近的几条
+            recent = store.load(replayed)
+            return document, journal, stats, store, recent
+
+        self.io.submit('open', load,
+                       callback=lambda request: self._on_document_loaded(file_path, request, callback))
+
+    def _on_document_loaded(self, file_path, request, callback):
+        if self._loading_file != file_path:
+            # 加载期间又打开了其他文件
+            if request.error is None:
+                request.result[0].close()
+                request.result[3].close()
+            return
+        self._loading_file = None
+        if request.error is not None:
+            if callback is not None:
+                callback(request.error)
+            else:
+                self._report_error(request)
+            return
+        self.document, journal, stats, store, recent = request.result
+        self.current_file = file_path
+        # 撤销历史先挂上，整体写回模式下合并遗留日志时要用它记录基准
+        self._attach_undo_history(store, recent)
+        self._attach_journal(journal)
+        self._attach_text_stats(stats)
+        if callback is not None:
+            callback(None)
+
+    def _stash_current(self):
+        """把当前文件放进缓存，腾出位置打开其他文件"""
+        if self.document is None:
+            return
+        if self.journal is None and (self.document.dirty or self._write_in_flight):
+            # 整体写回模式下还有没写回的内容，直接写回并关闭，不缓存
+            self.close_file()
+            return
+        entry = self._detach()
+        entry.signature = _signature_or_none(entry.file_path)
+        if entry.journal is not None:
+            self.io.submit('journal_sync', entry.journal.sync)
+        for evicted in self.cache.put(entry):
+            metrics.count('document_cache.evictions')
+            self._release(evicted)
+
+    def _attach(self, entry):
+        """让缓存中取回的文件成为当前文件"""
+        self.current_file = entry.file_path
+        self.document = entry.document
+        self.journal = entry.journal
+        self.undo_history = entry.undo_history
+        if self.journal is not None:
+            self.document.add_listener(self._on_document_changed)
+        self._attach_text_stats(entry.text_stats)
+
+    def _detach(self):
+        """取下当前文件的全部状态，返回 OpenDocument"""
+        entry = OpenDocument(self.current_file, self.document, self.journal,
+                             self.undo_history, self.text_stats)
+        self.document.remove_listener(self._on_document_changed)
+        self.document.remove_listener(self._on_stats_changed)
+        self.current_file = None
+        self.document = None
+        self.journal = None
+        self.undo_history = None
+        self.text_stats = None
+        self._on_stats_changed()
+        self._write_in_flight = False
+        self._write_again = False
+        return entry
+
+    def _attach_undo_history(self, store, recent=()):
+        """为当前文档创建独立的撤销历史，内存中的部分受设置的上限约束"""
+        budget = self.settings.load_undo_memory_limit() * 1024 * 1024
+        self.undo_history = UndoHistory(max_bytes=budget, store=store, recent=recent)
+        self.document.add_listener(self.undo_history.record)
+
+    def _new_history_store(self, file_path):
+        return HistoryStore(file_path, self.io, error_handler=self._report_history_error)
+
+    def _report_history_error(self, error):
+        if self.error_handler is not None:
+            self.error_handler(error)
+
+    def _attach_text_stats(self, stats):
+        """挂接当前文档的字数统计，之后的编辑同时计入本次运行的增量"""
+        self.text_stats = stats
+        stats.session = self.session
+        self.document.add_listener(self._on_stats_changed)
+        self._on_stats_changed()
+
+    def _on_stats_changed(self, *edit):
+        if self.stats_handler is not None:
+            self.stats_handler(self.text_stats)
+
+    def undo(self):
+        """撤销当前文档的上一次编辑，返回增量；没有可撤销的编辑时返回 None"""
+        if self.document is None or self.undo_history is None:
+            return None
+        return self.undo_history.undo(self.document)
+
+    def redo(self):
+        """重做当前文档上一次撤销的编辑"""
+        if self.document is None or self.undo_history is None:
+            return None
+        return self.undo_history.redo(self.document)
+
+    def _attach_journal(self, journal):
+        """追加日志模式下让文档的每次编辑都写入日志"""
+        if self.storage_mode != 'journal':
+            # 整体写回模式下把遗留日志直接合并进文件
+            if journal.record_count:
+                self.save_document(force=True)
+            self.io.submit('journal_close', journal.close, True)
+            return
+        self.journal = journal
+        self.io.submit('journal_open', journal.open)
+        self.document.add_listener(self._on_document_changed)
+
+    def _on_document_changed(self, start, old_lines, new_lines):
+        self.journal.record_count += 1
+        self.io.submit('journal_append', self.journal.append, start, len(old_lines), new_lines)
+        metrics.count('journal.records')
+
+    def close_file(self, save=True):
+        """关闭当前文件；save 为 True 时在 I/O 线程中把未保存的内容写回文件"""
+        self._loading_file = None
+        if self.document is None:
+            return
+        self._release(self._detach(), save)
+
+    def close_all(self):
+        """关闭当前文件和缓存中的所有文件，未保存的内容都写回"""
+        self.close_file()
+        for entry in self.cache.clear():
+            self._release(entry)
+
+    def _release(self, entry, save=True):
+        """释放一个已取下的文件；save 为 True 时先在 I/O 线程中写回"""
+        document, journal, file_path = entry.document, entry.journal, entry.file_path
+        store = entry.undo_history.store
+        job = stats = None
+        indexed = document.line_index is not None
+        if save and (document.dirty or (journal is not None and journal.record_count)):
+            job = _write_job(file_path, document)
+            stats = entry.text_stats.copy()
+            position = store.count, store.cursor
+        stale_path = stale_path_of(document.original)
+        document.close()
+
+        def finish_close():
+            if job is not None:
+                try:
+                    job.run()
+                    job.replace()
+                except Exception:
+                    # 写回失败时日志保留在磁盘上，下次打开时会重放
+                    if journal is not None:
+                        journal.close()
+                    raise
+                store.write_base(*position)
+            if journal is not None:
+                journal.close(remove=True)
+            if stats is not None:
+                # 文档已经关闭，写回任务的行索引不会再被修改
+                stats.save(file_path, job.line_index if indexed else None)
+            remove_stale_file(stale_path)
+
+        self.io.submit('close', finish_close,
+                       callback=lambda request: self._on_file_written(file_path, request))
+        store.close()
+
+    def delete_file(self, file_path, callback=None):
+        """删除文件；删除当前文件时丢弃未保存的内容"""
+        if file_path == self.current_file:
+            self.close_file(save=False)
+        entry = self.cache.pop(file_path)
+        if entry is not None:
+            self._release(entry, save=False)
+        def on_deleted(request):
+            self._on_file_written(file_path, request)
+            if callback:
+                callback(request.error)
+
+        self.io.submit('delete', _delete_novel_file, file_path, callback=on_deleted)
+
+    def _close_source(self):
+        if self.document is not None:
+            self.document.close()
+
+    def needs_compaction(self):
+        return self.journal is not None and self.journal.record_count > 0
+
+    def compact_in_background(self):
+        """在 I/O 线程中把日志合并进文件"""
+        if not self.needs_compaction():
+            return False
+        self._submit_snapshot_write('compact')
+        return True
+
+    def _submit_snapshot_write(self, name):
+        """把当前文档快照写入临时文件，完成后文档改为读取新内容，再由 I/O 线程替换原文件"""
+        if self._write_in_flight:
+            self._write_again = True
+            return
+        with metrics.timer('file_manager.snapshot'):
+            job = _write_job(self.current_file, self.document)
+        self._write_in_flight = True
+        self._write_again = False
+        self.io.submit(name, job.run,
+                       callback=lambda request: self._on_snapshot_written(name, job, request))
+
+    def _on_snapshot_written(self, name, job, request):
+        """临时文件写好后让文档改为读取新内容，替换文件交给 I/O 线程；期间又有新编辑时放弃本次结果"""
+        if job.file_path != self.current_file:
+            self.io.submit('discard', job.discard)
+            return
+        if request.error is not None:
+            self._write_in_flight = False
+            self._report_error(request)
+            return
+        if job.edit_count != self.document.edit_count:
+            self._write_in_flight = False
+            self.io.submit('discard', job.discard)
+            metrics.count('file_manager.snapshot_discarded')
+            if self._write_again or (self.journal is None and self.document.dirty):
+                self._submit_snapshot_write(name)
+            return
+        document, journal, store = self.document, self.journal, self.undo_history.store
+        stale_path = stale_path_of(document.original)
+        with metrics.timer('file_manager.replace'):
+            self._close_source()
+            lines = self._rebase_on_disk(job)
+        position = store.count, store.cursor
+        stats = self.text_stats.copy()
+        # 行索引之后会随编辑继续变化，保存统计缓存时用此刻的副本
+        line_index = document.line_index.copy() if document.line_index is not None else None
+        records = 0
+        if journal is not None:
+            # 之后的编辑在替换完成、日志清空之后才写入日志，重新计数
+            records, journal.record_count = journal.record_count, 0
+
+        def finish_replace():
+            lines.swap(job.replace, job.temp_path)
+            remove_stale_file(stale_path)
+            store.write_base(*position)
+            if journal is not None:
+                journal.reset()
+            stats.save(job.file_path, line_index)
+
+        def on_replaced(request):
+            self._on_file_written(job.file_path, request)
+            if request.error is not None:
+                # 替换失败时磁盘上仍是原文件加日志，下次保存或合并时再试
+                if journal is not None:
+                    journal.record_count += records
+                document.dirty = True
+            if job.file_path != self.current_file:
+                return
+            self._write_in_flight = False
+            if request.error is None and (self._write_again or (self.journal is None and self.document.dirty)):
+                self._submit_snapshot_write(name)
+
+        self.io.submit('replace', finish_replace, callback=on_replaced)
+
+    def _report_error(self, request):
+        if request.error is not None and self.error_handler is not None:
+            self.error_handler(request.error)
+
+    def _on_file_written(self, file_path, request):
+        self._report_error(request)
+        self._notify_file_changed(file_path)
+
+    def _notify_file_changed(self, file_path):
+        for listener in self.file_listeners:
+            listener(file_path)
+
+    def _rebase_on_disk(self, job):
+        """让文档重新指向写回后的内容，返回等待 I/O 线程替换文件的 PendingLines
+
+        替换完成前文档从写回任务的临时文件读取，界面线程不必等待 I/O 队列。
+        """
+        if self.document.line_index is not None:
+            # 行索引在编辑时已同步更新；原文件的换行符与本机不同时写回任务已重新建立
+            self.document.line_index = job.line_index
+        # 章节项目和压缩文件中原样保留的分块（数据块）沿用已有的索引，不重新扫描
+        opened = job.open_lines()
+        lines = PendingLines(opened, job.fallback_lines(opened))
+        self.document.reset(lines)
+        return lines
+
+    def save_document(self, force=False):
+        """将内存文档写回磁盘
+
+        追加日志模式下编辑已经逐条写入日志，无需整体写回；
+        整体写回模式下在 I/O 线程中原子地写入临时文件再替换原文件。
+        """
+        if self.current_file is None or self.document is None:
+            raise ValueError("No file is currently open")
+        if self.journal is not None and not force:
+            return True
+        if not force and not self.document.dirty:
+            return False
+        self._submit_snapshot_write('save')
+        return True
+
+    def export_text(self, target_path, callback=None):
+        """在 I/O 线程中把当前文档导出为单个 .txt 文件
+
+        逐批读取行写入临时文件再替换目标文件，内存占用与文件大小无关。
+        """
+        job = SnapshotWriteJob(target_path, self.document.snapshot(), self.document.edit_count)
+
+        def export():
+            job.run()
+            job.replace()
+
+        def on_exported(request):
+            self._on_file_written(target_path, request)
+            if callback is not None:
+                callback(request.error)
+
+        self.io.submit('export', export, callback=on_exported)
+
+    def convert_to_project(self, callback=None):
+        """把当前 .txt 文件按章节切块另存为同名章节项目并打开它，原文件保留不动"""
+        project_dir = os.path.splitext(self.current_file)[0] + PROJECT_SUFFIX
+        if is_project(self.current_file) or os.path.exists(project_dir):
+            return None
+
+        def on_created(request):
+            self._on_file_written(project_dir, request)
+            if request.error is not None:
+                if callback is not None:
+                    callback(request.error)
+                return
+            self.load_document(project_dir, callback)
+
+        self.io.submit('create_project', create_project_from, self.document.snapshot(), project_dir,
+                       callback=on_created)
+        return project_dir
+
+    def convert_to_compressed(self, codec=None, callback=None):
+        """把当前文件按块压缩另存为同名 .txz 文件并打开它，原文件保留不动"""
+        target = os.path.splitext(self.current_file)[0] + COMPRESSED_SUFFIX
+        if is_compressed(self.current_file) or os.path.exists(target):
+            return None
+        codec = codec or self.settings.load_compression_codec()
+
+        def on_created(request):
+            self._on_file_written(target, request)
+            if request.error is not None:
+                if callback is not None:
+                    callback(request.error)
+                return
+            self.load_document(target, callback)
+
+        self.io.submit('create_compressed', create_compressed_from, self.document.snapshot(),
+                       target, codec, callback=on_created)
+        return target
+
+    def import_file(self, source_path, callback=None):
+        """在 I/O 线程中把外部文本文件转成 UTF-8 存入小说目录并打开它
+
+        编码根据文件开头自动检测，转码时顺带建立行索引，打开时不再扫描。
+        回调参数为 (ImportResult, 错误)；目标正是当前打开的文件时返回 None。
+        """
+        name = os.path.splitext(os.path.basename(source_path))[0]
+        target = os.path.join(self.novel_dir, name + NOVEL_SUFFIX)
+        number = 2
+        while os.path.exists(target) and not _same_file(source_path, target):
+            target = os.path.join(self.novel_dir, f'{name} ({number}){NOVEL_SUFFIX}')
+            number += 1
+        if target == self.current_file or target in self.cache:
+            return None
+
+        def on_imported(request):
+            self._on_file_written(target, request)
+            if request.error is not None:
+                if callback is not None:
+                    callback(None, request.error)
+                return
+            result = request.result
+            self.load_document(target, None if callback is None else lambda error: callback(result, error),
+                               line_index=result.index)
+
+        self.io.submit('import', import_text, source_path, target, callback=on_imported)
+        return target
+
+    def read_text(self, callback):
+        """在 I/O 线程中读取当前文档的完整文本，回调参数为 (文本, 编辑次数, 错误)"""
+        snapshot = self.document.snapshot()
+        edit_count = self.document.edit_count
+        self.io.submit('read', read_snapshot_text, snapshot,
+                       callback=lambda request: callback(request.result, edit_count, request.error))
+
+    def read_lines(self, start, stop, callback):
+        """在 I/O 线程中读取 [start, stop) 范围内的行，回调参数为 (行列表, 编辑次数, 错误)"""
+        snapshot = self.document.snapshot()
+        edit_count = self.document.edit_count
+        self.io.submit('read_lines', read_snapshot_lines, snapshot, start, stop,
+                       callback=lambda request: callback(request.result, edit_count, request.error))
+
+    def search_lines(self, text, callback):
+        """在 I/O 线程中查找包含 text 的行号，回调参数为 (行号列表, 编辑次数, 错误)"""
+        snapshot = self.document.snapshot()
+        edit_count = self.document.edit_count
+        self.io.submit('search', search_snapshot, snapshot, text,
+                       callback=lambda request: callback(request.result, edit_count, request.error))
+
+    def sync(self):
+        """把日志中尚未同步的记录写到磁盘"""
+        if self.journal is not None:
+            self.io.submit('journal_sync', self.journal.sync)
+
     def save_content(self, content):
         """保存内容到文件"""
         if self.current_file is None:
             raise ValueError("No file is currently open")
         try:
-            with open(self.current_file, 'a', encoding='utf-8') as f:
-                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                f.write(f"{content}\n")  
+            self.document.append_line(content)
+            self.save_document()
             return True
         except Exception as e:
             raise Exception(f"保存失败: {str(e)}")
 
+    def set_storage_mode(self, mode):
+        """切换保存方式：'journal' 追加日志，'rewrite' 每次整体写回"""
+        if mode == self.storage_mode:
+            return
+        self.storage_mode = mode
+        self.settings.save_storage_mode(mode)
+        # 缓存中的文件是按原来的方式打开的，全部写回后释放
+        for entry in self.cache.clear():
+            self._release(entry)
+        if self.current_file is not None:
+            # 重新打开当前文件，按新的方式挂接日志
+            file_path = self.current_file
+            self.close_file()
+            self.load_document(file_path)
+
+    def set_fsync_policy(self, policy):
+        """切换日志的磁盘同步策略：'always'、'batch' 或 'close'"""
+        self.fsync_policy = policy
+        self.settings.save_fsync_policy(policy)
+        if self.journal is not None:
+            self.journal.fsync_policy = policy
+
     def update_novel_directory(self, new_path):
         self.novel_dir = new_path
         self.settings.save_novel_directory(new_path)
         self.ensure_novel_directory()#        self.current_file = self.create_default_file()
+
+
+def _signature_or_none(file_path):
+    try:
+        return file_signature(file_path)
+    except OSError:
+        return None
+
+
+def _write_job(file_path, document):
+    if is_project(file_path):
+        return ProjectWriteJob(file_path, document.snapshot(), document.edit_count)
+    if is_compressed(file_path):
+        return CompressedWriteJob(file_path, document.snapshot(), document.edit_count)
+    return SnapshotWriteJob(file_path, document.snapshot(), document.edit_count, document.line_index)
+
+
+def _delete_novel_file(file_path):
+    if is_project(file_path):
+        shutil.rmtree(file_path)
+    else:
+        os.remove(file_path)
+    remove_stats(file_path)
+    remove_history(file_path)
+
+
+def _create_empty_file(file_path):
+    with open(file_path, 'w', encoding='utf-8'):
+        pass
+
+
+def _same_file(path, other):
+    try:
+        return os.path.samefile(path, other)
+    except OSError:
+        return False
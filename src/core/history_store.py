@@ -0,0 +1,245 @@
+import os
+import struct
+from array import array
+
+from core.journal import file_signature
+from core.mapped_file import MappedFile
+from core.undo import EditDelta
+
+HISTORY_SUFFIX = '.history'
+INDEX_SUFFIX = '.history.idx'
+MAGIC = b'CWH1'
+VERSION = 1
+# 头部：魔数、版本、记录数、当前位置、基准位置、基准文件的大小和修改时间
+HEADER = struct.Struct('<4sIQQQqq')
+# 偏移索引中每条记录的 (数据偏移, 数据长度)
+ENTRY = struct.Struct('<QQ')
+# 数据文件中每条记录的头部：起始行、删除行数、新行数
+RECORD = struct.Struct('<III')
+# 打开时预先解码的最近记录数，更早的记录撤销到时才从映射中读取
+EAGER_RECORDS = 64
+# 数据文件中失效的字节超过这个大小且超过一半时，打开时整理一次
+COMPACT_MIN_BYTES = 1024 * 1024
+# 基准位置之前的记录被改写后，基准状态已无法从历史中还原
+NO_BASE = 2 ** 64 - 1
+
+
+def history_paths_for(file_path):
+    return file_path + HISTORY_SUFFIX, file_path + INDEX_SUFFIX
+
+
+def encode_delta(delta):
+    lines = delta.old_lines + delta.new_lines
+    payload = '\n'.join(lines).encode('utf-8')
+    return RECORD.pack(delta.start, len(delta.old_lines), len(delta.new_lines)) + payload
+
+
+def decode_delta(data):
+    start, old_count, new_count = RECORD.unpack_from(data)
+    if old_count + new_count:
+        lines = bytes(data[RECORD.size:]).decode('utf-8').split('\n')
+    else:
+        lines = []
+    return EditDelta(start, lines[:old_count], lines[old_count:])
+
+
+class HistoryStore:
+    """小说文件旁的二进制撤销历史，重启后仍然可以撤销
+
+    数据文件（.history）只追加，每条记录是一个编码后的 EditDelta；
+    偏移索引（.history.idx）在头部之后依次保存每条记录的位置。
+    记录 [0, cursor) 可以撤销，[cursor, count) 可以重做；撤销后再编辑时
+    只在索引中截掉重做的部分，数据文件中的旧记录留到下次打开时再整理。
+
+    头部记录的基准签名是历史最后一次与 .txt 文件对齐时文件的大小和修改时间，
+    基准位置是当时的 cursor。打开时签名不符说明文件被外部修改，历史作废。
+
+    count 和 cursor 在界面线程中维护，写入都提交给 io 执行器在后台按顺序执行；
+    读取较早的记录时直接从数据文件的内存映射中取，尚未写出的记录从内存中取。
+    """
+
+    def __init__(self, file_path, io, error_handler=None):
+        self.file_path = file_path
+        self.path, self.index_path = history_paths_for(file_path)
+        self.io = io
+        self.error_handler = error_handler
+        self.count = 0
+        self.cursor = 0
+        self._entries = array('Q')  # 每条记录的 (偏移, 长度)
+        self._data_size = 0  # 数据文件的逻辑末尾，下一条记录写在这里
+        self._pending = {}  # 偏移 -> 还没写到磁盘的记录数据
+        self._base = (0, 0)  # 基准签名和基准位置只在 I/O 线程中读写
+        self._base_cursor = 0
+        self._mapped = MappedFile(self.path)
+        self._data = None
+        self._index = None
+
+    def load(self, replayed, eager=EAGER_RECORDS):
+        """读取磁盘上的历史，在 I/O 线程中调用，返回最近的最多 eager 条可撤销记录
+
+        replayed 为编辑日志重放的记录数：没有重放任何记录时文档就是基准文件的内容，
+        位置回到基准位置；否则文档包含了最后的编辑，位置以头部记录的为准。
+        """
+        signature = file_signature(self.file_path)
+        self._base = (signature['size'], signature['mtime_ns'])
+        try:
+            with open(self.index_path, 'rb') as f:
+                magic, version, count, cursor, base_cursor, size, mtime_ns = HEADER.unpack(
+                    f.read(HEADER.size))
+                if magic != MAGIC or version != VERSION or (size, mtime_ns) != self._base:
+                    raise ValueError('历史与文件不符')
+                if not replayed and base_cursor > count:
+                    raise ValueError('历史中没有文件当前内容对应的位置')
+                entries = array('Q')
+                entries.fromfile(f, 2 * count)
+            data_size = os.path.getsize(self.path)
+            if any(entries[i] + entries[i + 1] > data_size for i in range(0, len(entries), 2)):
+                raise ValueError('历史数据不完整')
+        except (OSError, ValueError, EOFError, struct.error):
+            self._remove_files()
+            return []
+        self.count = count
+        self._base_cursor = base_cursor
+        self.cursor = min(cursor if replayed else base_cursor, count)
+        self._entries = entries
+        self._data_size = data_size
+        live_bytes = sum(entries[1::2])
+        if data_size - live_bytes > max(COMPACT_MIN_BYTES, live_bytes):
+            self._compact()
+        return [self.read(i) for i in range(max(0, self.cursor - eager), self.cursor)]
+
+    def read(self, index):
+        """读取第 index 条记录"""
+        offset, length = self._entries[2 * index], self._entries[2 * index + 1]
+        data = self._pending.get(offset)
+        if data is None:
+            data = self._mapped.read(offset, length)
+        return decode_delta(data)
+
+    def append(self, delta):
+        """在当前位置写入一条记录，之后的可重做记录作废"""
+        data = encode_delta(delta)
+        offset = self._data_size
+        self._data_size += len(data)
+        index = self.cursor
+        del self._entries[2 * index:]
+        self._entries.extend((offset, len(data)))
+        self.count = self.cursor = index + 1
+        self._pending[offset] = data
+        self.io.submit('history_append', self._write_record, offset, data, index,
+                       self.count, self.cursor,
+                       callback=lambda request: self._on_written(offset, request))
+
+    def replace_last(self, delta):
+        """用 delta 替换最近一条可撤销的记录（合并连续输入时使用）"""
+        self.cursor -= 1
+        self.append(delta)
+
+    def move(self, cursor):
+        """撤销或重做之后更新当前位置"""
+        self.cursor = cursor
+        self._submit_header()
+
+    def clear(self):
+        self.count = self.cursor = 0
+        del self._entries[:]
+        self._submit_header()
+
+    def rebase(self):
+        """文件刚刚写回，以当前位置作为新的基准"""
+        self.io.submit('history_rebase', self.write_base, self.count, self.cursor,
+                       callback=self._report_error)
+
+    def write_base(self, count, cursor):
+        """在 I/O 线程中记录基准签名，只应在文件内容与位置 cursor 一致时调用"""
+        signature = file_signature(self.file_path)
+        self._base = (signature['size'], signature['mtime_ns'])
+        self._base_cursor = cursor
+        self._write_header(count, cursor)
+
+    def close(self):
+        self._mapped.close()
+        self.io.submit('history_close', self._close_files)
+
+    def _submit_header(self):
+        self.io.submit('history_move', self._write_header, self.count, self.cursor,
+                       callback=self._report_error)
+
+    def _on_written(self, offset, request):
+        self._pending.pop(offset, None)
+        self._report_error(request)
+
+    def _report_error(self, request):
+        if request.error is not None and self.error_handler is not None:
+            self.error_handler(request.error)
+
+    def _open_files(self):
+        if self._data is None:
+            mode = 'r+b' if os.path.exists(self.path) else 'w+b'
+            self._data = open(self.path, mode)
+        if self._index is None:
+            if os.path.exists(self.index_path):
+                self._index = open(self.index_path, 'r+b')
+            else:
+                self._index = open(self.index_path, 'w+b')
+                self._index.write(self._pack_header(0, 0))
+
+    def _write_record(self, offset, data, index, count, cursor):
+        if index < self._base_cursor:
+            self._base_cursor = NO_BASE
+        self._open_files()
+        self._data.seek(offset)
+        self._data.write(data)
+        self._data.flush()
+        self._index.seek(HEADER.size + index * ENTRY.size)
+        self._index.write(ENTRY.pack(offset, len(data)))
+        self._write_header(count, cursor)
+
+    def _write_header(self, count, cursor):
+        if count < self._base_cursor:
+            self._base_cursor = NO_BASE
+        self._open_files()
+        self._index.seek(0)
+        self._index.write(self._pack_header(count, cursor))
+        self._index.flush()
+
+    def _pack_header(self, count, cursor):
+        return HEADER.pack(MAGIC, VERSION, count, cursor, self._base_cursor, *self._base)
+
+    def _compact(self):
+        """去掉数据文件中已作废的记录，在 I/O 线程中打开时调用"""
+        entries = array('Q')
+        offset = 0
+        with open(self.path, 'rb') as source, open(self.path + '.tmp', 'wb') as target:
+            for i in range(0, len(self._entries), 2):
+                source.seek(self._entries[i])
+                data = source.read(self._entries[i + 1])
+                target.write(data)
+                entries.extend((offset, len(data)))
+                offset += len(data)
+        with open(self.index_path, 'rb') as f:
+            header = f.read(HEADER.size)
+        with open(self.index_path + '.tmp', 'wb') as f:
+            f.write(header)
+            entries.tofile(f)
+        os.replace(self.path + '.tmp', self.path)
+        os.replace(self.index_path + '.tmp', self.index_path)
+        self._entries = entries
+        self._data_size = offset
+
+    def _close_files(self):
+        for f in (self._data, self._index):
+            if f is not None:
+                f.close()
+        self._data = self._index = None
+
+    def _remove_files(self):
+        remove_history(self.file_path)
+
+
+def remove_history(file_path):
+    for path in history_paths_for(file_path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
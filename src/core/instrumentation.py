@@ -0,0 +1,163 @@
+import functools
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+STATS_FILE_PREFIX = 'cmd_writer_stats_'
+
+
+class _NullTimer:
+    """关闭统计时使用的空计时器，进入和退出都不做任何事"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'started')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class Histogram:
+    """按 2 的幂（微秒）分桶的耗时直方图"""
+
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = {}  # 桶上限（微秒）的位数 -> 次数
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        bucket = int(seconds * 1000000).bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, fraction):
+        """分位数的估计值（所在桶的上限，毫秒）"""
+        target = fraction * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= target:
+                return min((1 << bucket) / 1000, self.max * 1000)
+        return self.max * 1000
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'total_ms': round(self.total * 1000, 3),
+            'mean_ms': round(self.total * 1000 / self.count, 4) if self.count else 0.0,
+            'max_ms': round(self.max * 1000, 4),
+            'p50_ms': round(self.percentile(0.50), 4),
+            'p90_ms': round(self.percentile(0.90), 4),
+            'p99_ms': round(self.percentile(0.99), 4),
+            'buckets_us': {f'<{1 << bucket}': count for bucket, count in sorted(self.buckets.items())},
+        }
+
+
+class Metrics:
+    """热点路径的计时器和计数器
+
+    默认关闭，此时 timer() 返回共享的空计时器、count() 直接返回，
+    开销只有一次属性判断。打开后各线程记录的数据在锁保护下汇总，
+    dump() 把直方图和计数写成 JSON 文件。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.started_at = None
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def set_enabled(self, enabled):
+        if enabled and not self.enabled:
+            self.reset()
+        self.enabled = enabled
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+            self._counters = {}
+            self.started_at = datetime.now()
+
+    def timer(self, name):
+        """用 with 语句统计一段代码的耗时"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def timed(self, name):
+        """装饰器形式的 timer()，统计整个函数的耗时"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with _Timer(self, name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.add(seconds)
+
+    def count(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'started_at': self.started_at.isoformat(timespec='seconds') if self.started_at else None,
+                'timers': {name: histogram.summary()
+                           for name, histogram in sorted(self._histograms.items())},
+                'counters': dict(sorted(self._counters.items())),
+            }
+
+    def dump(self, directory, extra=None):
+        """把汇总结果写到 directory 中带时间戳的 JSON 文件，返回文件路径"""
+        data = self.snapshot()
+        data['dumped_at'] = datetime.now().isoformat(timespec='seconds')
+        if extra:
+            data.update(extra)
+        path = os.path.join(directory, f"{STATS_FILE_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        return path
+
+
+# 全局共享的统计实例，各模块直接导入使用
+metrics = Metrics()
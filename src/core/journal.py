@@ -0,0 +1,131 @@
+import json
+import os
+import time
+
+from core.disk_io import FSYNC_ALWAYS, FSYNC_BATCH
+from core.novel_project import is_project, manifest_path_for
+
+JOURNAL_SUFFIX = '.journal'
+
+
+def journal_path_for(file_path):
+    return file_path + JOURNAL_SUFFIX
+
+
+def file_signature(file_path):
+    """文件的大小和修改时间，用来判断日志是否仍然对应这个文件
+
+    章节项目每次写回都会替换清单，用清单文件的签名代表整个项目。
+    """
+    if is_project(file_path):
+        file_path = manifest_path_for(file_path)
+    stat = os.stat(file_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+class EditJournal:
+    """小说文件旁的追加式编辑日志
+
+    每条记录是一行 JSON：{"s": 起始行, "c": 删除行数, "l": [新行]}。
+    第一行是头部，记录日志所基于的 .txt 文件签名；签名不一致说明日志已经
+    合并过（或文件被外部修改），此时日志作废，不再重放。
+
+    record_count 由调用方在提交写入时维护；实际的文件操作都在 I/O 线程中执行。
+    """
+
+    def __init__(self, file_path, fsync_policy=FSYNC_BATCH, batch_interval=2.0):
+        self.file_path = file_path
+        self.path = journal_path_for(file_path)
+        self.fsync_policy = fsync_policy
+        self.batch_interval = batch_interval
+        self.record_count = 0
+        self._replayed = False
+        self._valid_size = 0  # 重放时最后一条完整记录的结束位置
+        self._file = None
+        self._unsynced = False
+        self._last_sync = time.monotonic()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def replay(self, document):
+        """把日志中的编辑重放到文档上，返回重放的记录数"""
+        if not self.exists():
+            return 0
+        applied = 0
+        with open(self.path, 'rb') as f:
+            header = f.readline()
+            try:
+                if json.loads(header).get('base') != file_signature(self.file_path):
+                    return 0
+            except ValueError:
+                return 0
+            for line in iter(f.readline, b''):
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError
+                    record = json.loads(line)
+                except ValueError:
+                    # 最后一条记录可能因崩溃只写了一半，之后追加前会截掉
+                    break
+                document.replace_lines(record['s'], record['c'], record['l'])
+                applied += 1
+                self._valid_size = f.tell()
+        self.record_count = applied
+        self._replayed = applied > 0
+        return applied
+
+    def open(self):
+        """打开日志准备追加；已有的有效日志保留，否则写入新的头部"""
+        if self._file is not None:
+            return
+        if self._replayed and self.exists():
+            self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.truncate(self._valid_size)
+        else:
+            self._file = open(self.path, 'w', encoding='utf-8')
+            self._write_header()
+
+    def append(self, start, count, new_lines):
+        """追加一条编辑记录"""
+        self.open()
+        self._file.write(json.dumps({'s': start, 'c': count, 'l': new_lines},
+                                    ensure_ascii=False) + '\n')
+        self._file.flush()
+        self._unsynced = True
+        if self.fsync_policy == FSYNC_ALWAYS:
+            self.sync()
+        elif (self.fsync_policy == FSYNC_BATCH and
+              time.monotonic() - self._last_sync >= self.batch_interval):
+            self.sync()
+
+    def sync(self):
+        """把已写入的记录同步到磁盘"""
+        if self._file is not None and self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._unsynced = False
+        self._last_sync = time.monotonic()
+
+    def reset(self):
+        """合并完成后清空日志，头部改为新文件的签名"""
+        self.open()
+        self._file.seek(0)
+        self._file.truncate()
+        self._write_header()
+
+    def close(self, remove=False):
+        if self._file is not None:
+            if not remove:
+                self.sync()
+            self._file.close()
+            self._file = None
+        if remove and self.exists():
+            os.remove(self.path)
+
+    def _write_header(self):
+        self._file.write(json.dumps({'base': file_signature(self.file_path)}) + '\n')
+        self._file.flush()
+        self._unsynced = True
+        if self.fsync_policy == FSYNC_ALWAYS:
+            self.sync()
@@ -0,0 +1,231 @@
+import os
+from array import array
+from bisect import bisect_right
+
+from core.mapped_file import MappedFile
+
+READ_CHUNK_SIZE = 1024 * 1024
+# 文本模式写回时每行换行符的字节数
+NEWLINE_LENGTH = len(os.linesep)
+
+
+def line_byte_length(line, encoding='utf-8'):
+    """一行写回磁盘后占用的字节数（含换行符）"""
+    return len(line.encode(encoding)) + NEWLINE_LENGTH
+
+
+class LineIndex:
+    """文件的行偏移索引
+
+    每行的字节长度（含换行符）保存在 array 中，另外每 BLOCK_SIZE 行
+    记录一次块起始偏移。取第 N 行的起始偏移只需一次块查询加一段块内求和。
+    编辑时只需替换对应的长度，其后各块的偏移由旧值平移得到，不会重新扫描文件。
+    """
+
+    BLOCK_SIZE = 1024
+
+    def __init__(self, lengths=None):
+        self._lengths = array('Q', lengths or [])
+        self._block_starts = array('Q')
+        self._rebuild_blocks(0)
+
+    @classmethod
+    def from_lengths(cls, lengths):
+        """直接使用已经算好的每行长度（array('Q')），不复制"""
+        index = cls()
+        index._lengths = lengths
+        index._rebuild_blocks(0)
+        return index
+
+    @classmethod
+    def build(cls, file_path):
+        """通过内存映射扫描文件建立索引，只处理字节，不做解码"""
+        index = cls()
+        lengths = index._lengths
+        carry = b''
+        mapped = MappedFile(file_path)
+        try:
+            for chunk in mapped.iter_chunks(READ_CHUNK_SIZE):
+                parts = (carry + chunk).split(b'\n')
+                carry = parts.pop()
+                lengths.extend([len(part) + 1 for part in parts])
+        finally:
+            mapped.close()
+        if carry:
+            # 末行没有换行符时按有换行符计算，与写回后的文件保持一致
+            lengths.append(len(carry) + NEWLINE_LENGTH)
+        index._rebuild_blocks(0)
+        return index
+
+    @property
+    def line_count(self):
+        return len(self._lengths)
+
+    def __len__(self):
+        return len(self._lengths)
+
+    @property
+    def total_bytes(self):
+        if not self._lengths:
+            return 0
+        return self.line_start(len(self._lengths) - 1) + self._lengths[-1]
+
+    def line_start(self, line_number):
+        """第 line_number 行的起始字节偏移"""
+        block = line_number // self.BLOCK_SIZE
+        block_first = block * self.BLOCK_SIZE
+        if line_number == block_first:
+            return self._block_starts[block]
+        return self._block_starts[block] + sum(self._lengths[block_first:line_number])
+
+    def line_at(self, offset):
+        """字节偏移 offset 所在的行号"""
+        block = bisect_right(self._block_starts, offset) - 1
+        line_number = block * self.BLOCK_SIZE
+        position = self._block_starts[block]
+        while line_number < len(self._lengths) - 1:
+            position += self._lengths[line_number]
+            if position > offset:
+                break
+            line_number += 1
+        return line_number
+
+    def span(self, line_number):
+        """第 line_number 行的 (起始偏移, 字节长度)"""
+        if line_number < 0 or line_number >= len(self._lengths):
+            raise IndexError(f"行号超出范围: {line_number}")
+        return self.line_start(line_number), self._lengths[line_number]
+
+    def replace(self, start, count, new_lengths):
+        """用 new_lengths 替换从 start 开始的 count 行的长度
+
+        编辑点之后的行只是整体移动了 shift 行、偏移变化了 delta 字节，
+        其后每块的起始偏移由旧值加减跨过块边界的 shift 行得到，不必重新累加整块。
+        """
+        new_lengths = array('Q', new_lengths)
+        shift = len(new_lengths) - count
+        if abs(shift) >= self.BLOCK_SIZE:
+            self._lengths[start:start + count] = new_lengths
+            self._rebuild_blocks(start // self.BLOCK_SIZE)
+            return
+        delta = sum(new_lengths) - sum(self._lengths[start:start + count])
+        self._lengths[start:start + count] = new_lengths
+        lengths = self._lengths
+        size = self.BLOCK_SIZE
+        old_starts = self._block_starts
+        block_count = max(1, -(-len(lengths) // size))
+        # 起始行落在编辑范围内的块逐块累加
+        settled = -(-(start + max(count, len(new_lengths))) // size)  # 从这一块起块内的行没有变化
+        starts = old_starts[:start // size + 1]
+        for block in range(start // size + 1, min(settled, block_count)):
+            starts.append(starts[-1] + sum(lengths[(block - 1) * size:block * size]))
+        # 其后的块由旧的起始偏移平移得到
+        moved = range(len(starts), min(block_count, len(old_starts)))
+        if shift == 0:
+            starts.extend([old_starts[block] + delta for block in moved])
+        elif shift > 0:
+            starts.extend([old_starts[block] + delta - sum(lengths[block * size:block * size + shift])
+                           for block in moved])
+        else:
+            starts.extend([old_starts[block] + delta + sum(lengths[block * size + shift:block * size])
+                           for block in moved])
+        # 插入行后新增的块
+        for block in range(len(starts), block_count):
+            starts.append(starts[-1] + sum(lengths[(block - 1) * size:block * size]))
+        self._block_starts = starts
+
+    def write_lengths(self, f):
+        """把每行长度写入已打开的二进制文件，可用 from_lengths 还原"""
+        self._lengths.tofile(f)
+
+    def copy(self):
+        index = LineIndex()
+        index._lengths = array('Q', self._lengths)
+        index._block_starts = array('Q', self._block_starts)
+        return index
+
+    def _rebuild_blocks(self, from_block):
+        """从 from_block 起重新计算各块的起始偏移"""
+        del self._block_starts[from_block:]
+        if from_block:
+            prev_first = (from_block - 1) * self.BLOCK_SIZE
+            offset = (self._block_starts[-1] +
+                      sum(self._lengths[prev_first:prev_first + self.BLOCK_SIZE]))
+        else:
+            offset = 0
+        for first in range(from_block * self.BLOCK_SIZE, len(self._lengths), self.BLOCK_SIZE):
+            self._block_starts.append(offset)
+            offset += sum(self._lengths[first:first + self.BLOCK_SIZE])
+        if not self._block_starts:
+            self._block_starts.append(0)
+
+
+class FileLines:
+    """按行索引读取文件的只读序列
+
+    文件通过 MappedFile 映射，取一行只是一次切片，只有取出的行才会解码。
+    """
+
+    def __init__(self, file_path, index, encoding='utf-8'):
+        self.file_path = file_path
+        self.index = index
+        self.encoding = encoding
+        self._mapped = MappedFile(file_path)
+
+    def __len__(self):
+        return self.index.line_count
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, _ = item.indices(len(self))
+            return self.read_range(start, stop)
+        offset, length = self.index.span(item)
+        return self._decode(self._read(offset, length))
+
+    def read_range(self, start, stop):
+        """一次读取 [start, stop) 范围内的所有行"""
+        if start >= stop:
+            return []
+        offset = self.index.line_start(start)
+        last_offset, last_length = self.index.span(stop - 1)
+        data = self._read(offset, last_offset + last_length - offset)
+        if data.endswith(b'\n'):
+            data = data[:-1]
+        return [line.rstrip('\r') for line in data.decode(self.encoding).split('\n')]
+
+    def find_lines(self, text, start=0, stop=None):
+        """在 [start, stop) 行中查找包含 text 的行号，直接在映射的字节上搜索"""
+        if stop is None or stop > len(self):
+            stop = len(self)
+        pattern = text.encode(self.encoding)
+        if start >= stop or not pattern or b'\n' in pattern:
+            return []
+        end = self.index.line_start(stop - 1) + self.index.span(stop - 1)[1]
+        position = self.index.line_start(start)
+        found = []
+        while True:
+            position = self._mapped.find(pattern, position, end)
+            if position < 0:
+                break
+            line_number = self.index.line_at(position)
+            found.append(line_number)
+            # 同一行只记录一次，从下一行开头继续查找
+            position = self.index.line_start(line_number) + self.index.span(line_number)[1]
+        return found
+
+    def clone(self):
+        """共享索引但使用独立文件句柄的副本"""
+        return FileLines(self.file_path, self.index, self.encoding)
+
+    def close(self):
+        self._mapped.close()
+
+    def _read(self, offset, length):
+        return self._mapped.read(offset, length)
+
+    def _decode(self, data):
+        if data.endswith(b'\n'):
+            data = data[:-1]
+        if data.endswith(b'\r'):
+            data = data[:-1]
+        return data.decode(self.encoding)
@@ -0,0 +1,97 @@
+import mmap
+import os
+
+
+class MappedFile:
+    """以只读内存映射方式访问文件
+
+    读取切片时直接从映射中取字节，不经过 Python 的文件缓冲区，
+    也不会把整个文件读进内存。空文件无法映射，按空内容处理。
+    访问超出映射范围的位置时检查文件的大小和修改时间，变化了（例如追加写入后）
+    就重新打开并映射。文件被整体替换时映射仍指向旧文件的内容，
+    FileManager 此时会为新文件创建新的 FileLines，不依赖这里重新映射。
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.remap_count = 0
+        self._file = None
+        self._map = None
+        self._signature = None
+
+    @property
+    def size(self):
+        self._ensure_open()
+        return len(self._map) if self._map is not None else 0
+
+    def read(self, offset, length):
+        """读取 [offset, offset + length) 范围内的字节"""
+        self._ensure_open()
+        if offset + length > self.size:
+            # 文件可能在映射之后又变长了
+            self.refresh()
+        if self._map is None:
+            return b''
+        return self._map[offset:offset + length]
+
+    def find(self, pattern, start=0, end=None):
+        """在 [start, end) 范围内查找字节串，找不到返回 -1"""
+        self._ensure_open()
+        if self._map is None:
+            return -1
+        if end is None:
+            end = len(self._map)
+        return self._map.find(pattern, start, end)
+
+    def rfind(self, pattern, start=0, end=None):
+        self._ensure_open()
+        if self._map is None:
+            return -1
+        if end is None:
+            end = len(self._map)
+        return self._map.rfind(pattern, start, end)
+
+    def iter_chunks(self, chunk_size):
+        """按 chunk_size 依次取出整个文件的字节"""
+        self._ensure_open()
+        size = self.size
+        for offset in range(0, size, chunk_size):
+            yield self._map[offset:offset + chunk_size]
+
+    def refresh(self):
+        """文件大小或修改时间变化时重新映射，返回是否重新映射"""
+        if self._file is None:
+            return False
+        if self._stat_signature() == self._signature:
+            return False
+        self._remap()
+        return True
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._signature = None
+
+    def _ensure_open(self):
+        if self._file is None:
+            self._open()
+
+    def _open(self):
+        self._file = open(self.file_path, 'rb')
+        self._signature = self._stat_signature()
+        if self._signature[0] > 0:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _remap(self):
+        # 文件可能已被替换成新文件，连同文件句柄一起重新打开
+        self.close()
+        self._open()
+        self.remap_count += 1
+
+    def _stat_signature(self):
+        stat = os.stat(self.file_path)
+        return stat.st_size, stat.st_mtime_ns
@@ -0,0 +1,93 @@
+import os
+
+from core.novel_project import PROJECT_SUFFIX, read_manifest, project_size, manifest_path_for
+from core.compressed_file import COMPRESSED_SUFFIX
+
+NOVEL_SUFFIX = '.txt'
+# 可以作为小说打开的文件：普通文本、压缩文件和章节项目（目录）
+FILE_SUFFIXES = (NOVEL_SUFFIX, COMPRESSED_SUFFIX)
+DOCUMENT_SUFFIXES = FILE_SUFFIXES + (PROJECT_SUFFIX,)
+
+
+class NovelFileEntry:
+    """目录中一个小说文件的缓存信息"""
+
+    __slots__ = ('name', 'path', 'size', 'mtime')
+
+    def __init__(self, name, path, size, mtime):
+        self.name = name
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+
+    @property
+    def is_plain_text(self):
+        return self.name.endswith(NOVEL_SUFFIX)
+
+    @classmethod
+    def from_dir_entry(cls, entry):
+        if entry.name.endswith(PROJECT_SUFFIX):
+            return cls.from_project(entry.path)
+        # DirEntry.stat() 在 Windows 上直接使用目录遍历得到的信息，不再单独访问文件
+        stat = entry.stat()
+        return cls(entry.name, entry.path, stat.st_size, stat.st_mtime)
+
+    @classmethod
+    def from_project(cls, path):
+        """章节项目的大小是各分块之和，修改时间取清单文件的"""
+        try:
+            manifest = read_manifest(path)
+        except ValueError:
+            raise OSError(f"项目清单损坏: {path}")
+        stat = os.stat(manifest_path_for(path))
+        return cls(os.path.basename(path), path, project_size(manifest), stat.st_mtime)
+
+    @classmethod
+    def from_path(cls, path):
+        stat = os.stat(path)
+        return cls(os.path.basename(path), path, stat.st_size, stat.st_mtime)
+
+
+def scan_novel_names(directory):
+    """只列出目录中的小说文件名（含章节项目）及对应的 DirEntry，不访问文件属性"""
+    entries = {}
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.name.endswith(FILE_SUFFIXES) and entry.is_file():
+                entries[entry.name] = entry
+            elif entry.name.endswith(PROJECT_SUFFIX) and entry.is_dir():
+                entries[entry.name] = entry
+    return entries
+
+
+def scan_novel_directory(directory):
+    """用 os.scandir 扫描目录，返回 文件名 -> NovelFileEntry"""
+    result = {}
+    for name, entry in scan_novel_names(directory).items():
+        try:
+            result[name] = NovelFileEntry.from_dir_entry(entry)
+        except OSError:
+            # 扫描期间文件被删除
+            continue
+    return result
+
+
+def refresh_novel_directory(directory, known, hot_names=()):
+    """增量刷新目录：只对新出现的文件和 hot_names 中的文件（正在写入或刚写回过）读取属性
+
+    返回 (新增或变化的条目列表, 已删除的文件名列表)。
+    """
+    names = scan_novel_names(directory)
+    removed = [name for name in known if name not in names]
+    changed = []
+    for name, entry in names.items():
+        if name in known and name not in hot_names:
+            continue
+        try:
+            item = NovelFileEntry.from_dir_entry(entry)
+        except OSError:
+            continue
+        old = known.get(name)
+        if old is None or old.size != item.size or old.mtime != item.mtime:
+            changed.append(item)
+    return changed, removed
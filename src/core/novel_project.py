@@ -0,0 +1,319 @@
+import json
+import os
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
+from core.line_index import LineIndex, FileLines
+
+PROJECT_SUFFIX = '.novel'
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+CHUNK_SUFFIX = '.txt'
+# 一个分块最多的行数，超过后即使没有遇到章节标题也另起一块
+CHUNK_LINES = 2000
+# 章节标题另起一块，例如“第十二章 归来”“第3回”“序章”
+CHAPTER_RE = re.compile(r'^\s*(第[0-9零一二三四五六七八九十百千万两]+[章回节卷]|序章|楔子|尾声)')
+
+
+def is_project(path):
+    """路径是否是章节项目（以 .novel 结尾的目录）"""
+    return path.rstrip('/\\').endswith(PROJECT_SUFFIX)
+
+
+def manifest_path_for(project_dir):
+    return os.path.join(project_dir, MANIFEST_NAME)
+
+
+def read_manifest(project_dir):
+    with open(manifest_path_for(project_dir), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError(f"不支持的项目版本: {manifest.get('version')}")
+    return manifest
+
+
+def write_manifest(project_dir, manifest, suffix=''):
+    """写出清单文件并同步到磁盘，suffix 非空时写到临时文件中"""
+    path = manifest_path_for(project_dir) + suffix
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    return path
+
+
+def project_size(manifest):
+    return sum(chunk['bytes'] for chunk in manifest['chunks'])
+
+
+def create_project(project_dir):
+    """创建一个空项目"""
+    os.makedirs(project_dir)
+    write_manifest(project_dir, {'version': MANIFEST_VERSION, 'next_chunk': 0, 'chunks': []})
+
+
+def create_project_from(snapshot, project_dir):
+    """把文档快照按章节切块写成新项目，逐批读取行，内存占用与文件大小无关"""
+    os.makedirs(project_dir)
+    try:
+        writer = ChunkWriter(project_dir, 0)
+        chunks = writer.write(snapshot.iter_lines())
+        write_manifest(project_dir, {'version': MANIFEST_VERSION,
+                                     'next_chunk': writer.next_chunk, 'chunks': chunks})
+    finally:
+        snapshot.close()
+
+
+def remove_orphan_chunks(project_dir, manifest):
+    """删除中途退出时留下的、清单中没有的分块"""
+    used = {chunk['file'] for chunk in manifest['chunks']}
+    for name in os.listdir(project_dir):
+        if name.endswith(CHUNK_SUFFIX) and name not in used:
+            try:
+                os.remove(os.path.join(project_dir, name))
+            except OSError:
+                pass
+
+
+class ChunkWriter:
+    """把连续的行写成一个或多个新的分块文件
+
+    遇到章节标题或当前块达到 CHUNK_LINES 行时另起一块。
+    新分块使用从未用过的编号，写好并同步到磁盘后才会被清单引用。
+    """
+
+    def __init__(self, project_dir, next_chunk):
+        self.project_dir = project_dir
+        self.next_chunk = next_chunk
+        self.paths = []  # 写出的所有分块路径，放弃写入时删除
+        self.indexes = {}  # 分块文件名 -> LineIndex
+
+    def write(self, lines):
+        """写出 lines，返回新分块的清单条目列表"""
+        chunks = []
+        f = chunk = None
+        for line in lines:
+            if f is None or chunk['lines'] >= CHUNK_LINES or (chunk['lines'] and CHAPTER_RE.match(line)):
+                if f is not None:
+                    chunks.append(self._close_chunk(f, chunk))
+                f, chunk = self._open_chunk(line)
+            f.write(line)
+            f.write('\n')
+            chunk['lines'] += 1
+        if f is not None:
+            chunks.append(self._close_chunk(f, chunk))
+        return chunks
+
+    def _open_chunk(self, first_line):
+        name = f'{self.next_chunk:08d}{CHUNK_SUFFIX}'
+        self.next_chunk += 1
+        path = os.path.join(self.project_dir, name)
+        self.paths.append(path)
+        title = first_line.strip()[:40] if CHAPTER_RE.match(first_line) else ''
+        return open(path, 'w', encoding='utf-8'), {'file': name, 'title': title, 'lines': 0}
+
+    def _close_chunk(self, f, chunk):
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+        path = os.path.join(self.project_dir, chunk['file'])
+        chunk['bytes'] = os.path.getsize(path)
+        self.indexes[chunk['file']] = LineIndex.build(path)
+        return chunk
+
+
+class ProjectLines:
+    """把项目的所有分块按清单顺序拼成一个只读的行序列
+
+    接口与 FileLines 相同，Document 可以直接把它作为原始缓冲区；
+    每个分块是一个按行索引读取的 FileLines，取一行只需定位分块再切片。
+    """
+
+    def __init__(self, project_dir, manifest, indexes):
+        self.project_dir = project_dir
+        self.manifest = manifest
+        self._parts = [FileLines(os.path.join(project_dir, chunk['file']), indexes[chunk['file']])
+                       for chunk in manifest['chunks']]
+        self._starts = array('Q')
+        total = 0
+        for part in self._parts:
+            self._starts.append(total)
+            total += len(part)
+        self._count = total
+
+    @classmethod
+    def load(cls, project_dir):
+        """读取清单并为每个分块建立行索引，在 I/O 线程中调用"""
+        manifest = read_manifest(project_dir)
+        remove_orphan_chunks(project_dir, manifest)
+        indexes = {chunk['file']: LineIndex.build(os.path.join(project_dir, chunk['file']))
+                   for chunk in manifest['chunks']}
+        return cls(project_dir, manifest, indexes)
+
+    @classmethod
+    def empty(cls, project_dir):
+        return cls(project_dir, {'version': MANIFEST_VERSION, 'next_chunk': 0, 'chunks': []}, {})
+
+    @property
+    def chunks(self):
+        return self.manifest['chunks']
+
+    @property
+    def indexes(self):
+        return {chunk['file']: part.index for chunk, part in zip(self.chunks, self._parts)}
+
+    def unit_span(self, number):
+        """第 number 个分块在序列中的 (起始行, 行数)"""
+        return self._starts[number], len(self._parts[number])
+
+    def units_within(self, start, stop):
+        """完整落在 [start, stop) 行之内的分块编号"""
+        number = bisect_left(self._starts, start)
+        while number < len(self._parts) and self._starts[number] + len(self._parts[number]) <= stop:
+            yield number
+            number += 1
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, _ = item.indices(len(self))
+            return self.read_range(start, stop)
+        if item < 0 or item >= self._count:
+            raise IndexError(f"行号超出范围: {item}")
+        number = bisect_right(self._starts, item) - 1
+        return self._parts[number][item - self._starts[number]]
+
+    def read_range(self, start, stop):
+        lines = []
+        number = bisect_right(self._starts, start) - 1
+        while start < stop and number < len(self._parts):
+            part_start = self._starts[number]
+            part_stop = min(stop, part_start + len(self._parts[number]))
+            if start < part_stop:
+                lines.extend(self._parts[number].read_range(start - part_start, part_stop - part_start))
+                start = part_stop
+            number += 1
+        return lines
+
+    def find_lines(self, text, start=0, stop=None):
+        if stop is None or stop > self._count:
+            stop = self._count
+        found = []
+        for part, part_start in zip(self._parts, self._starts):
+            part_stop = part_start + len(part)
+            if part_stop <= start or part_start >= stop:
+                continue
+            found.extend(part_start + hit for hit in part.find_lines(
+                text, max(start, part_start) - part_start, min(stop, part_stop) - part_start))
+        return found
+
+    def clone(self):
+        return ProjectLines(self.project_dir, self.manifest, self.indexes)
+
+    def close(self):
+        for part in self._parts:
+            part.close()
+
+
+class ProjectWriteJob:
+    """把项目文档的快照写回磁盘，接口与 SnapshotWriteJob 相同
+
+    在快照的片段表中找出仍原样保留的分块，这些分块的文件不动；
+    其余的行（被编辑过的分块和新增的内容）写成新的分块文件。
+    不足 CHUNK_LINES 行的分块与相邻的新内容（或同样不足的分块）一起重写，
+    在末尾追加的行写进最后一块直到写满，不会每次保存都多出一个小分块。
+    写好后生成新的清单，replace() 时原子地替换清单，再删除不再引用的旧分块。
+    保存的代价与修改涉及的分块大小成正比，与整本书的大小无关。
+    """
+
+    def __init__(self, file_path, snapshot, edit_count):
+        self.file_path = file_path
+        self.snapshot = snapshot
+        self.edit_count = edit_count
+        self.manifest = None
+        self.indexes = None
+        self.temp_path = None  # 与 SnapshotWriteJob 接口一致；新分块直接写在项目中，没有临时文件
+        self._writer = None
+        self._temp_manifest = None
+        self._obsolete = []
+
+    def run(self):
+        original = self.snapshot.original
+        try:
+            writer = self._writer = ChunkWriter(self.file_path, original.manifest['next_chunk'])
+            chunks = []
+            for start, stop, number in self._plan():
+                if number is not None:
+                    chunks.append(original.chunks[number])
+                else:
+                    chunks.extend(writer.write(self.snapshot.iter_lines(start, stop)))
+            self.manifest = {'version': MANIFEST_VERSION, 'next_chunk': writer.next_chunk,
+                             'chunks': chunks}
+            kept = {chunk['file'] for chunk in chunks}
+            self._obsolete = [chunk['file'] for chunk in original.chunks if chunk['file'] not in kept]
+            self.indexes = {name: index for name, index in original.indexes.items() if name in kept}
+            self.indexes.update(writer.indexes)
+            self._temp_manifest = write_manifest(self.file_path, self.manifest, '.tmp')
+        except Exception:
+            self.discard()
+            raise
+        finally:
+            self.snapshot.close()
+
+    def _plan(self):
+        """在 split_by_units() 的基础上把未满的分块并入相邻要重写的内容，返回同样格式的列表"""
+        plan = []
+        for start, stop, number in self.snapshot.split_by_units():
+            if plan and self._joins(plan[-1][2], start, number):
+                plan[-1] = (plan[-1][0], stop, None)
+            else:
+                plan.append((start, stop, number))
+        return plan
+
+    def _joins(self, previous, start, number):
+        """从 start 开始的一段（分块 number，None 表示要重写的行）能否与前一段合成一块重写"""
+        chunks = self.snapshot.original.chunks
+        if number is None:
+            if previous is None:
+                return True
+            # 新内容接在未满的分块后面，且不是新的章节，写进这一块
+            return (chunks[previous]['lines'] < CHUNK_LINES
+                    and not CHAPTER_RE.match(self.snapshot.get_line(start)))
+        chunk = chunks[number]
+        if chunk['title'] or chunk['lines'] >= CHUNK_LINES:
+            # 章节总是单独起一块
+            return False
+        # 并入要重写的内容，或与前一个未满的分块合并后仍不超过 CHUNK_LINES 行
+        return previous is None or chunks[previous]['lines'] + chunk['lines'] <= CHUNK_LINES
+
+    def replace(self):
+        """原子地替换清单，然后删除不再使用的旧分块"""
+        os.replace(self._temp_manifest, manifest_path_for(self.file_path))
+        self._temp_manifest = None
+        self._writer = None
+        for name in self._obsolete:
+            try:
+                os.remove(os.path.join(self.file_path, name))
+            except OSError:
+                pass
+
+    def open_lines(self):
+        """写回后的项目内容，原样保留的分块沿用已有的行索引"""
+        return ProjectLines(self.file_path, self.manifest, self.indexes)
+
+    def fallback_lines(self, lines):
+        """新分块在替换清单之前就已写好，替换完成前或替换失败时都照常读取"""
+        return lines
+
+    def discard(self):
+        if self._temp_manifest and os.path.exists(self._temp_manifest):
+            os.remove(self._temp_manifest)
+        self._temp_manifest = None
+        if self._writer is not None:
+            for path in self._writer.paths:
+                if os.path.exists(path):
+                    os.remove(path)
+            self._writer = None
@@ -0,0 +1,67 @@
+from PyQt5.QtCore import QObject, QTimer
+
+
+class SaveScheduler(QObject):
+    """合并连续编辑的延迟保存器
+
+    mark_dirty 只设置脏标记：停止输入 quiet_ms 后调用一次 writer()，持续输入时
+    最迟 max_delay_ms 也会调用一次。修改本身已经逐条应用到文档，这里只决定
+    什么时候持久化。定时触发的保存出错时交给 error_handler 处理，修改会保留到下一次保存。
+    """
+
+    def __init__(self, writer, quiet_ms=800, max_delay_ms=5000, error_handler=None, parent=None):
+        super().__init__(parent)
+        self.writer = writer
+        self.error_handler = error_handler
+        self.dirty = False
+
+        self.quiet_timer = QTimer(self)
+        self.quiet_timer.setSingleShot(True)
+        self.quiet_timer.setInterval(quiet_ms)
+        self.quiet_timer.timeout.connect(self._on_timeout)
+
+        self.max_delay_timer = QTimer(self)
+        self.max_delay_timer.setSingleShot(True)
+        self.max_delay_timer.setInterval(max_delay_ms)
+        self.max_delay_timer.timeout.connect(self._on_timeout)
+
+    def reset(self):
+        """丢弃未保存的标记（内容刚由程序设置，不需要保存）"""
+        self._stop_timers()
+        self.dirty = False
+
+    def mark_dirty(self):
+        self.dirty = True
+        self.quiet_timer.start()
+        if not self.max_delay_timer.isActive():
+            self.max_delay_timer.start()
+
+    def flush(self):
+        """立即保存未保存的修改，没有修改时返回 False"""
+        self._stop_timers()
+        if not self.dirty:
+            return False
+        self.dirty = False
+        try:
+            self.writer()
+        except Exception:
+            self.dirty = True
+            raise
+        return True
+
+    def cancel(self):
+        """放弃未保存的修改"""
+        self._stop_timers()
+        self.dirty = False
+
+    def _on_timeout(self):
+        try:
+            self.flush()
+        except Exception as e:
+            if self.error_handler is None:
+                raise
+            self.error_handler(e)
+
+    def _stop_timers(self):
+        self.quiet_timer.stop()
+        self.max_delay_timer.stop()
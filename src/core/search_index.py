@@ -0,0 +1,528 @@
+import json
+import mmap
+import os
+import threading
+import zlib
+from array import array
+from bisect import bisect_left
+
+from core.mapped_file import MappedFile
+from core.novel_files import scan_novel_directory
+
+INDEX_DIR_NAME = '.novel_index'
+META_NAME = 'meta.json'
+META_VERSION = 2
+# 每个索引块覆盖的大致字节数，块总是在行边界结束
+BLOCK_BYTES = 256 * 1024
+# 每块在分片中占用的字段数：首行行号、起始偏移、结束偏移、内容的 CRC32
+BLOCK_FIELDS = 4
+# 块编号占用的位数，二元组编码占用其余的高位
+BLOCK_BITS = 16
+BLOCK_MASK = (1 << BLOCK_BITS) - 1
+# 一次查询最多校验出的命中数
+MAX_HITS = 500
+
+
+def bigram_codes(text):
+    """文本中所有相邻两个字符组成的二元组，编码成整数
+
+    中文没有空格分词，按字符二元组建索引即可覆盖任意长度不小于 2 的查询。
+    """
+    return {ord(a) << 21 | ord(b) for a, b in zip(text, text[1:])}
+
+
+class SearchHit:
+    """一条搜索结果"""
+
+    __slots__ = ('path', 'line_number', 'text')
+
+    def __init__(self, path, line_number, text):
+        self.path = path
+        self.line_number = line_number
+        self.text = text
+
+    @property
+    def name(self):
+        return os.path.basename(self.path)
+
+
+class _Shard:
+    """一个文件的索引分片，整个分片文件以只读方式映射
+
+    文件内容依次为：每块的 (首行行号, 起始偏移, 结束偏移, CRC32)，
+    然后是升序排列的 (二元组 << BLOCK_BITS | 块编号)。
+    查一个二元组只需两次二分查找，取出的区间就是它出现过的所有块。
+    """
+
+    def __init__(self, path, block_count):
+        self._file = open(path, 'rb')
+        if os.fstat(self._file.fileno()).st_size:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._map).cast('Q')
+        else:
+            # 空文件的分片是空的，无法映射
+            self._map = None
+            self._view = memoryview(array('Q'))
+        self.blocks = self._view[:BLOCK_FIELDS * block_count]
+        self.pairs = self._view[BLOCK_FIELDS * block_count:]
+
+    def block(self, block_id):
+        """块的 (首行行号, 起始偏移, 结束偏移)"""
+        start = BLOCK_FIELDS * block_id
+        return tuple(self.blocks[start:start + 3])
+
+    def block_entries(self):
+        """所有块的 (首行行号, 起始偏移, 结束偏移, CRC32)"""
+        fields = self.blocks.tolist()
+        return [tuple(fields[i:i + BLOCK_FIELDS]) for i in range(0, len(fields), BLOCK_FIELDS)]
+
+    def blocks_in_range(self, low, high):
+        """编码在 [low, high) 之间的二元组所在的块编号"""
+        first = bisect_left(self.pairs, low << BLOCK_BITS)
+        last = bisect_left(self.pairs, high << BLOCK_BITS)
+        return {pair & BLOCK_MASK for pair in self.pairs[first:last]}
+
+    def close(self):
+        # 必须先释放 memoryview 才能关闭映射
+        self.blocks.release()
+        self.pairs.release()
+        self._view.release()
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+
+class SearchIndex:
+    """novel_dir 下所有 .txt 文件的全文倒排索引
+
+    文件按行边界切成约 BLOCK_BYTES 的块，每个文件的索引单独保存为一个分片，
+    记录每个字符二元组出现在哪些块中。查询时在各分片中取二元组块集合的交集，
+    再在候选块的原始字节上（内存映射）确认并换算出行号，只解码命中的那一行。
+
+    文件保存后只需重写它自己的分片和 meta.json，不影响其他文件的索引；
+    分片中记录了每块的 CRC32，内容没变的块直接沿用原来的二元组，
+    只有字节范围内容变化的块才重新切分和提取二元组。
+
+    所有方法（包括 search()）都应在同一个后台线程中调用，界面线程只提交请求、
+    在回调中取结果。提供 io 时，读取小说文件的步骤（建立索引时的扫描和查询时
+    确认命中）提交到这个 I/O 线程执行，与写回文件（Windows 上不能替换仍被映射的文件）
+    按提交顺序依次进行，提取二元组等耗时的计算仍在索引线程中完成。
+    """
+
+    def __init__(self, novel_dir, io=None):
+        self.novel_dir = novel_dir
+        self.io = io
+        self.index_dir = os.path.join(novel_dir, INDEX_DIR_NAME)
+        self.ready = False
+        self.dirty = False
+        self.files = {}  # 文件名 -> {'size', 'mtime_ns', 'segment', 'blocks'}
+        self._shards = {}  # 文件名 -> _Shard
+        self._next_segment = 0
+        self._lock = threading.Lock()
+        self._cancelled = False
+
+    def cancel(self):
+        """让正在进行的 sync() 尽快结束"""
+        self._cancelled = True
+
+    def load(self):
+        """读取磁盘上的索引，不存在或损坏时从空索引开始"""
+        self.ready = True
+        try:
+            with open(os.path.join(self.index_dir, META_NAME), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('version') != META_VERSION:
+                return False
+            files = meta['files']
+            next_segment = meta['next_segment']
+        except (OSError, ValueError, KeyError):
+            return False
+        shards = {}
+        for name, info in list(files.items()):
+            try:
+                shards[name] = _Shard(self._segment_path(info['segment']), info['blocks'])
+            except (OSError, ValueError, KeyError, TypeError):
+                # 分片缺失或损坏，下次 sync() 时重新索引这个文件
+                del files[name]
+        with self._lock:
+            self._close_shards()
+            self.files = files
+            self._shards = shards
+            self._next_segment = next_segment
+        return True
+
+    def sync(self):
+        """让索引与目录中的文件保持一致，返回重新索引的文件数"""
+        if not self.ready:
+            self.load()
+        self._cancelled = False
+        entries = scan_novel_directory(self.novel_dir)
+        for name in list(self.files):
+            if name not in entries:
+                self.remove_file(os.path.join(self.novel_dir, name))
+        updated = 0
+        for entry in entries.values():
+            if self._cancelled:
+                break
+            if not entry.is_plain_text:
+                # 章节项目和压缩文件暂不建立全文索引
+                continue
+            try:
+                updated += self.update_file(entry.path)
+            except OSError:
+                continue
+        self.save()
+        if not self._cancelled:
+            self._remove_orphans()
+        return updated
+
+    def update_file(self, file_path):
+        """文件内容变化时重写它的分片，文件未变化时返回 False"""
+        name = os.path.basename(file_path)
+        stat = os.stat(file_path)
+        info = self.files.get(name)
+        if info is not None and info['size'] == stat.st_size and info['mtime_ns'] == stat.st_mtime_ns:
+            return False
+        shard = self._shards.get(name)
+        old_blocks = shard.block_entries() if shard is not None else []
+        scan = self._run_io(_scan_file, file_path, old_blocks)
+        if scan.block_count > BLOCK_MASK:
+            # 块编号用完了，按文件大小加大块后整体重建
+            shard = None
+            scan = self._run_io(_scan_file, file_path, [])
+        if shard is not None and not scan.changed:
+            # 只有修改时间变化，分片原样沿用
+            with self._lock:
+                info.update(size=scan.size, mtime_ns=scan.mtime_ns)
+                self.dirty = True
+            return True
+        segment, block_count = self._write_segment(scan, shard)
+        shard = _Shard(self._segment_path(segment), block_count)
+        with self._lock:
+            old = self._drop_file(name)
+            self.files[name] = {'size': scan.size, 'mtime_ns': scan.mtime_ns,
+                                'segment': segment, 'blocks': block_count}
+            self._shards[name] = shard
+            self.dirty = True
+        self._remove_segment(old)
+        return True
+
+    def refresh_file(self, file_path):
+        """文件写回、新建或删除后更新它的索引并写出 meta.json"""
+        if not self.ready:
+            self.load()
+        if os.path.isfile(file_path):
+            self.update_file(file_path)
+        else:
+            self.remove_file(file_path)
+        self.save()
+
+    def remove_file(self, file_path):
+        with self._lock:
+            old = self._drop_file(os.path.basename(file_path))
+            if old is not None:
+                self.dirty = True
+        self._remove_segment(old)
+
+    def save(self):
+        """把文件列表写入 meta.json，分片在索引文件时已经写好"""
+        if not self.dirty:
+            return
+        with self._lock:
+            meta = {'version': META_VERSION, 'next_segment': self._next_segment,
+                    'files': {name: dict(info) for name, info in self.files.items()}}
+            self.dirty = False
+        os.makedirs(self.index_dir, exist_ok=True)
+        meta_path = os.path.join(self.index_dir, META_NAME)
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        # meta.json 原子替换，崩溃时旧的文件列表仍然完整可用
+        os.replace(meta_path + '.tmp', meta_path)
+
+    def search(self, query, limit=MAX_HITS):
+        """查找包含 query 的行，按文件内命中数从多到少排列"""
+        if not query or '\n' in query:
+            return []
+        with self._lock:
+            candidates = []
+            for name in sorted(self._shards):
+                shard = self._shards[name]
+                candidates.extend((name,) + shard.block(block_id)
+                                  for block_id in sorted(self._candidate_blocks(shard, query)))
+        hits, counts = self._run_io(self._confirm_candidates, candidates,
+                                    query.encode('utf-8'), limit)
+        hits.sort(key=lambda hit: (-counts[hit.name], hit.name, hit.line_number))
+        return hits
+
+    def close(self):
+        with self._lock:
+            self._close_shards()
+
+    def _run_io(self, fn, *args):
+        """在 I/O 线程中执行 fn 并等待它的结果"""
+        if self.io is None:
+            return fn(*args)
+        done = threading.Event()
+        outcome = []
+
+        def job():
+            try:
+                outcome.append((fn(*args), None))
+            except Exception as e:
+                outcome.append((None, e))
+            finally:
+                done.set()
+
+        self.io.submit('index_read', job)
+        done.wait()
+        result, error = outcome[0]
+        if error is not None:
+            raise error
+        return result
+
+    def _segment_path(self, segment):
+        return os.path.join(self.index_dir, f'{segment}.bin')
+
+    def _close_shards(self):
+        for shard in self._shards.values():
+            shard.close()
+        self._shards = {}
+
+    def _drop_file(self, name):
+        """从索引中去掉文件，返回它原来的分片编号"""
+        info = self.files.pop(name, None)
+        shard = self._shards.pop(name, None)
+        if shard is not None:
+            shard.close()
+        return info['segment'] if info is not None else None
+
+    def _remove_segment(self, segment):
+        if segment is None:
+            return
+        try:
+            os.remove(self._segment_path(segment))
+        except OSError:
+            pass
+
+    def _remove_orphans(self):
+        """删除中途退出时留下的、不再被引用的分片"""
+        used = {self._segment_path(info['segment']) for info in self.files.values()}
+        try:
+            names = os.listdir(self.index_dir)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.index_dir, name)
+            if name != META_NAME and path not in used:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _candidate_blocks(self, shard, query):
+        """分片中可能包含 query 的块编号"""
+        if len(query) == 1:
+            # 单个字符：以它开头的所有二元组在分片中是连续的一段
+            return shard.blocks_in_range(ord(query) << 21, (ord(query) + 1) << 21)
+        result = None
+        for code in bigram_codes(query):
+            block_ids = shard.blocks_in_range(code, code + 1)
+            result = block_ids if result is None else result & block_ids
+            if not result:
+                break
+        return result
+
+    def _confirm_candidates(self, candidates, pattern, limit):
+        """在候选块的原始字节上确认命中，返回 (命中的行, 文件名 -> 命中数)"""
+        hits = []
+        counts = {}
+        mapped_files = {}
+        try:
+            for name, first_line, start, end in candidates:
+                if len(hits) >= limit:
+                    break
+                mapped = mapped_files.get(name)
+                if mapped is None:
+                    mapped = mapped_files[name] = MappedFile(os.path.join(self.novel_dir, name))
+                try:
+                    found = self._find_in_block(mapped, pattern, first_line, start, end,
+                                                limit - len(hits))
+                except OSError:
+                    continue
+                hits.extend(found)
+                counts[name] = counts.get(name, 0) + len(found)
+        finally:
+            for mapped in mapped_files.values():
+                mapped.close()
+        return hits, counts
+
+    def _find_in_block(self, mapped, pattern, first_line, start, end, limit):
+        """在块的字节范围内确认命中并换算行号，每行只记录一次"""
+        hits = []
+        line_number = first_line
+        counted = start
+        position = mapped.find(pattern, start, end)
+        while position >= 0 and len(hits) < limit:
+            line_start = mapped.rfind(b'\n', start, position) + 1 or start
+            line_end = mapped.find(b'\n', position, end)
+            if line_end < 0:
+                line_end = end
+            line_number += mapped.read(counted, line_start - counted).count(b'\n')
+            counted = line_start
+            text = mapped.read(line_start, line_end - line_start)
+            hits.append(SearchHit(mapped.file_path, line_number,
+                                  text.decode('utf-8', errors='replace').rstrip('\r')))
+            position = mapped.find(pattern, line_end, end)
+        return hits
+
+    def _write_segment(self, scan, shard):
+        """把扫描结果写成新的分片，返回 (分片编号, 块数)
+
+        前后未变化的块沿用 shard 中的二元组（后面的块编号整体平移），
+        中间重新切分的块提取新的二元组。
+        """
+        prefix, suffix = scan.prefix, scan.suffix
+        old_count = len(shard.blocks) // BLOCK_FIELDS if shard is not None else 0
+        shift = prefix + len(scan.middle) - suffix
+        if shard is None or (prefix == 0 and suffix == old_count):
+            pairs = []
+        elif suffix == old_count:
+            pairs = [pair for pair in shard.pairs if pair & BLOCK_MASK < prefix]
+        else:
+            # 保留的块编号在平移后仍保持原来的先后顺序，所以这些二元组依然有序
+            pairs = [pair if pair & BLOCK_MASK < prefix else pair + shift for pair in shard.pairs
+                     if not prefix <= pair & BLOCK_MASK < suffix]
+        for block_id, data in enumerate(scan.data, prefix):
+            pairs.extend([code << BLOCK_BITS | block_id
+                          for code in bigram_codes(data.decode('utf-8', errors='replace'))])
+        # 保留的二元组和新块的二元组各自有序，排序只需合并几段有序序列
+        pairs.sort()
+        segment = self._next_segment
+        self._next_segment += 1
+        os.makedirs(self.index_dir, exist_ok=True)
+        path = self._segment_path(segment)
+        blocks = scan.blocks()
+        with open(path + '.tmp', 'wb') as f:
+            blocks.tofile(f)
+            array('Q', pairs).tofile(f)
+        os.replace(path + '.tmp', path)
+        return segment, len(blocks) // BLOCK_FIELDS
+
+
+class _FileScan:
+    """_scan_file() 的结果：新文件中哪些块沿用原来的块，哪些块需要重新建立索引
+
+    原来的前 prefix 块原样保留，从 suffix 起的块整体平移了
+    byte_shift 个字节和 line_shift 行，中间重新切出的块记录在 middle 和 data 中。
+    """
+
+    __slots__ = ('size', 'mtime_ns', 'old_blocks', 'prefix', 'suffix', 'byte_shift',
+                 'line_shift', 'middle', 'data')
+
+    def __init__(self, size, mtime_ns, old_blocks, prefix, suffix, byte_shift, line_shift,
+                 middle, data):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.old_blocks = old_blocks
+        self.prefix = prefix
+        self.suffix = suffix
+        self.byte_shift = byte_shift
+        self.line_shift = line_shift
+        self.middle = middle
+        self.data = data
+
+    @property
+    def block_count(self):
+        return self.prefix + len(self.middle) + len(self.old_blocks) - self.suffix
+
+    @property
+    def changed(self):
+        return bool(self.middle) or self.prefix != self.suffix or self.byte_shift != 0
+
+    def blocks(self):
+        """新分片的块表"""
+        blocks = array('Q')
+        for entry in self.old_blocks[:self.prefix]:
+            blocks.extend(entry)
+        for entry in self.middle:
+            blocks.extend(entry)
+        for first_line, start, end, crc in self.old_blocks[self.suffix:]:
+            blocks.extend((first_line + self.line_shift, start + self.byte_shift,
+                           end + self.byte_shift, crc))
+        return blocks
+
+
+def _scan_file(file_path, old_blocks):
+    """把文件与原来的块比对，读出内容变化的部分并按行边界重新切块
+
+    从头向后、从尾向前分别找出 CRC32 仍然一致的块，只有夹在中间的字节需要重新建立索引。
+    块总是从行首开始、在行尾结束，所以沿用的块还要确认它的边界在新文件中仍是行边界。
+    这一步读取小说文件，应在 I/O 线程中执行。
+    """
+    stat = os.stat(file_path)
+    mapped = MappedFile(file_path)
+    try:
+        size = mapped.size
+        # 块编号只有 BLOCK_BITS 位，超大文件相应地加大块
+        block_bytes = max(BLOCK_BYTES, size // BLOCK_MASK + 1)
+        old_size = old_blocks[-1][2] if old_blocks else 0
+        byte_shift = size - old_size
+
+        def unchanged(start, end, crc):
+            return 0 <= start and end <= size and zlib.crc32(mapped.read(start, end - start)) == crc
+
+        def line_start(offset):
+            return offset == 0 or mapped.read(offset - 1, 1) == b'\n'
+
+        prefix = 0
+        middle_line = 0
+        while prefix < len(old_blocks):
+            first_line, start, end, crc = old_blocks[prefix]
+            if not unchanged(start, end, crc) or not (end == size or line_start(end)):
+                break
+            middle_line = old_blocks[prefix + 1][0] if prefix + 1 < len(old_blocks) else (
+                first_line + mapped.read(start, end - start).count(b'\n'))
+            prefix += 1
+        middle_start = old_blocks[prefix - 1][2] if prefix else 0
+        suffix = len(old_blocks)
+        while suffix > prefix:
+            _, start, end, crc = old_blocks[suffix - 1]
+            if start + byte_shift < middle_start or not unchanged(start + byte_shift,
+                                                                  end + byte_shift, crc):
+                break
+            suffix -= 1
+        while suffix < len(old_blocks) and not line_start(old_blocks[suffix][1] + byte_shift):
+            suffix += 1
+        middle_end = old_blocks[suffix][1] + byte_shift if suffix < len(old_blocks) else size
+        if 0 < middle_end - middle_start < block_bytes // 4:
+            # 变化的部分太小时并入相邻的块，编辑多次后块也不会越切越碎
+            if suffix < len(old_blocks):
+                suffix += 1
+                middle_end = old_blocks[suffix][1] + byte_shift if suffix < len(old_blocks) else size
+            elif prefix > 0:
+                prefix -= 1
+                middle_start = old_blocks[prefix][1]
+                middle_line = old_blocks[prefix][0]
+        middle = []
+        data = []
+        offset = middle_start
+        line_number = middle_line
+        while offset < middle_end:
+            end = min(middle_end, offset + block_bytes)
+            if middle_end - end < block_bytes // 4:
+                end = middle_end
+            else:
+                newline = mapped.rfind(b'\n', offset, end)
+                if newline < 0:
+                    newline = mapped.find(b'\n', end, middle_end)
+                end = middle_end if newline < 0 else newline + 1
+            block = mapped.read(offset, end - offset)
+            middle.append((line_number, offset, end, zlib.crc32(block)))
+            data.append(block)
+            line_number += block.count(b'\n')
+            offset = end
+    finally:
+        mapped.close()
+    line_shift = line_number - old_blocks[suffix][0] if suffix < len(old_blocks) else 0
+    return _FileScan(size, stat.st_mtime_ns, old_blocks, prefix, suffix, byte_shift, line_shift,
+                     middle, data)
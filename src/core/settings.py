@@ -1,8 +1,37 @@
-from PyQt5.QtCore import QSettings
+from PyQt5.QtCore import QSettings, QObject, QTimer, pyqtSignal
 import os
 
-class Settings:
-    def __init__(self):
+# 所有设置项：键 -> (默认值, 类型)，类型为 None 时按原样读取
+SETTINGS_SCHEMA = {
+    'geometry': (None, None),
+    'novel_directory': (os.path.join(os.path.expanduser('~'), 'novels'), str),
+    'show_status': (True, bool),
+    'storage_mode': ('journal', str),
+    'undo_memory_limit': (32, int),  # 撤销历史占用内存的上限（MB）
+    'save_quiet_period': (800, int),  # 编辑器停止输入多久后保存（毫秒）
+    'save_max_delay': (5000, int),  # 持续输入时最长多久保存一次（毫秒）
+    'fsync_policy': ('batch', str),  # 编辑日志的磁盘同步策略：always / batch / close
+    'console_scrollback': (5000, int),  # 控制台最多保留的行数
+    'power_save': (True, bool),  # 窗口不可见或失去焦点时是否减少后台活动
+    'editor_window_lines': (2000, int),  # 编辑器面板一次载入的行数
+    'instrumentation': (False, bool),  # 是否统计热点路径的耗时
+    'document_cache_memory': (64, int),  # 切换文件时缓存的文档占用内存的上限（MB）
+    'compression_codec': ('zlib', str),  # 新建压缩文件（.txz）使用的压缩方式：zlib / lzma
+}
+
+
+class Settings(QObject):
+    """程序设置
+
+    启动时从 QSettings 一次性读入内存，之后的读取都直接返回内存中的值；
+    修改先更新内存并发出 changed 信号，再延迟 write_delay_ms 批量写回
+    QSettings。退出前调用 flush() 确保所有修改都已写入。
+    """
+
+    changed = pyqtSignal(str, object)  # (键, 新值)
+
+    def __init__(self, write_delay_ms=1000, parent=None):
+        super().__init__(parent)
         self.settings = QSettings('FakeConsole', 'WindowSettings')
         self.default_shortcuts = {
             'close': 'Ctrl+Q',
@@ -11,37 +40,133 @@ class Settings:
             'save': 'Ctrl+S',
             'show_content': 'Ctrl+R',
             'undo': 'Ctrl+Z',
+            'redo': 'Ctrl+Y',
             'close_editor': 'Esc'
         }
+        self._values = {}
+        self._pending = set()  # 尚未写回 QSettings 的键
+        self._load_all()
+
+        self.write_timer = QTimer(self)
+        self.write_timer.setSingleShot(True)
+        self.write_timer.setInterval(write_delay_ms)
+        self.write_timer.timeout.connect(self.flush)
+
+    def _load_all(self):
+        for key, (default, value_type) in SETTINGS_SCHEMA.items():
+            if value_type is None:
+                self._values[key] = self.settings.value(key, default)
+            else:
+                self._values[key] = self.settings.value(key, default, type=value_type)
+        for action, default in self.default_shortcuts.items():
+            key = f'shortcuts/{action}'
+            self._values[key] = self.settings.value(key, default)
+
+    def get(self, key):
+        return self._values.get(key)
+
+    def set(self, key, value):
+        """修改设置；值没有变化时不做任何事"""
+        if key in self._values and self._values[key] == value:
+            return
+        self._values[key] = value
+        self._pending.add(key)
+        if not self.write_timer.isActive():
+            self.write_timer.start()
+        self.changed.emit(key, value)
+
+    def flush(self):
+        """把尚未写回的修改写入 QSettings"""
+        self.write_timer.stop()
+        if not self._pending:
+            return
+        for key in self._pending:
+            self.settings.setValue(key, self._values[key])
+        self._pending.clear()
+        self.settings.sync()
 
     def save_geometry(self, geometry):
-        self.settings.setValue('geometry', geometry)
+        self.set('geometry', geometry)
 
     def load_geometry(self):
-        return self.settings.value('geometry')
+        return self.get('geometry')
 
     def save_novel_directory(self, path):
-        self.settings.setValue('novel_directory', path)
+        self.set('novel_directory', path)
 
     def load_novel_directory(self):
-        default_path = os.path.join(os.path.expanduser('~'), 'novels')
-        return self.settings.value('novel_directory', default_path)
-        
+        return self.get('novel_directory')
+
     def save_show_status(self, show):
-        self.settings.setValue('show_status', show)
-        
+        self.set('show_status', show)
+
     def load_show_status(self):
-        return self.settings.value('show_status', True, type=bool)
+        return self.get('show_status')
+
+    def save_storage_mode(self, mode):
+        self.set('storage_mode', mode)
+
+    def load_storage_mode(self):
+        return self.get('storage_mode')
+
+    def load_undo_memory_limit(self):
+        """撤销历史占用内存的上限（MB）"""
+        return self.get('undo_memory_limit')
+
+    def load_save_quiet_period(self):
+        """编辑器停止输入多久后保存（毫秒）"""
+        return self.get('save_quiet_period')
+
+    def load_save_max_delay(self):
+        """持续输入时最长多久保存一次（毫秒）"""
+        return self.get('save_max_delay')
+
+    def save_fsync_policy(self, policy):
+        self.set('fsync_policy', policy)
+
+    def load_fsync_policy(self):
+        """编辑日志的磁盘同步策略：always / batch / close"""
+        return self.get('fsync_policy')
+
+    def load_console_scrollback(self):
+        """控制台最多保留的行数"""
+        return self.get('console_scrollback')
+
+    def save_power_save(self, enabled):
+        self.set('power_save', enabled)
+
+    def load_power_save(self):
+        """窗口不可见或失去焦点时是否减少后台活动"""
+        return self.get('power_save')
+
+    def load_editor_window_lines(self):
+        """编辑器面板一次载入的行数，滚动到边缘时再按块载入"""
+        return self.get('editor_window_lines')
+
+    def load_document_cache_memory(self):
+        """切换文件时缓存的文档占用内存的上限（MB）"""
+        return self.get('document_cache_memory')
+
+    def load_compression_codec(self):
+        """新建压缩文件（.txz）使用的压缩方式：zlib / lzma"""
+        return self.get('compression_codec')
+
+    def save_instrumentation(self, enabled):
+        self.set('instrumentation', enabled)
+
+    def load_instrumentation(self):
+        """是否统计热点路径的耗时，用 /stats 命令导出"""
+        return self.get('instrumentation')
 
     def save_shortcut(self, action, key):
         """保存快捷键设置"""
-        self.settings.setValue(f'shortcuts/{action}', key)
+        self.set(f'shortcuts/{action}', key)
 
     def load_shortcut(self, action):
         """加载快捷键设置"""
-        return self.settings.value(f'shortcuts/{action}', self.default_shortcuts.get(action))
+        return self._values.get(f'shortcuts/{action}', self.default_shortcuts.get(action))
 
     def reset_shortcuts(self):
         """重置所有快捷键为默认值"""
         for action, key in self.default_shortcuts.items():
-            self.save_shortcut(action, key) 
\ No newline at end of file
+            self.save_shortcut(action, key)
@@ -0,0 +1,27 @@
+import time
+
+
+class StartupProbe:
+    """记录启动过程中各阶段的耗时
+
+    创建时开始计时，每次 mark() 记录从上一个阶段结束到现在的时间。
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases = []  # [(阶段名称, 耗时秒数)]
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    @property
+    def total(self):
+        return self._last - self.started
+
+    def report(self):
+        """一行文字的汇总，例如 “启动耗时 120 ms（imports 45 · window 30 · …）”"""
+        parts = ' · '.join(f"{phase} {seconds * 1000:.0f}" for phase, seconds in self.phases)
+        return f"启动耗时 {self.total * 1000:.0f} ms（{parts}）"
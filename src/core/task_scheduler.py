@@ -0,0 +1,114 @@
+import time
+from collections import deque
+
+from PyQt5.QtCore import QObject, QTimer
+
+
+class _Task:
+    __slots__ = ('callback', 'due', 'interval', 'idle_interval')
+
+    def __init__(self, callback, due, interval=None, idle_interval=None):
+        self.callback = callback
+        self.due = due
+        self.interval = interval  # 重复任务的间隔（秒），单次任务为 None
+        self.idle_interval = idle_interval  # 省电模式下的间隔，None 表示暂停
+
+
+class TaskScheduler(QObject):
+    """合并应用内所有定时任务的调度器
+
+    只使用一个单次定时器，每次定在最早到期的任务上；定时器触发时
+    顺带执行 slack_ms 内将要到期的其他任务，尽量减少唤醒次数。
+    省电模式下重复任务改用各自的 idle_interval（None 则暂停），
+    合并窗口放宽到 idle_slack_ms。
+    """
+
+    def __init__(self, slack_ms=20, idle_slack_ms=1000, parent=None):
+        super().__init__(parent)
+        self.slack_ms = slack_ms
+        self.idle_slack_ms = idle_slack_ms
+        self.power_save = False
+        self.run_counts = {}  # 每个任务的执行次数
+        self._tasks = {}
+        self._wakeups = deque()  # 最近一分钟内每次唤醒的时间
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._on_timeout)
+
+    def call_later(self, name, delay_ms, callback):
+        """delay_ms 后执行一次；同名任务已存在时重新计时"""
+        self._tasks[name] = _Task(callback, time.monotonic() + delay_ms / 1000)
+        self._rearm()
+
+    def call_repeating(self, name, interval_ms, callback, idle_interval_ms=None):
+        """每隔 interval_ms 执行一次；省电模式下改为 idle_interval_ms，None 表示暂停"""
+        idle_interval = idle_interval_ms / 1000 if idle_interval_ms is not None else None
+        task = _Task(callback, 0, interval_ms / 1000, idle_interval)
+        task.due = time.monotonic() + self._interval_of(task)
+        self._tasks[name] = task
+        self._rearm()
+
+    def cancel(self, name):
+        if self._tasks.pop(name, None) is not None:
+            self._rearm()
+
+    def cancel_all(self):
+        self._tasks.clear()
+        self.timer.stop()
+
+    def is_scheduled(self, name):
+        return name in self._tasks
+
+    def set_power_save(self, enabled):
+        """切换省电模式，重复任务按新的间隔重新计时"""
+        if enabled == self.power_save:
+            return
+        self.power_save = enabled
+        now = time.monotonic()
+        for task in self._tasks.values():
+            if task.interval is not None:
+                task.due = now + self._interval_of(task)
+        self._rearm()
+
+    def wakeups_per_minute(self):
+        self._trim_wakeups(time.monotonic())
+        return len(self._wakeups)
+
+    def _interval_of(self, task):
+        if not self.power_save:
+            return task.interval
+        # 暂停的任务用无穷远的到期时间表示
+        return task.idle_interval if task.idle_interval is not None else float('inf')
+
+    def _rearm(self):
+        due = min((task.due for task in self._tasks.values()), default=float('inf'))
+        if due == float('inf'):
+            self.timer.stop()
+            return
+        delay = max(0, int((due - time.monotonic()) * 1000))
+        self.timer.start(delay)
+
+    def _on_timeout(self):
+        now = time.monotonic()
+        self._wakeups.append(now)
+        self._trim_wakeups(now)
+        slack = (self.idle_slack_ms if self.power_save else self.slack_ms) / 1000
+        due_names = [name for name, task in self._tasks.items() if task.due <= now + slack]
+        try:
+            for name in due_names:
+                task = self._tasks.get(name)
+                if task is None or task.due > now + slack:
+                    # 前面的任务回调里取消或重新安排了它
+                    continue
+                if task.interval is None:
+                    del self._tasks[name]
+                else:
+                    task.due = now + self._interval_of(task)
+                self.run_counts[name] = self.run_counts.get(name, 0) + 1
+                task.callback()
+        finally:
+            self._rearm()
+
+    def _trim_wakeups(self, now):
+        while self._wakeups and now - self._wakeups[0] > 60:
+            self._wakeups.popleft()
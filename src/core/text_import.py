@@ -0,0 +1,181 @@
+import codecs
+import os
+import re
+import tempfile
+import time
+from array import array
+
+from core.line_index import LineIndex, NEWLINE_LENGTH
+
+# 检测编码时读取的文件开头字节数
+SAMPLE_BYTES = 8 * 1024
+# 转码时每次读取的字节数，内存占用只与它有关，与文件大小无关
+IMPORT_CHUNK_SIZE = 1024 * 1024
+
+# 判断 UTF-16 字节序时视为正常文本的字符：ASCII、中文标点、常用汉字和全角字符
+_UTF16_TEXT_RE = re.compile('[\t\n\r -~\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]')
+
+_BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+
+def detect_encoding(sample):
+    """根据文件开头的字节猜测编码
+
+    先看 BOM；没有 BOM 但零字节较多时按 UTF-16 处理，字节序由 _guess_utf16_byte_order 判断，
+    否则能按 UTF-8 严格解码（样本末尾被截断的多字节字符不算错误）就是 UTF-8，
+    不能时按 GB18030 处理。样本之后的内容可能不符合猜测的编码，
+    import_text 转码时严格解码，UTF-8 解码失败时改按 GB18030 从头重新转码。
+    """
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+    even_zeros = sample[0::2].count(0)
+    odd_zeros = sample[1::2].count(0)
+    # 普通文本中没有零字节；有较多零字节时按两种字节序严格解码，取解码结果更像文本的一种
+    if even_zeros + odd_zeros > len(sample) // 100:
+        encoding = _guess_utf16_byte_order(sample)
+        if encoding is not None:
+            return encoding
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+    except UnicodeDecodeError:
+        # 中文小说最常见的是 GBK，GB18030 兼容 GBK 和 GB2312
+        return 'gb18030'
+    return 'utf-8'
+
+
+def _guess_utf16_byte_order(sample):
+    """返回 'utf-16-le' 或 'utf-16-be'，两种字节序都不能严格解码时返回 None
+
+    不能只看零字节落在哪一侧：ASCII 字符的零字节在高位，而“一”（U+4E00）这类
+    汉字的零字节在低位，中文为主的文本两侧都有零字节。字节序错误时解码出的大多是
+    其他文字或私用区字符，因此比较两种解码结果中 ASCII 和常用中文字符、标点的个数。
+    """
+    sample = sample[:len(sample) // 2 * 2]
+    best = None
+    for encoding in ('utf-16-le', 'utf-16-be'):
+        try:
+            text = codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+        except UnicodeDecodeError:
+            continue
+        score = len(_UTF16_TEXT_RE.findall(text))
+        if best is None or score > best[0]:
+            best = score, encoding
+    return best[1] if best is not None else None
+
+
+def sniff_encoding(file_path):
+    with open(file_path, 'rb') as f:
+        return detect_encoding(f.read(SAMPLE_BYTES))
+
+
+def is_utf8(encoding):
+    return encoding in ('utf-8', 'utf-8-sig')
+
+
+class ImportResult:
+    """一次导入的结果和吞吐量"""
+
+    __slots__ = ('source_path', 'target_path', 'encoding', 'bytes_read', 'bytes_written',
+                 'seconds', 'index')
+
+    def __init__(self, source_path, target_path, encoding, bytes_read, bytes_written, seconds, index):
+        self.source_path = source_path
+        self.target_path = target_path
+        self.encoding = encoding
+        self.bytes_read = bytes_read
+        self.bytes_written = bytes_written
+        self.seconds = seconds
+        self.index = index  # 导入后文件的行索引，打开时无需重新扫描
+
+    @property
+    def line_count(self):
+        return self.index.line_count
+
+    @property
+    def mb_per_s(self):
+        return self.bytes_read / 1024 / 1024 / max(self.seconds, 1e-9)
+
+
+def import_text(source_path, target_path, encoding=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """把外部文本文件转成 UTF-8 写到 target_path，返回 ImportResult
+
+    按 chunk_size 分块读取，用增量解码器转码，统一换行符后写入同目录的临时文件，
+    同时记录每行写出的字节数建立行索引，整个过程只读写各一遍。
+    encoding 为 None 时根据文件开头自动检测。解码是严格的：
+    检测为 UTF-8 的文件在后面解码失败时改按 GB18030 重新转码，
+    仍然失败（或指定的编码解码失败）时抛出 ValueError，不会写出含替换字符的文件。
+    """
+    started = time.perf_counter()
+    fallbacks = []
+    if encoding is None:
+        encoding = sniff_encoding(source_path)
+        if encoding == 'utf-8':
+            # 开头的样本全是 ASCII 时，后面的 GBK 内容只有转码时才会发现
+            fallbacks.append('gb18030')
+    while True:
+        try:
+            bytes_read, bytes_written, lengths = _transcode(source_path, target_path, encoding,
+                                                            chunk_size)
+            break
+        except UnicodeDecodeError:
+            if not fallbacks:
+                raise ValueError(f"文件中有无法按 {encoding.upper()} 解码的内容，已取消导入: "
+                                 f"{os.path.basename(source_path)}") from None
+            encoding = fallbacks.pop(0)
+    return ImportResult(source_path, target_path, encoding, bytes_read, bytes_written,
+                        time.perf_counter() - started, LineIndex.from_lengths(lengths))
+
+
+def _transcode(source_path, target_path, encoding, chunk_size):
+    """严格按 encoding 转码写到 target_path，返回 (读取字节数, 写出字节数, 每行长度)
+
+    解码失败时抛出 UnicodeDecodeError，临时文件被删除，target_path 保持不变。
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    lengths = array('Q')  # 每行写出的字节数（含换行符）
+    bytes_read = bytes_written = 0
+    carry = ''  # 上一块末尾还没遇到换行符的半行
+    pending_cr = False  # 上一块以 \r 结尾，可能与下一块开头的 \n 组成一个换行
+
+    def write_lines(target, text, final=False):
+        nonlocal carry, pending_cr, bytes_written
+        if pending_cr:
+            text = '\r' + text
+        pending_cr = not final and text.endswith('\r')
+        if pending_cr:
+            text = text[:-1]
+        lines = (carry + text).replace('\r\n', '\n').replace('\r', '\n').split('\n')
+        carry = '' if final else lines.pop()
+        if final and lines and not lines[-1]:
+            lines.pop()  # 文件以换行符结尾
+        if not lines:
+            return
+        data = ('\n'.join(lines) + '\n').encode('utf-8')
+        lengths.extend([len(line) + NEWLINE_LENGTH for line in data.split(b'\n')[:-1]])
+        if NEWLINE_LENGTH != 1:
+            data = data.replace(b'\n', os.linesep.encode('ascii'))
+        target.write(data)
+        bytes_written += len(data)
+
+    fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(target_path))
+    try:
+        with open(source_path, 'rb') as source, os.fdopen(fd, 'wb') as target:
+            for chunk in iter(lambda: source.read(chunk_size), b''):
+                bytes_read += len(chunk)
+                write_lines(target, decoder.decode(chunk))
+            write_lines(target, decoder.decode(b'', final=True), final=True)
+            target.flush()
+            os.fsync(target.fileno())
+        os.replace(temp_path, target_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return bytes_read, bytes_written, lengths
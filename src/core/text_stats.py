@@ -0,0 +1,139 @@
+import json
+import os
+import re
+from array import array
+
+from core.journal import file_signature
+from core.line_index import LineIndex, NEWLINE_LENGTH
+
+STATS_SUFFIX = '.stats'
+
+# 中日韩文字按字计词，其余文字按连续的字母数字计词
+_CJK = '㐀-䶿一-鿿豈-﫿぀-ヿ가-힯'
+_WORD_RE = re.compile(f'[{_CJK}]|[^\\W{_CJK}_]+')
+
+
+def stats_path_for(file_path):
+    return file_path + STATS_SUFFIX
+
+
+def count_line(line):
+    """一行的 (字数, 词数)：字数不计空白，中文每个字算一个词"""
+    return len(''.join(line.split())), len(_WORD_RE.findall(line))
+
+
+class WritingSession:
+    """本次运行以来所有文件的字数和词数净增量"""
+
+    def __init__(self):
+        self.chars = 0
+        self.words = 0
+
+
+class TextStats:
+    """文档的字数、词数和行数统计
+
+    保存每一行的字数和词数，作为 Document 的编辑监听器使用：
+    每次编辑只减去被替换行的计数、加上新行的计数，代价与修改的行数成正比。
+    统计结果可以保存在文件旁的 .stats 文件中，文件未变化时打开无需重新扫描。
+    普通文本文件还会在其中保存每行的字节数，读出后放在 line_index 中，
+    打开时不必再扫描一遍文件建立行索引。
+    """
+
+    def __init__(self, chars=None, words=None):
+        self._chars = chars if chars is not None else array('I')
+        self._words = words if words is not None else array('I')
+        self.chars = sum(self._chars)
+        self.words = sum(self._words)
+        self.session = None  # 设置后编辑的净增量同时计入 WritingSession
+        self.line_index = None  # 从缓存中读出的行索引，取走后应置为 None
+
+    @classmethod
+    def build(cls, lines):
+        chars = array('I')
+        words = array('I')
+        for line in lines:
+            line_chars, line_words = count_line(line)
+            chars.append(line_chars)
+            words.append(line_words)
+        return cls(chars, words)
+
+    @classmethod
+    def load(cls, file_path):
+        """读取文件旁的统计缓存，缓存不存在或与文件不符时返回 None"""
+        try:
+            with open(stats_path_for(file_path), 'rb') as f:
+                header = json.loads(f.readline())
+                if header.get('base') != file_signature(file_path):
+                    return None
+                chars = array('I')
+                words = array('I')
+                chars.fromfile(f, header['lines'])
+                words.fromfile(f, header['lines'])
+                line_index = None
+                if header.get('line_lengths'):
+                    lengths = array('Q')
+                    lengths.fromfile(f, header['lines'])
+                    line_index = LineIndex.from_lengths(lengths)
+                    # 末行没有换行符时行索引按有换行符计算，总长比文件多一个换行符
+                    if not 0 <= line_index.total_bytes - header['base']['size'] <= NEWLINE_LENGTH:
+                        line_index = None
+        except (OSError, ValueError, KeyError, EOFError):
+            return None
+        stats = cls(chars, words)
+        stats.line_index = line_index
+        return stats
+
+    @property
+    def line_count(self):
+        return len(self._chars)
+
+    def record(self, start, old_lines, new_lines):
+        """应用一次编辑，同时作为 Document 的编辑监听器使用"""
+        stop = start + len(old_lines)
+        old_chars = sum(self._chars[start:stop])
+        old_words = sum(self._words[start:stop])
+        chars = array('I')
+        words = array('I')
+        for line in new_lines:
+            line_chars, line_words = count_line(line)
+            chars.append(line_chars)
+            words.append(line_words)
+        self._chars[start:stop] = chars
+        self._words[start:stop] = words
+        delta_chars = sum(chars) - old_chars
+        delta_words = sum(words) - old_words
+        self.chars += delta_chars
+        self.words += delta_words
+        if self.session is not None:
+            self.session.chars += delta_chars
+            self.session.words += delta_words
+
+    def copy(self):
+        return TextStats(array('I', self._chars), array('I', self._words))
+
+    def save(self, file_path, line_index=None):
+        """把统计写到文件旁的缓存中，只应在文档内容与磁盘文件一致时调用
+
+        line_index 是与磁盘文件一致的行索引，提供时一起保存，调用期间不能再修改它。
+        """
+        path = stats_path_for(file_path)
+        header = {'base': file_signature(file_path), 'lines': len(self._chars)}
+        if line_index is not None and line_index.line_count == len(self._chars):
+            header['line_lengths'] = True
+        else:
+            line_index = None
+        with open(path + '.tmp', 'wb') as f:
+            f.write(json.dumps(header).encode('utf-8') + b'\n')
+            self._chars.tofile(f)
+            self._words.tofile(f)
+            if line_index is not None:
+                line_index.write_lengths(f)
+        os.replace(path + '.tmp', path)
+
+
+def remove_stats(file_path):
+    try:
+        os.remove(stats_path_for(file_path))
+    except OSError:
+        pass
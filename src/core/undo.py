@@ -0,0 +1,145 @@
+import time
+from collections import deque
+
+from core.instrumentation import metrics
+
+# 每行字符串的额外开销估算（字节）
+LINE_OVERHEAD = 56
+
+
+class EditDelta:
+    """一次编辑的增量：从 start 行开始，old_lines 被替换为 new_lines"""
+
+    __slots__ = ('start', 'old_lines', 'new_lines', 'size')
+
+    def __init__(self, start, old_lines, new_lines):
+        self.start = start
+        self.old_lines = old_lines
+        self.new_lines = new_lines
+        self.size = (sum(map(len, old_lines)) + sum(map(len, new_lines)) +
+                     LINE_OVERHEAD * (len(old_lines) + len(new_lines)))
+
+
+class UndoHistory:
+    """基于增量的撤销/重做历史
+
+    只保存每次编辑涉及的行，总大小超过 max_bytes 时丢弃最早的记录。
+    撤销和重做只需把增量反向或正向应用到文档上，代价与文件大小无关。
+    记录前把 merge_next 设为 True 时，merge_interval 秒内对同一段行的
+    连续修改（逐字输入）会合并成一条记录。
+
+    传入 HistoryStore 时每条记录同时写入磁盘上的历史，内存中只保留最近的部分
+    （recent 为打开时从磁盘预先读出的记录），更早的记录撤销到时再从磁盘读取。
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, merge_interval=1.0, store=None, recent=()):
+        self.max_bytes = max_bytes
+        self.merge_interval = merge_interval
+        self.merge_next = False
+        self.store = store
+        self._last_record = 0.0
+        self._undo = deque()
+        self._redo = deque()
+        self._undo_bytes = 0
+        self._applying = False
+        for delta in recent:
+            self._push(delta)
+
+    @property
+    def total_bytes(self):
+        return self._undo_bytes + sum(delta.size for delta in self._redo)
+
+    def can_undo(self):
+        if self.store is not None:
+            return self.store.cursor > 0
+        return bool(self._undo)
+
+    def can_redo(self):
+        if self.store is not None:
+            return self.store.cursor < self.store.count
+        return bool(self._redo)
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+        self._undo_bytes = 0
+        if self.store is not None:
+            self.store.clear()
+
+    def record(self, start, old_lines, new_lines):
+        """记录一次编辑，同时作为 Document 的编辑监听器使用"""
+        if self._applying:
+            return
+        merge, self.merge_next = self.merge_next, False
+        now = time.monotonic()
+        with metrics.timer('undo.record'):
+            if merge and self._can_merge(start, old_lines, now):
+                last = self._undo.pop()
+                self._undo_bytes -= last.size
+                delta = EditDelta(start, last.old_lines, list(new_lines))
+                if self.store is not None:
+                    self.store.replace_last(delta)
+                metrics.count('undo.merged')
+            else:
+                delta = EditDelta(start, list(old_lines), list(new_lines))
+                if self.store is not None:
+                    self.store.append(delta)
+            self._push(delta)
+        self._last_record = now
+        self._redo.clear()
+
+    def _can_merge(self, start, old_lines, now):
+        """新的修改是否紧接着上一条记录修改的同一段行"""
+        if not self._undo or self._redo or now - self._last_record > self.merge_interval:
+            return False
+        last = self._undo[-1]
+        return last.start == start and last.new_lines == list(old_lines)
+
+    def undo(self, document):
+        """撤销最近一次编辑，返回被撤销的增量"""
+        if self._undo:
+            delta = self._undo.pop()
+            self._undo_bytes -= delta.size
+        elif self.can_undo():
+            # 内存中的记录已用完，从磁盘上的历史中读取更早的记录
+            delta = self.store.read(self.store.cursor - 1)
+            metrics.count('undo.store_reads')
+        else:
+            return None
+        self._apply(document, delta.start, len(delta.new_lines), delta.old_lines)
+        if self.store is not None:
+            self.store.move(self.store.cursor - 1)
+        self._redo.append(delta)
+        return delta
+
+    def redo(self, document):
+        """重做最近一次撤销的编辑，返回重做的增量"""
+        if self._redo:
+            delta = self._redo.pop()
+        elif self.can_redo():
+            delta = self.store.read(self.store.cursor)
+            metrics.count('undo.store_reads')
+        else:
+            return None
+        self._apply(document, delta.start, len(delta.old_lines), delta.new_lines)
+        if self.store is not None:
+            self.store.move(self.store.cursor + 1)
+        self._push(delta)
+        return delta
+
+    def _push(self, delta):
+        self._undo.append(delta)
+        self._undo_bytes += delta.size
+        metrics.count('undo.pushes')
+        metrics.count('undo.bytes', delta.size)
+        # 超出预算时丢弃最早的记录，但至少保留最近一次
+        while self._undo_bytes > self.max_bytes and len(self._undo) > 1:
+            self._undo_bytes -= self._undo.popleft().size
+            metrics.count('undo.evicted')
+
+    def _apply(self, document, start, count, lines):
+        self._applying = True
+        try:
+            document.replace_lines(start, count, lines)
+        finally:
+            self._applying = False
@@ -1,11 +1,20 @@
 import sys
+from core.startup_probe import StartupProbe
+
+# 尽早开始计时，导入 Qt 和界面模块的时间也计入启动耗时
+probe = StartupProbe()
+
 from PyQt5.QtWidgets import QApplication
 from ui.main_window import FakeConsole
 
 def main():
+    probe.mark('imports')
     app = QApplication(sys.argv)
-    ex = FakeConsole()
+    probe.mark('app')
+    ex = FakeConsole(probe)
+    probe.mark('window')
     ex.show()
+    probe.mark('show')
     sys.exit(app.exec_())
 
 if __name__ == '__main__':
@@ -1,159 +1,80 @@
-import random
 import time
-from datetime import datetime
-from PyQt5.QtCore import QThread, pyqtSignal
 
-class DownloadThread(QThread):
-    update_signal = pyqtSignal(str)
+from PyQt5.QtCore import QObject
+
+from core.decoy_scenario import DecoyScenario
+from core.instrumentation import metrics
+from threads.output_buffer import OutputBuffer
+
+# 暂停后恢复时最多补输出多少秒的日志，更早的部分直接跳过
+FAST_FORWARD_LIMIT = 120
 
-    def __init__(self):
-        super().__init__()
-        self.running = True
-        self.total_files = 0
-        self.current_file = 0
-        self.base_speed = 5.0  # 基础下载速度（MB/s）
-        
-    def _get_dynamic_speed(self):
-        variation = random.uniform(-0.5, 0.5)
-        current_speed = self.base_speed + variation
-        if random.random() < 0.1:  # 10%概率发生较大波动
-            current_speed *= random.uniform(0.5, 1.5)
-        return f"{current_speed:.1f} MB/s"
-    
-    def _calculate_eta(self, file_size_mb, progress):
-        size = float(file_size_mb.split()[0])
-        remaining_size = size * (100 - progress) / 100
-        speed = float(self._get_dynamic_speed().split()[0])
-        eta_seconds = int(remaining_size / speed)
-        
-        if eta_seconds < 60:
-            return f"{eta_seconds} seconds"
-        elif eta_seconds < 3600:
-            return f"{eta_seconds // 60} minutes {eta_seconds % 60} seconds"
-        else:
-            hours = eta_seconds // 3600
-            minutes = (eta_seconds % 3600) // 60
-            return f"{hours} hours {minutes} minutes"
 
-    def run(self):
-        files = [
-            ('System Components', [
-                ('msvcrt.dll', '2.1 MB'), ('ntdll.dll', '4.8 MB'),
-                ('kernel32.dll', '3.2 MB'), ('user32.dll', '2.8 MB'),
-                ('shell32.dll', '5.7 MB'), ('advapi32.dll', '1.9 MB'),
-                ('gdi32.dll', '2.4 MB'), ('oleaut32.dll', '1.8 MB')
-            ]),
-            ('Device Drivers', [
-                ('nvlddmkm.sys', '185.4 MB'), ('USBXHCI.SYS', '12.8 MB'),
-                ('ACPI.sys', '8.7 MB'), ('volmgr.sys', '4.2 MB'),
-                ('tcpip.sys', '15.6 MB'), ('ndis.sys', '9.9 MB'),
-                ('disk.sys', '6.4 MB'), ('storahci.sys', '7.8 MB')
-            ]),
-            ('Security Updates', [
-                ('KB5032189.exe', '248.6 MB'), ('KB5032190.exe', '156.3 MB'),
-                ('KB5032192.exe', '324.1 MB'), ('SecurityUpdate.exe', '89.7 MB'),
-                ('CriticalUpdate.exe', '167.2 MB')
-            ])
-        ]
+class DownloadThread(QObject):
+    """在主线程中播放伪装下载日志
 
-        while self.running:
-            self._show_system_info()
-            
-            for category, file_list in files:
-                if not self._process_category(category, file_list):
-                    return
-            
-            self._show_cleanup_tasks()
-            
-            # 添加循环提示
-            self.update_signal.emit("\n[INFO] ====================================")
-            self.update_signal.emit("[INFO] Starting next update cycle...")
-            self.update_signal.emit("[INFO] ====================================\n")
-            time.sleep(2)  # 在开始新的循环前暂停2秒
+    日志由 DecoyScenario 生成器预先按 (延迟, 文本) 排好，这里按墙上时间
+    计算每一行的到期时刻，通过共享的 TaskScheduler 安排下一次输出。
+    窗口不可见时调用 stop() 暂停，再次 start() 时一次性补上暂停期间
+    本该输出的日志（最多 FAST_FORWARD_LIMIT 秒），看起来像一直在运行。
+    """
 
-    def _show_system_info(self):
-        self.update_signal.emit("[INFO] System Update Service Started")
-        self.update_signal.emit("[INFO] Initializing update components...")
-        time.sleep(1)
-        
-        system_info = [
-            "[INFO] Windows Version: Windows 10 Pro 21H2",
-            "[INFO] System Architecture: x64",
-            "[INFO] Processor: Intel(R) Core(TM) i7-10700K",
-            "[INFO] Memory: 16.0 GB RAM",
-            f"[INFO] System Drive: C:\ ({random.randint(50,200)} GB free of 512 GB)",
-            "[INFO] Network Adapter: Intel(R) Wi-Fi 6 AX201 160MHz"
-        ]
-        
-        for info in system_info:
-            self.update_signal.emit(info)
-            time.sleep(0.2)
+    TASK_NAME = 'decoy_output'
+
+    def __init__(self, scheduler, seed=None, parent=None):
+        super().__init__(parent)
+        # 输出先写入缓冲区，由界面按帧批量取走
+        self.output = OutputBuffer()
+        self.scenario = DecoyScenario(seed)
+        self.scheduler = scheduler
+        self.running = False
+        self.fast_forwarded = 0  # 恢复时补输出的行数
+        self._events = None
+        self._pending = None  # 下一条等待输出的文本
+        self._due = 0.0  # 下一条文本的到期时刻
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        now = time.monotonic()
+        if self._events is None:
+            self._events = self.scenario.events()
+            self._due = now
+            self._catch_up(now)
+            return
+        earliest = now - FAST_FORWARD_LIMIT
+        if self._due < earliest:
+            # 暂停太久时只补最近一段日志，其余时间直接跳过
+            self.scenario.skip(earliest - self._due)
+            self._due = earliest
+        self.fast_forwarded += self._catch_up(now)
 
-    def _process_category(self, category, file_list):
-        self.update_signal.emit(f"\n[INFO] Processing {category}...")
-        self.update_signal.emit(f"[INFO] Found {len(file_list)} components to update")
-        time.sleep(1)
-        
-        for file, size in file_list:
-            if not self.running:
-                return False
-                
-            if not self._process_file(file, size):
-                return False
-                
-        self.update_signal.emit(f"[SUCCESS] {category} processing completed")
-        self.update_signal.emit(f"[INFO] Verifying system stability...")
-        time.sleep(1)
-        self.update_signal.emit(f"[SUCCESS] System stable after {category} update\n")
-        return True
+    def stop(self):
+        """暂停输出，进度保留到下一次 start()"""
+        self.running = False
+        self.scheduler.cancel(self.TASK_NAME)
 
-    def _process_file(self, file, size):
-        self.update_signal.emit(f"[INFO] Verifying: {file}")
-        self.update_signal.emit(f"[INFO] Component size: {size}")
-        time.sleep(0.5)
-        
-        if random.random() < 0.2:  # 20%概率需要重试
-            self.update_signal.emit(f"[WARNING] Connection timeout while downloading {file}")
-            self.update_signal.emit("[INFO] Retrying in 3 seconds...")
-            time.sleep(3)
-        
-        for percentage in range(0, 101, 2):
-            if not self.running:
-                return False
-                
-            progress = '█' * (percentage // 5) + '░' * (20 - percentage // 5)
-            current_time = datetime.now().strftime('%H:%M:%S')
-            speed = self._get_dynamic_speed()
-            
-            if percentage < 100:
-                eta = self._calculate_eta(size, percentage)
-                details = f"\r[{current_time}] {file} - [{progress}] {percentage}% - {speed} - ETA: {eta}"
-            else:
-                details = f"\r[{current_time}] {file} - [{progress}] 100% - Download Complete - Total size: {size}"
-            
-            self.update_signal.emit(details)
-            time.sleep(0.1)
-        
-        self.update_signal.emit("")
-        self.update_signal.emit(f"[INFO] Installing {file}...")
-        time.sleep(0.3)
-        self.update_signal.emit(f"[SUCCESS] Installation completed for {file}\n")
-        time.sleep(0.5)
-        return True
+    def _on_timeout(self):
+        if self.running:
+            with metrics.timer('decoy.catch_up'):
+                self._catch_up(time.monotonic())
 
-    def _show_cleanup_tasks(self):
-        cleanup_tasks = [
-            "[INFO] Finalizing system updates...",
-            "[INFO] Cleaning up temporary files...",
-            "[INFO] Updating system registry...",
-            "[INFO] Verifying system integrity...",
-            "[SUCCESS] System integrity check passed",
-            "[SUCCESS] All updates have been installed successfully",
-            "[INFO] System is up to date and secure"
-        ]
-        
-        for task in cleanup_tasks:
-            if not self.running:
+    def _catch_up(self, now):
+        """输出所有已经到期的行并安排下一行，返回输出的行数"""
+        # 调度器会提前 slack_ms 执行任务，这段时间内到期的行视为已到期
+        deadline = now + self.scheduler.slack_ms / 1000
+        emitted = 0
+        while True:
+            if self._pending is None:
+                delay, self._pending = next(self._events)
+                self._due += delay
+            if self._due > deadline:
                 break
-            self.update_signal.emit(task)
-            time.sleep(random.uniform(0.5, 1.2)) 
\ No newline at end of file
+            self.output.push(self._pending)
+            self._pending = None
+            emitted += 1
+        self.scheduler.call_later(self.TASK_NAME, (self._due - now) * 1000, self._on_timeout)
+        metrics.count('decoy.wakeups')
+        metrics.count('decoy.lines', emitted)
+        return emitted
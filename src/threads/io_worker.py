@@ -0,0 +1,52 @@
+import queue
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from core.disk_io import IORequest, IOStats
+from core.instrumentation import metrics
+
+class IOWorker(QThread):
+    """专用的磁盘 I/O 线程
+
+    请求按提交顺序在后台执行，完成后通过信号回到界面线程调用回调，
+    界面线程永远不会因为磁盘读写而卡住。
+    """
+    request_finished = pyqtSignal(object)
+    request_failed = pyqtSignal(object)
+
+    def __init__(self):
+        super().__init__()
+        self._queue = queue.Queue()
+        self.stats = IOStats()
+        self.request_finished.connect(self._dispatch)
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def submit(self, name, fn, *args, callback=None):
+        """提交一个请求，callback 在界面线程中以请求对象为参数调用"""
+        request = IORequest(name, fn, args, callback, self._queue.qsize())
+        self._queue.put(request)
+        return request
+
+    def run(self):
+        while True:
+            request = self._queue.get()
+            if request is None:
+                break
+            request.execute()
+            self.request_finished.emit(request)
+
+    def stop(self):
+        """执行完已排队的请求后退出线程"""
+        self._queue.put(None)
+        self.wait()
+
+    def _dispatch(self, request):
+        self.stats.record(request)
+        if request.callback is not None:
+            # 回调在界面线程中执行，单独统计
+            with metrics.timer(f'io.callback.{request.name}'):
+                request.callback(request)
+        elif request.error is not None:
+            self.request_failed.emit(request)
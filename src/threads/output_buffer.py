@@ -0,0 +1,36 @@
+import threading
+from PyQt5.QtCore import QObject, pyqtSignal
+
+class OutputBuffer(QObject):
+    """后台线程向界面输送输出行的缓冲区
+
+    生产者只在加锁的列表中追加行，缓冲区由空变为非空时发出一次
+    data_ready 信号；界面每帧最多取走一次全部内容。连续的 \\r 进度行
+    只保留最后一行，因为它们最终都会覆盖同一行。
+    """
+    data_ready = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._lines = []
+        self.pushed = 0      # 累计写入的行数
+        self.coalesced = 0   # 被后续进度行覆盖而无需显示的行数
+
+    def push(self, text):
+        with self._lock:
+            self.pushed += 1
+            if text.startswith('\r') and self._lines and self._lines[-1].startswith('\r'):
+                self._lines[-1] = text
+                self.coalesced += 1
+                return
+            notify = not self._lines
+            self._lines.append(text)
+        if notify:
+            self.data_ready.emit()
+
+    def drain(self):
+        """取走当前缓冲的所有行"""
+        with self._lock:
+            lines, self._lines = self._lines, []
+        return lines
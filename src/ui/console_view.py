@@ -0,0 +1,77 @@
+from PyQt5.QtWidgets import QPlainTextEdit
+from PyQt5.QtGui import QTextCharFormat, QColor, QTextCursor
+
+from core.instrumentation import metrics
+
+# 按标记区分的行颜色，未匹配的行使用默认颜色
+LINE_COLORS = [
+    ('[ERROR]', '#ff5555'),
+    ('[WARNING]', '#ffb86c'),
+    ('[SUCCESS]', '#50fa7b'),
+    ('[INFO]', '#8be9fd'),
+]
+DEFAULT_COLOR = '#f8f8f2'
+
+
+class ConsoleView(QPlainTextEdit):
+    """有回滚上限的控制台输出视图
+
+    基于 QPlainTextEdit 的纯文本布局，超过 max_scrollback 行后最早的行
+    会从文档开头整块移除，内存和插入耗时都不会随运行时间增长。
+    各种颜色的字符格式只创建一次，所有行共享。
+    """
+
+    def __init__(self, max_scrollback=5000, parent=None):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setUndoRedoEnabled(False)
+        self.setMaximumBlockCount(max_scrollback)
+
+        self._formats = []
+        for tag, color in LINE_COLORS:
+            self._formats.append((tag, self._make_format(color)))
+        self._default_format = self._make_format(DEFAULT_COLOR)
+
+    @staticmethod
+    def _make_format(color):
+        text_format = QTextCharFormat()
+        text_format.setForeground(QColor(color))
+        return text_format
+
+    def set_max_scrollback(self, lines):
+        self.setMaximumBlockCount(lines)
+
+    def format_for(self, text):
+        """返回与文本标记对应的共享字符格式"""
+        for tag, text_format in self._formats:
+            if tag in text:
+                return text_format
+        return self._default_format
+
+    def insert_text(self, text):
+        """在末尾插入文本"""
+        with metrics.timer('console.insert_text'):
+            cursor = QTextCursor(self.document())
+            cursor.movePosition(QTextCursor.End)
+            cursor.insertText(text, self.format_for(text))
+
+    def write_lines(self, lines):
+        """在一个编辑块中写入一批输出行，\r 开头的行原地更新最后一行"""
+        metrics.count('console.lines', len(lines))
+        with metrics.timer('console.write_lines'):
+            cursor = QTextCursor(self.document())
+            cursor.beginEditBlock()
+            for text in lines:
+                cursor.movePosition(QTextCursor.End)
+                if text.startswith('\r'):
+                    text = text.lstrip('\r')
+                    cursor.movePosition(QTextCursor.StartOfBlock, QTextCursor.KeepAnchor)
+                    cursor.insertText(text, self.format_for(text))
+                else:
+                    cursor.insertText(text + '\n', self.format_for(text))
+            cursor.endEditBlock()
+            self.scroll_to_bottom()
+
+    def scroll_to_bottom(self):
+        scroll_bar = self.verticalScrollBar()
+        scroll_bar.setValue(scroll_bar.maximum())
@@ -1,12 +1,51 @@
-from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QTextEdit, 
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QPlainTextEdit, 
                            QLabel, QPushButton, QHBoxLayout)
 from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtGui import QTextCursor
+
+# 滚动到距离边缘多少行以内时请求载入下一块
+PREFETCH_MARGIN = 200
+# QTextCursor.selectedText() 中表示换行的段落分隔符
+PARAGRAPH_SEPARATOR = '\u2029'
+
+
+class TextChange:
+    """编辑器中的一次修改
+
+    position/removed/inserted 是 QTextDocument.contentsChange 给出的字符级修改，
+    first_line/removed_lines/new_lines 是换算后的行级修改（相对窗口）：
+    窗口中从 first_line 开始的 old_count 行被替换为 new_lines。
+    """
+
+    __slots__ = ('position', 'removed', 'inserted', 'first_line', 'old_count', 'new_lines')
+
+    def __init__(self, position, removed, inserted, first_line, old_count, new_lines):
+        self.position = position
+        self.removed = removed
+        self.inserted = inserted
+        self.first_line = first_line
+        self.old_count = old_count
+        self.new_lines = new_lines
 
 class EditorPanel(QWidget):
-    content_changed = pyqtSignal(str)
+    """只显示文档中一段连续行（窗口）的编辑器面板
+
+    窗口覆盖文档的 [window_start, window_start + window_count) 行，
+    滚动接近窗口边缘时发出 more_requested(-1/1)，由主窗口在后台读取
+    移动后的一段行，再调用 set_window 整体重新显示；同一文件重新显示时
+    光标留在原来的文档行和列上。
+    """
+
+    content_changed = pyqtSignal(object)  # TextChange
+    more_requested = pyqtSignal(int)  # -1 向上载入，1 向下载入
     
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.title = "未打开文件"
+        self.window_start = 0
+        self.window_count = 0
+        self.total_lines = 0
+        self._block_count = 1  # 上一次修改后的文本块数
         self.setup_ui()
         
     def setup_ui(self):
@@ -52,9 +91,9 @@ class EditorPanel(QWidget):
         title_layout.addWidget(close_btn)
         
         # 编辑器
-        self.editor = QTextEdit()
+        self.editor = QPlainTextEdit()
         self.editor.setStyleSheet("""
-            QTextEdit {
+            QPlainTextEdit {
                 background-color: #1E1E1E;
                 color: #D4D4D4;
                 border: none;
@@ -63,17 +102,99 @@ class EditorPanel(QWidget):
                 padding: 5px;
             }
         """)
-        self.editor.textChanged.connect(self._on_text_changed)
+        self.editor.document().contentsChange.connect(self._on_contents_change)
+        self.editor.verticalScrollBar().valueChanged.connect(self._on_scrolled)
         
         layout.addWidget(title_bar)
         layout.addWidget(self.editor)
         
-    def _on_text_changed(self):
-        self.content_changed.emit(self.editor.toPlainText())
+    def _on_contents_change(self, position, removed, added):
+        """把字符级修改换算成行级修改，只读取受影响的那几行"""
+        document = self.editor.document()
+        block_count = document.blockCount()
+        end = min(position + added, document.characterCount() - 1)
+        cursor = QTextCursor(document)
+        cursor.setPosition(position)
+        cursor.setPosition(end, QTextCursor.KeepAnchor)
+        inserted = cursor.selectedText()
+        added_lines = inserted.count(PARAGRAPH_SEPARATOR)
+        removed_lines = self._block_count - block_count + added_lines
+        self._block_count = block_count
+        
+        block = document.findBlock(position)
+        first_line = block.blockNumber()
+        new_lines = []
+        for _ in range(added_lines + 1):
+            new_lines.append(block.text())
+            block = block.next()
+        # 空窗口也有一个空文本块，它并不对应文档中的行
+        old_count = min(removed_lines + 1, self.window_count - first_line)
+        self.content_changed.emit(TextChange(
+            position, removed, inserted.replace(PARAGRAPH_SEPARATOR, '\n'),
+            first_line, max(0, old_count), new_lines))
         
     def set_content(self, title, content):
-        self.title_label.setText(title)
-        self.editor.setPlainText(content)
+        self.set_window(title, content.splitlines(), 0, None, top_line=0)
+
+    def set_window(self, title, lines, start, total_lines, top_line=None):
+        """显示从 start 行开始的 lines，total_lines 为文档总行数
+
+        top_line 为滚动后位于顶部的文档行号，为 None 时滚动到末尾并把光标移到末尾。
+        """
+        cursor = self.editor.textCursor()
+        cursor_line = self.window_start + cursor.blockNumber()
+        cursor_column = cursor.positionInBlock()
+        keep_cursor = top_line is not None and title == self.title and self.window_count
+        self.title = title
+        self.window_start = start
+        self.window_count = len(lines)
+        self.total_lines = total_lines if total_lines is not None else len(lines)
+        self.editor.setPlainText('\n'.join(lines))
+        self._block_count = self.editor.document().blockCount()
+        scroll_bar = self.editor.verticalScrollBar()
+        if top_line is None:
+            self.editor.moveCursor(QTextCursor.End)
+            scroll_bar.setValue(scroll_bar.maximum())
+        else:
+            if keep_cursor and start <= cursor_line < start + len(lines):
+                block = self.editor.document().findBlockByNumber(cursor_line - start)
+                cursor = QTextCursor(block)
+                cursor.setPosition(block.position() + min(cursor_column, block.length() - 1))
+                self.editor.setTextCursor(cursor)
+            # QPlainTextEdit 的滚动条以文本块（行）为单位
+            scroll_bar.setValue(top_line - start)
+        self._update_title()
+
+    def top_line(self):
+        """当前显示在顶部的文档行号"""
+        return self.window_start + self.editor.verticalScrollBar().value()
+
+    def set_window_count(self, count, total_lines):
+        """修改应用到文档后更新窗口覆盖的行数"""
+        self.window_count = count
+        self.total_lines = total_lines
+        self._update_title()
+
+    @property
+    def window_end(self):
+        return self.window_start + self.window_count
+
+    def _update_title(self):
+        if self.total_lines > self.window_count:
+            self.title_label.setText(
+                f"{self.title}（第 {self.window_start + 1}-{self.window_end} 行，"
+                f"共 {self.total_lines} 行）")
+        else:
+            self.title_label.setText(self.title)
+
+    def _on_scrolled(self, value):
+        scroll_bar = self.editor.verticalScrollBar()
+        margin = min(PREFETCH_MARGIN, self.window_count // 4)
+        if value <= margin and self.window_start > 0:
+            self.more_requested.emit(-1)
+        elif (scroll_bar.maximum() - value <= margin and
+              self.window_end < self.total_lines):
+            self.more_requested.emit(1)
         
     def get_content(self):
         return self.editor.toPlainText() 
\ No newline at end of file
@@ -0,0 +1,180 @@
+import os
+from datetime import datetime
+
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QFileSystemWatcher
+
+from core.novel_files import scan_novel_directory, refresh_novel_directory
+
+# 排序方式：键 -> (排序函数, 是否倒序)
+SORT_KEYS = {
+    'name': (lambda entry: entry.name.lower(), False),
+    'mtime': (lambda entry: entry.mtime, True),
+    'size': (lambda entry: entry.size, True),
+}
+
+
+class NovelFileModel(QAbstractListModel):
+    """小说目录的文件列表模型
+
+    设置根目录时用 os.scandir 扫描一次并缓存每个文件的大小和修改时间；
+    之后由 QFileSystemWatcher 通知目录变化，合并一段时间后只对新出现的文件、
+    hot_names 中正在写入的文件和 mark_changed 报告过的文件读取属性，
+    按差异插入、删除或更新行，不会整体重置模型。扫描都在 I/O 线程中执行。
+    """
+
+    REFRESH_TASK = 'file_list_refresh'
+
+    def __init__(self, io, scheduler, refresh_delay_ms=500, parent=None):
+        super().__init__(parent)
+        self.io = io
+        self.scheduler = scheduler
+        self.refresh_delay_ms = refresh_delay_ms
+        self.root_path = None
+        self.sort_key = 'name'
+        self.hot_names = set()  # 刷新时总是重新读取属性的文件
+        self._changed_names = set()  # 后台写回过、下次刷新时重新读取一次属性的文件
+        self._entries = {}
+        self._rows = []
+        self._refreshing = False
+        self._refresh_again = False
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self._on_directory_changed)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._rows):
+            return None
+        entry = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            return entry.name
+        if role == Qt.ToolTipRole:
+            modified = datetime.fromtimestamp(entry.mtime).strftime('%Y-%m-%d %H:%M')
+            return f"{entry.size / 1024:.1f} KB，修改于 {modified}"
+        return None
+
+    def filePath(self, index):
+        if not index.isValid() or index.row() >= len(self._rows):
+            return ''
+        return self._rows[index.row()].path
+
+    def set_root_path(self, path):
+        """切换目录并完整扫描一次"""
+        if self.root_path:
+            self.watcher.removePath(self.root_path)
+        self.root_path = path
+        self.watcher.addPath(path)
+        self.scheduler.cancel(self.REFRESH_TASK)
+        self.io.submit('scan_dir', scan_novel_directory, path,
+                       callback=lambda request: self._on_scanned(path, request))
+
+    def set_sort_key(self, key):
+        if key == self.sort_key or key not in SORT_KEYS:
+            return
+        self.sort_key = key
+        self.layoutAboutToBeChanged.emit()
+        self._sort_rows()
+        self.layoutChanged.emit()
+
+    def set_hot_file(self, path):
+        """标记正在写入的文件，目录刷新时重新读取它的大小和修改时间"""
+        self.hot_names = {os.path.basename(path)} if path else set()
+
+    def mark_changed(self, path):
+        """文件在后台写回、新建或删除后调用（例如缓存淘汰时的写回、导出），下次刷新时重新读取它的属性"""
+        if self.root_path is None or (os.path.normpath(os.path.dirname(path)) !=
+                                      os.path.normpath(self.root_path)):
+            return
+        self._changed_names.add(os.path.basename(path))
+        # 原地写入不一定触发目录变化的通知，主动安排一次刷新
+        self.scheduler.call_later(self.REFRESH_TASK, self.refresh_delay_ms, self.refresh)
+
+    def _on_scanned(self, path, request):
+        if path != self.root_path or request.error is not None:
+            return
+        self.beginResetModel()
+        self._entries = request.result
+        self._rows = list(self._entries.values())
+        self._sort_rows()
+        self.endResetModel()
+
+    def _on_directory_changed(self, path):
+        # 保存时目录会连续变化多次，合并后再刷新
+        self.scheduler.call_later(self.REFRESH_TASK, self.refresh_delay_ms, self.refresh)
+
+    def refresh(self):
+        """在 I/O 线程中增量刷新目录"""
+        if self.root_path is None:
+            return
+        if self._refreshing:
+            self._refresh_again = True
+            return
+        self._refreshing = True
+        path = self.root_path
+        changed_names, self._changed_names = self._changed_names, set()
+        self.io.submit('refresh_dir', refresh_novel_directory, path,
+                       dict(self._entries), self.hot_names | changed_names,
+                       callback=lambda request: self._on_refreshed(path, changed_names, request))
+
+    def _on_refreshed(self, path, changed_names, request):
+        self._refreshing = False
+        if request.error is not None and path == self.root_path:
+            self._changed_names |= changed_names
+        if path == self.root_path and request.error is None:
+            changed, removed = request.result
+            self._apply_changes(changed, removed)
+        if self._refresh_again:
+            self._refresh_again = False
+            self.refresh()
+
+    def _apply_changes(self, changed, removed):
+        for name in removed:
+            entry = self._entries.pop(name, None)
+            if entry is None:
+                continue
+            row = self._rows.index(entry)
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._rows[row]
+            self.endRemoveRows()
+        key = SORT_KEYS[self.sort_key][0]
+        for entry in changed:
+            old = self._entries.get(entry.name)
+            if old is not None and key(old) == key(entry):
+                # 排序位置不变，原地更新
+                row = self._rows.index(old)
+                self._entries[entry.name] = entry
+                self._rows[row] = entry
+                index = self.index(row)
+                self.dataChanged.emit(index, index)
+                continue
+            if old is not None:
+                row = self._rows.index(old)
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self._rows[row]
+                self.endRemoveRows()
+            self._entries[entry.name] = entry
+            row = self._insert_position(entry)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self._rows.insert(row, entry)
+            self.endInsertRows()
+
+    def _insert_position(self, entry):
+        """按当前排序方式找到 entry 应插入的行"""
+        key, reverse = SORT_KEYS[self.sort_key]
+        value = key(entry)
+        low, high = 0, len(self._rows)
+        while low < high:
+            middle = (low + high) // 2
+            other = key(self._rows[middle])
+            if (other > value) if reverse else (other <= value):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _sort_rows(self):
+        key, reverse = SORT_KEYS[self.sort_key]
+        self._rows.sort(key=key, reverse=reverse)
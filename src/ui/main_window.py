@@ -1,33 +1,49 @@
 import os
+import time
 from datetime import datetime
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, 
-                            QTextEdit, QLineEdit, QShortcut, QLabel, QScrollArea, QFrame, QPushButton, QHBoxLayout, QFileDialog, QTextBrowser, QDialog, QGroupBox, QDialogButtonBox, QCheckBox, QTabWidget, QGridLayout)
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QIcon, QTextCharFormat, QColor, QTextCursor, QKeySequence
+                            QTextEdit, QLineEdit, QShortcut, QLabel, QScrollArea, QFrame, QPushButton, QHBoxLayout, QFileDialog, QTextBrowser, QDialog, QGroupBox, QDialogButtonBox, QCheckBox, QTabWidget, QGridLayout, QComboBox, QApplication)
+from PyQt5.QtCore import Qt, QEvent
+from PyQt5.QtGui import QIcon, QKeySequence
 
 from core.settings import Settings
 from core.file_manager import FileManager
-from threads.download_thread import DownloadThread
-from ui.toolbar import ToolBar
+from core.save_scheduler import SaveScheduler
+from core.task_scheduler import TaskScheduler
+from core.search_index import SearchIndex
+from core.instrumentation import metrics
+from core.startup_probe import StartupProbe
+from threads.io_worker import IOWorker
 from ui.styles import MAIN_WINDOW_STYLE, CONSOLE_STYLE, INPUT_LINE_STYLE
-from ui.editor_panel import EditorPanel
+from ui.console_view import ConsoleView
 
 class FakeConsole(QMainWindow):
-    def __init__(self):
+    def __init__(self, startup_probe=None):
         super().__init__()
         self.setWindowFlags(Qt.Window)
+        self.startup_probe = startup_probe or StartupProbe()
         
-        # 初始化撤销栈
-        self.undo_stack = []
-        self.max_undo_steps = 50  # 最大撤销步数
-        
-        # 初始化核心组件
+        # 初始化核心组件，所有磁盘读写都交给后台 I/O 线程
         self.settings = Settings()
-        self.file_manager = FileManager(self.settings)
+        metrics.set_enabled(self.settings.load_instrumentation())
+        self.io_worker = IOWorker()
+        self.io_worker.request_failed.connect(
+            lambda request: self._format_and_insert_text(f"[ERROR] 磁盘操作失败: {str(request.error)}"))
+        self.io_worker.start()
+        self.file_manager = FileManager(self.settings, self.io_worker)
+        self.file_manager.error_handler = (
+            lambda e: self._format_and_insert_text(f"[ERROR] 保存失败: {str(e)}"))
+        
+        # 全文索引在单独的后台线程中建立和更新，只有读取小说文件的步骤排进 I/O 线程，
+        # 不会在写回替换文件的同时映射它
+        self.index_worker = IOWorker()
+        self.index_worker.start()
+        self.search_index = SearchIndex(self.file_manager.novel_dir, self.io_worker)
+        self.search_hits = []  # 最近一次 /find 的结果，供 /go 跳转
+        self.file_manager.file_listeners.append(self._on_novel_file_changed)
         
         # 添加行编辑相关的属性
         self.current_line_number = -1  # 当前编辑的行号，-1表示新行
-        self.file_lines = []  # 文件的所有行
         
         self.initUI()
         self.loadSettings()
@@ -35,32 +51,94 @@ class FakeConsole(QMainWindow):
         # 设置窗口图标
         self.setWindowIcon(QIcon(r'C:\Windows\System32\cmd.exe'))
         
-        # 设置自动保存
-        self.auto_save_timer = QTimer()
-        self.auto_save_timer.timeout.connect(self.auto_save)
-        self.auto_save_timer.start(60000)  # 每60秒自动保存
+        # 所有定时任务共用一个调度器，窗口不可见或失去焦点时进入省电模式
+        self.scheduler = TaskScheduler(parent=self)
         
-        # 启动假下载线程
-        self.download_thread = DownloadThread()
-        self.download_thread.update_signal.connect(self.update_download_info)
-        self.download_thread.start()
+        # 设置自动保存：每60秒一次，省电模式下每5分钟一次
+        self.scheduler.call_repeating('auto_save', 60000, self.auto_save,
+                                      idle_interval_ms=300000)
         
-        # 创建并初始化工具栏和编辑器面板
-        self.toolbar_widget = ToolBar(self)
-        self.editor_panel = EditorPanel(self)
-        self.editor_panel.content_changed.connect(self.on_editor_content_changed)
+        # 字数统计随编辑增量更新，状态栏合并刷新
+        self._status_message = ''
+        self.file_manager.stats_handler = lambda stats: self.scheduler.call_later(
+            'stats_label', 100, self._refresh_status_label)
         
-        # 设置工具栏位置
-        self.toolbar_widget.move(0, 0)
-        self.toolbar_widget.show()
+        # 工具栏、假下载日志和索引建立都推迟到控制台第一次绘制之后，
+        # 编辑器面板在第一次显示内容时才创建
+        self.toolbar_widget = None
+        self.download_thread = None
+        self._editor_panel = None
+        self._startup_finished = False
+        self.console.viewport().installEventFilter(self)
+        # 窗口以最小化状态启动时不会绘制，稍后照常完成启动
+        self.scheduler.call_later('finish_startup', 1000, self._finish_startup)
+        
+        self.settings.changed.connect(self._on_setting_changed)
+        self._is_updating_editor = False
+        self._editor_loading = False
         
-        # 设置编辑器面板位置
-        self.editor_panel.hide()
+        # 编辑器面板的修改逐条应用到文档，持久化合并后延迟进行
+        self.editor_save_scheduler = SaveScheduler(
+            self._persist_document,
+            quiet_ms=self.settings.load_save_quiet_period(),
+            max_delay_ms=self.settings.load_save_max_delay(),
+            error_handler=lambda e: self._format_and_insert_text(f"[ERROR] 保存失败: {str(e)}"),
+            parent=self
+        )
         
         # 初始状态下禁用输入
         self.input_line.setEnabled(False)
         self.input_line.setPlaceholderText("请先创建或打开文件")
 
+    def eventFilter(self, watched, event):
+        if (event.type() == QEvent.Paint and not self._startup_finished and
+                watched is self.console.viewport()):
+            # 控制台已经画出第一帧，在下一轮事件循环中完成其余的初始化
+            watched.removeEventFilter(self)
+            self.startup_probe.mark('first_frame')
+            self.scheduler.call_later('finish_startup', 0, self._finish_startup)
+        return super().eventFilter(watched, event)
+
+    def _finish_startup(self):
+        """第一帧之后再创建工具栏、启动假下载日志和索引建立"""
+        if self._startup_finished:
+            return
+        self._startup_finished = True
+        self.console.viewport().removeEventFilter(self)
+        self._create_toolbar()
+        
+        # 启动假下载日志，窗口不可见时暂停
+        from threads.download_thread import DownloadThread
+        self.download_thread = DownloadThread(self.scheduler, parent=self)
+        self.download_thread.output.data_ready.connect(self._schedule_console_frame)
+        self._update_power_mode()
+        
+        self._sync_search_index()
+        self.startup_probe.mark('deferred')
+        for phase, seconds in self.startup_probe.phases:
+            metrics.record(f'startup.{phase}', seconds)
+        self._format_and_insert_text(f"[INFO] {self.startup_probe.report()}")
+
+    def _create_toolbar(self):
+        from ui.toolbar import ToolBar
+        self.toolbar_widget = ToolBar(self)
+        self.toolbar_widget.setGeometry(0, 0, 250, self.height())
+        self.toolbar_widget.show()
+
+    @property
+    def editor_panel(self):
+        """编辑器面板，第一次使用时创建"""
+        if self._editor_panel is None:
+            from ui.editor_panel import EditorPanel
+            self._editor_panel = EditorPanel(self)
+            self._editor_panel.content_changed.connect(self.on_editor_content_changed)
+            self._editor_panel.more_requested.connect(self.load_editor_chunk)
+            self._editor_panel.hide()
+        return self._editor_panel
+
+    def editor_panel_visible(self):
+        return self._editor_panel is not None and self._editor_panel.isVisible()
+
     def initUI(self):
         # 设置窗口
         self.setWindowTitle('C:\Windows\System32\cmd.exe')
@@ -74,8 +152,7 @@ class FakeConsole(QMainWindow):
         layout.setSpacing(0)
         
         # 创建控制台显示区域
-        self.console = QTextEdit()
-        self.console.setReadOnly(True)
+        self.console = ConsoleView(self.settings.load_console_scrollback())
         self.console.setStyleSheet(CONSOLE_STYLE)
         layout.addWidget(self.console)
         
@@ -125,6 +202,7 @@ class FakeConsole(QMainWindow):
             ('save', self.manual_save),
             ('show_content', self.show_current_content),
             ('undo', self.undo_last_input),
+            ('redo', self.redo_last_input),
             ('close_editor', self.close_editor_panel)
         ]
         
@@ -134,55 +212,38 @@ class FakeConsole(QMainWindow):
                 shortcut = QShortcut(QKeySequence(key), self)
                 shortcut.activated.connect(callback)
                 self._shortcuts.append(shortcut)
+        
+        # 隐藏的快捷键：导出性能统计，不出现在设置中
+        shortcut = QShortcut(QKeySequence('Ctrl+Shift+F12'), self)
+        shortcut.activated.connect(self.dump_stats)
+        self._shortcuts.append(shortcut)
 
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
-        if hasattr(self, 'toolbar_widget'):
+        if getattr(self, 'toolbar_widget', None) is not None:
             # 将工具栏放在左边，并且高度与窗口一致
             self.toolbar_widget.setGeometry(
                 0, 0, 250, self.height()
             )
-            # 调整编辑器面板位置
-            if hasattr(self, 'editor_panel'):
-                self.editor_panel.move(
-                    self.width() - self.editor_panel.width() - 10,
-                    50
-                )
-
-    def update_download_info(self, text):
-        """处理下载信息的显示"""
-        if text.startswith('\r'):
-            cursor = self.console.textCursor()
-            cursor.movePosition(QTextCursor.End)
-            cursor.movePosition(QTextCursor.StartOfLine, QTextCursor.KeepAnchor)
-            cursor.removeSelectedText()
-            self._insert_download_text(text.lstrip('\r'))
-        else:
-            self._insert_download_text(text + '\n')
-        
-        self.console.verticalScrollBar().setValue(
-            self.console.verticalScrollBar().maximum()
-        )
+        # 调整编辑器面板位置
+        if getattr(self, '_editor_panel', None) is not None:
+            self._editor_panel.move(
+                self.width() - self._editor_panel.width() - 10,
+                50
+            )
 
-    def _insert_download_text(self, text):
-        """在控制台插入下载相关的文本"""
-        cursor = self.console.textCursor()
-        format = QTextCharFormat()
-        
-        if '[ERROR]' in text:
-            format.setForeground(QColor('#ff5555'))
-        elif '[WARNING]' in text:
-            format.setForeground(QColor('#ffb86c'))
-        elif '[SUCCESS]' in text:
-            format.setForeground(QColor('#50fa7b'))
-        elif '[INFO]' in text:
-            format.setForeground(QColor('#8be9fd'))
-        else:
-            format.setForeground(QColor('#f8f8f2'))
-            
-        cursor.movePosition(QTextCursor.End)
-        cursor.insertText(text, format)
+    def _schedule_console_frame(self):
+        """有新的下载输出时安排下一帧刷新"""
+        # 下载输出按帧合并刷新，每帧最多更新一次控制台
+        if not self.scheduler.is_scheduled('console_frame'):
+            self.scheduler.call_later('console_frame', 16, self.flush_download_output)
+
+    def flush_download_output(self):
+        """一次性把缓冲的下载输出写入控制台"""
+        lines = self.download_thread.output.drain()
+        if lines:
+            self.console.write_lines(lines)
 
     def _format_and_insert_text(self, text):
         """处理文件操作相关的信息显示"""
@@ -194,28 +255,27 @@ class FakeConsole(QMainWindow):
             # 添加时间戳并显示在状态栏
             timestamp = datetime.now().strftime('%H:%M:%S')
             formatted_text = f"[{timestamp}] {text}"
-            self.status_label.setText(formatted_text.strip())
+            self._status_message = formatted_text.strip()
+            self._refresh_status_label()
         else:
             # 其他类型的信息（如下载信息）正常显示在控制台
-            cursor = self.console.textCursor()
-            format = QTextCharFormat()
-            
-            if '[ERROR]' in text:
-                format.setForeground(QColor('#ff5555'))
-            elif '[WARNING]' in text:
-                format.setForeground(QColor('#ffb86c'))
-            elif '[SUCCESS]' in text:
-                format.setForeground(QColor('#50fa7b'))
-            elif '[INFO]' in text:
-                format.setForeground(QColor('#8be9fd'))
-            else:
-                format.setForeground(QColor('#f8f8f2'))
-            
-            cursor.movePosition(QTextCursor.End)
-            cursor.insertText(text, format)
+            self.console.insert_text(text)
+
+    def _refresh_status_label(self):
+        """状态栏显示最近一条状态信息和当前文件、本次运行的字数统计"""
+        parts = [self._status_message] if self._status_message else []
+        stats = self.file_manager.text_stats
+        if stats is not None:
+            session = self.file_manager.session
+            parts.append(f"{stats.chars:,} 字 · {stats.words:,} 词 · {stats.line_count:,} 行")
+            parts.append(f"本次 {session.chars:+,} 字")
+        self.status_label.setText('  |  '.join(parts))
 
     def process_input(self):
         """处理回车输入"""
+        if self.run_command(self.input_line.text().strip()):
+            return
+        
         if not self.file_manager.current_file:
             self._format_and_insert_text("[ERROR] 请先创建或打开文件")
             return
@@ -230,52 +290,291 @@ class FakeConsole(QMainWindow):
         if self.current_line_number >= 0:
             self.move_to_line(self.current_line_number + 1)
 
+    def run_command(self, text):
+        """执行输入行中的命令，不是命令时返回 False"""
+        command, _, argument = text.partition(' ')
+        argument = argument.strip()
+        if command == '/find' and argument:
+            self.find_text(argument)
+        elif command == '/go' and argument.isdigit():
+            self.go_to_hit(int(argument))
+        elif command == '/stats' and argument in ('', 'on', 'off'):
+            if argument:
+                self.set_instrumentation(argument == 'on')
+            else:
+                self.dump_stats()
+        elif command == '/export' and argument:
+            self.export_current_file(argument)
+        elif command == '/project' and not argument:
+            self.convert_to_project()
+        elif command == '/compress' and argument in ('', 'zlib', 'lzma'):
+            self.convert_to_compressed(argument or None)
+        elif command == '/import' and argument:
+            self.import_external_file(argument.strip('"\''))
+        else:
+            return False
+        # 恢复输入行原来的内容
+        if self.current_line_number >= 0:
+            self.move_to_line(self.current_line_number)
+        else:
+            self.input_line.clear()
+        return True
+
+    def export_current_file(self, filename):
+        """把当前文件（或章节项目）导出为小说目录下的单个 .txt 文件"""
+        if not self.file_manager.current_file:
+            self._format_and_insert_text("[ERROR] 请先创建或打开文件")
+            return
+        if not filename.endswith('.txt'):
+            filename += '.txt'
+        target = os.path.join(self.file_manager.novel_dir, filename)
+        if os.path.exists(target):
+            self._format_and_insert_text(f"[WARNING] 文件已存在: {filename}")
+            return
+        self.flush_editor_edits()
+
+        def on_exported(error):
+            if error is not None:
+                self._format_and_insert_text(f"[ERROR] 导出失败: {str(error)}")
+            else:
+                self._format_and_insert_text(f"[SUCCESS] 已导出: {filename}")
+
+        self.file_manager.export_text(target, on_exported)
+
+    def convert_to_project(self):
+        """把当前 .txt 文件按章节拆成章节项目并切换过去，之后保存只重写改动的章节"""
+        if not self.file_manager.current_file:
+            self._format_and_insert_text("[ERROR] 请先创建或打开文件")
+            return
+        self.flush_editor_edits()
+
+        def on_loaded(error):
+            if error is not None:
+                self._format_and_insert_text(f"[ERROR] 转换失败: {str(error)}")
+                return
+            if self.toolbar_widget is not None:
+                self.toolbar_widget.file_model.set_hot_file(project_dir)
+            self.current_line_number = -1
+            self.input_line.setEnabled(True)
+            self._format_and_insert_text(f"[SUCCESS] 已转换为章节项目: {os.path.basename(project_dir)}")
+
+        project_dir = self.file_manager.convert_to_project(on_loaded)
+        if project_dir is None:
+            self._format_and_insert_text("[WARNING] 当前文件已是章节项目，或同名项目已存在")
+
+    def convert_to_compressed(self, codec=None):
+        """把当前文件按块压缩另存为 .txz 文件并切换过去"""
+        if not self.file_manager.current_file:
+            self._format_and_insert_text("[ERROR] 请先创建或打开文件")
+            return
+        self.flush_editor_edits()
+
+        def on_loaded(error):
+            if error is not None:
+                self._format_and_insert_text(f"[ERROR] 压缩失败: {str(error)}")
+                return
+            if self.toolbar_widget is not None:
+                self.toolbar_widget.file_model.set_hot_file(target)
+            self.current_line_number = -1
+            self.input_line.setEnabled(True)
+            self._format_and_insert_text(f"[SUCCESS] 已转换为压缩文件: {os.path.basename(target)}")
+
+        target = self.file_manager.convert_to_compressed(codec, on_loaded)
+        if target is None:
+            self._format_and_insert_text("[WARNING] 当前文件已是压缩文件，或同名压缩文件已存在")
+
+    def import_external_file(self, source_path):
+        """把外部文本文件（GBK、GB18030、UTF-16 等）转成 UTF-8 导入小说目录并切换过去"""
+        if not os.path.isfile(source_path):
+            self._format_and_insert_text(f"[ERROR] 文件不存在: {source_path}")
+            return
+        self.flush_editor_edits()
+
+        def on_loaded(result, error):
+            if error is not None:
+                self.input_line.setEnabled(self.file_manager.current_file is not None)
+                self._format_and_insert_text(f"[ERROR] 导入失败: {str(error)}")
+                return
+            if self.toolbar_widget is not None:
+                self.toolbar_widget.file_model.set_hot_file(target)
+            self.current_line_number = -1
+            self.input_line.setEnabled(True)
+            self.input_line.setPlaceholderText("输入内容后按回车...")
+            self._format_and_insert_text(
+                f"[SUCCESS] 已导入 {os.path.basename(target)}（{result.encoding.upper()}，"
+                f"{result.line_count} 行，{result.bytes_read / 1024 / 1024:.1f} MB，{result.mb_per_s:.1f} MB/s）")
+            self.show_current_content()
+
+        target = self.file_manager.import_file(source_path, on_loaded)
+        if target is None:
+            self._format_and_insert_text("[WARNING] 导入的目标文件正在使用中，请先切换到其他文件")
+            return
+        self.input_line.setEnabled(False)
+        self.input_line.setPlaceholderText("正在导入文件...")
+
+    def set_instrumentation(self, enabled):
+        """打开或关闭热点路径统计，打开时清空之前的数据"""
+        metrics.set_enabled(enabled)
+        self.settings.save_instrumentation(enabled)
+        state = "已开启" if enabled else "已关闭"
+        self._format_and_insert_text(f"[INFO] 性能统计{state}")
+
+    def dump_stats(self):
+        """在 I/O 线程中把性能统计写到小说目录下的 JSON 文件"""
+        extra = {
+            'enabled': metrics.enabled,
+            'io': self.io_worker.stats.snapshot(),
+            'index_io': self.index_worker.stats.snapshot(),
+            'io_queue_depth': self.io_worker.queue_depth,
+            'scheduler_wakeups_per_minute': self.scheduler.wakeups_per_minute(),
+            'console_blocks': self.console.document().blockCount(),
+        }
+
+        def on_dumped(request):
+            if request.error is not None:
+                self._format_and_insert_text(f"[ERROR] 导出性能统计失败: {str(request.error)}")
+            else:
+                self._format_and_insert_text(f"[SUCCESS] 性能统计已导出: {os.path.basename(request.result)}")
+            if not metrics.enabled:
+                self._format_and_insert_text("[WARNING] 性能统计未开启，只导出了 I/O 汇总，输入 /stats on 开启")
+
+        self.io_worker.submit('stats_dump', metrics.dump, self.file_manager.novel_dir, extra,
+                              callback=on_dumped)
+
+    def _reset_search_index(self, novel_dir):
+        """为新的小说目录建立全文索引，已有的索引文件会直接加载"""
+        if self.search_index is not None:
+            self.search_index.cancel()
+            self.index_worker.submit('index_close', self.search_index.close)
+        self.search_index = SearchIndex(novel_dir, self.io_worker)
+        self.search_hits = []
+        self._sync_search_index()
+
+    def _sync_search_index(self):
+        self.index_worker.submit('index_sync', self.search_index.sync,
+                                 callback=self._on_index_synced)
+
+    def _on_index_synced(self, request):
+        if request.error is not None:
+            self._format_and_insert_text(f"[ERROR] 建立搜索索引失败: {str(request.error)}")
+        elif request.result:
+            self._format_and_insert_text(f"[INFO] 搜索索引已更新 {request.result} 个文件")
+
+    def _on_novel_file_changed(self, file_path):
+        """文件写回磁盘、新建或删除后增量更新它的索引"""
+        index = self.search_index
+        if os.path.normpath(os.path.dirname(file_path)) == os.path.normpath(index.novel_dir):
+            self.index_worker.submit('index_update', index.refresh_file, file_path)
+
+    def find_text(self, query):
+        """在索引线程中搜索小说目录的所有文件，结果按编号列在控制台中"""
+        started = time.perf_counter()
+        index = self.search_index
+        self.index_worker.submit(
+            'index_search', index.search, query,
+            callback=lambda request: self._on_search_done(index, query, started, request))
+
+    def _on_search_done(self, index, query, started, request):
+        if index is not self.search_index:
+            # 搜索期间切换了小说目录
+            return
+        if request.error is not None:
+            self._format_and_insert_text(f"[ERROR] 搜索失败: {str(request.error)}")
+            return
+        self.search_hits = request.result
+        # 耗时包括在索引线程中排队等待的时间
+        elapsed = (time.perf_counter() - started) * 1000
+        if not self.search_hits:
+            self._format_and_insert_text(f"[INFO] 没有找到“{query}”（{elapsed:.0f} ms）")
+            return
+        lines = [f"[{number}] {hit.name}:{hit.line_number + 1}  {hit.text[:80]}"
+                 for number, hit in enumerate(self.search_hits, 1)]
+        self.console.write_lines(lines)
+        self._format_and_insert_text(
+            f"[SUCCESS] 找到 {len(self.search_hits)} 处“{query}”（{elapsed:.0f} ms），输入 /go 编号 跳转")
+        if not index.ready:
+            self._format_and_insert_text("[WARNING] 搜索索引仍在建立中，结果可能不完整")
+
+    def go_to_hit(self, number):
+        """跳转到最近一次搜索的第 number 条结果，必要时先打开所在文件"""
+        if not 1 <= number <= len(self.search_hits):
+            self._format_and_insert_text(f"[ERROR] 没有第 {number} 条搜索结果")
+            return
+        hit = self.search_hits[number - 1]
+        if hit.path == self.file_manager.current_file:
+            self.move_to_line(hit.line_number)
+            return
+        self.flush_editor_edits()
+
+        def on_loaded(error):
+            if error is not None:
+                self._format_and_insert_text(f"[ERROR] 打开文件失败: {str(error)}")
+                return
+            if self.toolbar_widget is not None:
+                self.toolbar_widget.file_model.set_hot_file(hit.path)
+            self.input_line.setEnabled(True)
+            self._format_and_insert_text(f"[SUCCESS] 已切换到文件: {hit.name}")
+            self.move_to_line(hit.line_number)
+            self.show_current_content()
+
+        self.input_line.setEnabled(False)
+        self.input_line.setPlaceholderText("正在打开文件...")
+        self.file_manager.open_file(hit.name, on_loaded)
+
+    @metrics.timed('window.update_file_content')
     def update_file_content(self, text):
         """更新文件内容"""
         try:
-            # 读取当前文件内容
-            with open(self.file_manager.current_file, 'r', encoding='utf-8') as f:
-                self.file_lines = f.read().splitlines()
+            document = self.file_manager.document
             
             # 更新或插入内容
             if self.current_line_number >= 0:
                 # 修改现有行
-                if self.current_line_number < len(self.file_lines):
+                if self.current_line_number < document.line_count:
                     if text:  # 有内容则更新
-                        self.file_lines[self.current_line_number] = text
+                        document.set_line(self.current_line_number, text)
                     else:  # 空内容则删除该行
-                        self.file_lines.pop(self.current_line_number)
+                        document.delete_line(self.current_line_number)
             else:
                 # 添加新行
                 if text:
-                    self.file_lines.append(text)
+                    document.append_line(text)
             
             # 保存回文件
-            with open(self.file_manager.current_file, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(self.file_lines))
-                if self.file_lines:  # 确保最后有换行符
-                    f.write('\n')
+            self._persist_document()
                     
         except Exception as e:
             raise Exception(f"更新文件内容失败: {str(e)}")
     
+    @metrics.timed('window.persist_document')
+    def _persist_document(self):
+        """持久化当前文档，并在空闲后安排日志合并"""
+        self.file_manager.save_document()
+        if self.file_manager.needs_compaction():
+            # 空闲一段时间后在后台合并编辑日志，每次编辑都重新计时
+            self.scheduler.call_later('compact', 5000, self.start_background_compaction)
+
+    def start_background_compaction(self):
+        """在 I/O 线程中把编辑日志合并进文件"""
+        self.file_manager.compact_in_background()
+
+    @metrics.timed('window.move_to_line')
     def move_to_line(self, line_number):
         """移动到指定行"""
         try:
-            with open(self.file_manager.current_file, 'r', encoding='utf-8') as f:
-                self.file_lines = f.read().splitlines()
+            document = self.file_manager.document
             
             # 如果是最后一行之后，切换到新行模式
-            if line_number >= len(self.file_lines):
+            if line_number >= document.line_count:
                 self.current_line_number = -1
                 self.input_line.clear()
                 self.input_line.setPlaceholderText("输入新内容...")
                 return
             
             # 如果是有效行号，显示该行内容
-            if line_number >= 0 and line_number < len(self.file_lines):
+            if line_number >= 0 and line_number < document.line_count:
                 self.current_line_number = line_number
-                self.input_line.setText(self.file_lines[line_number])
+                self.input_line.setText(document.get_line(line_number))
                 self.input_line.setPlaceholderText(f"正在编辑第 {line_number + 1} 行...")
                 
         except Exception as e:
@@ -293,7 +592,7 @@ class FakeConsole(QMainWindow):
             # 向上移动一行
             if self.current_line_number == -1:
                 # 如果当前在新行模式，移动到最后一行
-                self.move_to_line(len(self.file_lines) - 1)
+                self.move_to_line(self.file_manager.document.line_count - 1)
             else:
                 # 否则移动到上一行
                 self.move_to_line(max(0, self.current_line_number - 1))
@@ -310,7 +609,6 @@ class FakeConsole(QMainWindow):
             
         elif event.key() == Qt.Key_Delete and self.current_line_number >= 0:
             # 删除当前行
-            self.save_for_undo()
             self.update_file_content("")  # 传入空字符串表示删除
             self.move_to_line(self.current_line_number)  # 保持在当前位置
             
@@ -322,67 +620,125 @@ class FakeConsole(QMainWindow):
         if not self.file_manager.current_file:
             return
         
+        # 先保存编辑器面板中尚未保存的修改
+        self.flush_editor_edits()
+        
         text = self.input_line.text().strip()
         if text or self.current_line_number >= 0:  # 允许空行修改
             try:
-                # 保存当前状态用于撤销
-                self.save_for_undo()
-                
-                # 更新文件内容
+                # 更新文件内容（撤销历史会自动记录这次编辑）
                 self.update_file_content(text)
                 
                 self._format_and_insert_text("[SUCCESS] 内容已保存")
                 
                 # 更新编辑器面板内容
-                if self.editor_panel.isVisible():
+                if self.editor_panel_visible():
                     self.show_current_content()
                     
             except Exception as e:
                 self._format_and_insert_text(f"[ERROR] {str(e)}")
 
+    @metrics.timed('window.show_current_content')
     def show_current_content(self):
-        """显示当前文件内容"""
+        """显示当前文件内容，默认只载入末尾的一段并滚动到末尾"""
         try:
             if not self.file_manager.current_file:
                 return
             
-            with open(self.file_manager.current_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # 更新编辑器面板内容
-            self.editor_panel.set_content(
-                f"文件内容 - {os.path.basename(self.file_manager.current_file)}", 
-                content
-            )
-            self.editor_panel.show()
-            
-            # 调整编辑器面板位置
-            self.editor_panel.move(
-                self.width() - self.editor_panel.width() - 10,
-                50
-            )
-            
+            self.flush_editor_edits()
+            total = self.file_manager.document.line_count
+            window = self.settings.load_editor_window_lines()
+            self._load_editor_window(max(0, total - window), total, None)
         except Exception as e:
             self._format_and_insert_text(f"[ERROR] 读取文件时出错: {str(e)}")
 
+    def load_editor_chunk(self, direction):
+        """编辑器面板滚动到窗口边缘时，在后台载入相邻的一块行"""
+        panel = self.editor_panel
+        if self._is_updating_editor or self._editor_loading or not panel.isVisible():
+            return
+        if not self.file_manager.current_file:
+            return
+        # 面板的修改已经逐条应用到文档，窗口移动后按文档内容重新显示
+        self.flush_editor_edits()
+        total = self.file_manager.document.line_count
+        window = self.settings.load_editor_window_lines()
+        chunk = max(1, window // 2)
+        if direction < 0:
+            start = max(0, panel.window_start - chunk)
+            stop = min(total, start + window)
+        else:
+            stop = min(total, panel.window_end + chunk)
+            start = max(0, stop - window)
+        if start == panel.window_start and stop == panel.window_end:
+            return
+        self._load_editor_window(start, stop, panel.top_line())
+
+    def _load_editor_window(self, start, stop, top_line):
+        """在 I/O 线程中读取 [start, stop) 行，读取完成后显示在编辑器面板"""
+        file_path = self.file_manager.current_file
+        self._editor_loading = True
+        self.file_manager.read_lines(
+            start, stop,
+            lambda lines, edit_count, error:
+                self._on_content_loaded(file_path, start, top_line, lines, edit_count, error))
+
+    @metrics.timed('window.content_loaded')
+    def _on_content_loaded(self, file_path, start, top_line, lines, edit_count, error):
+        """窗口内的行读取完成后更新编辑器面板"""
+        self._editor_loading = False
+        if error is not None:
+            self._format_and_insert_text(f"[ERROR] 读取文件时出错: {str(error)}")
+            return
+        document = self.file_manager.document
+        if file_path != self.file_manager.current_file or document is None:
+            return
+        if edit_count != document.edit_count:
+            # 读取期间文档或面板又被修改，重新读取
+            if top_line is None:
+                self.show_current_content()
+            return
+        
+        # 更新编辑器面板内容，程序设置的内容不触发保存
+        self._is_updating_editor = True
+        try:
+            self.editor_panel.set_window(
+                f"文件内容 - {os.path.basename(file_path)}",
+                lines, start, document.line_count, top_line
+            )
+        finally:
+            self._is_updating_editor = False
+        self.editor_save_scheduler.reset()
+        self.editor_panel.show()
+        
+        # 调整编辑器面板位置
+        self.editor_panel.move(
+            self.width() - self.editor_panel.width() - 10,
+            50
+        )
+
     def clearConsole(self):
         self.console.clear()
 
     def toggleToolBar(self):
-        if self.toolbar_widget.isVisible():
+        if self.toolbar_widget is None:
+            self._create_toolbar()
+        elif self.toolbar_widget.isVisible():
             self.toolbar_widget.hide()
         else:
             self.toolbar_widget.show()
 
     def auto_save(self):
         """自动保存功能"""
+        # 按批量同步策略把日志中尚未同步的记录写到磁盘
+        self.file_manager.sync()
         if self.file_manager.current_file and self.input_line.text():
             try:
                 text = self.input_line.text()
                 if self.file_manager.save_content(text):
                     self._format_and_insert_text(f"[SUCCESS] 内容已自动保存")
                     # 如果编辑器面板正在显示当前文件，更新其内容
-                    if self.editor_panel.isVisible():
+                    if self.editor_panel_visible():
                         self.show_current_content()
             except Exception as e:
                 self._format_and_insert_text(f"[ERROR] 自动保存失败: {str(e)}")
@@ -405,10 +761,62 @@ class FakeConsole(QMainWindow):
         if geometry:
             self.restoreGeometry(geometry)
 
+    def _on_setting_changed(self, key, value):
+        """设置修改后立即应用到界面"""
+        if key == 'show_status':
+            self.status_label.setVisible(value)
+        elif key == 'power_save':
+            self._update_power_mode()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() in (QEvent.WindowStateChange, QEvent.ActivationChange):
+            self._update_power_mode()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self._update_power_mode()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self._update_power_mode()
+
+    def _update_power_mode(self):
+        """根据窗口是否可见、是否有焦点调整后台活动"""
+        if getattr(self, 'download_thread', None) is None:
+            return
+        visible = self.isVisible() and not self.isMinimized()
+        # 本程序的对话框获得焦点时不算空闲
+        idle = not visible or QApplication.activeWindow() is None
+        if not self.settings.load_power_save():
+            visible, idle = True, False
+        
+        # 控制台不可见时暂停伪装日志，恢复时补上这段时间的输出
+        if visible:
+            self.download_thread.start()
+        elif self.download_thread.running:
+            self.download_thread.stop()
+            # 窗口隐藏前把日志中尚未同步的记录写到磁盘
+            self.file_manager.sync()
+        
+        self.scheduler.set_power_save(idle)
+
     def closeEvent(self, event):
         self.settings.save_geometry(self.saveGeometry())
-        self.auto_save_timer.stop()
-        self.download_thread.running = False
+        self.settings.flush()
+        self.flush_editor_edits()
+        if self.download_thread is not None:
+            self.download_thread.stop()
+        self.scheduler.cancel_all()
+        # 把剩余的修改写回文件
+        self.file_manager.close_all()
+        # 正在进行的索引建立可以中断，下次启动时继续；
+        # 索引线程可能在等待 I/O 线程读取文件，要先于 I/O 线程退出
+        self.search_index.cancel()
+        self.index_worker.stop()
+        # 等待 I/O 线程处理完所有请求后再退出
+        self.io_worker.stop()
+        self.search_index.close()
         event.accept()
 
     def show_settings(self):
@@ -450,8 +858,35 @@ class FakeConsole(QMainWindow):
         status_check = QCheckBox("显示状态信息")
         status_check.setChecked(self.settings.load_show_status())
         
+        # 保存方式设置
+        journal_check = QCheckBox("追加日志保存（大文件编辑更快）")
+        journal_check.setChecked(self.file_manager.storage_mode == 'journal')
+        
         basic_layout.addWidget(dir_group)
         basic_layout.addWidget(status_check)
+        basic_layout.addWidget(journal_check)
+        
+        # 省电模式设置
+        power_save_check = QCheckBox("窗口不可见或失去焦点时减少后台活动")
+        power_save_check.setChecked(self.settings.load_power_save())
+        basic_layout.addWidget(power_save_check)
+        basic_layout.addWidget(QLabel(
+            f"最近一分钟后台唤醒 {self.scheduler.wakeups_per_minute()} 次"))
+        
+        # 磁盘同步策略
+        fsync_group = QGroupBox("磁盘同步策略")
+        fsync_layout = QHBoxLayout()
+        fsync_combo = QComboBox()
+        for policy, description in [
+            ('always', '每次写入后同步（最安全）'),
+            ('batch', '批量同步（默认）'),
+            ('close', '关闭文件时同步（最快）')
+        ]:
+            fsync_combo.addItem(description, policy)
+        fsync_combo.setCurrentIndex(max(0, fsync_combo.findData(self.file_manager.fsync_policy)))
+        fsync_layout.addWidget(fsync_combo)
+        fsync_group.setLayout(fsync_layout)
+        basic_layout.addWidget(fsync_group)
         
         # 快捷键设置选项卡
         shortcut_tab = QWidget()
@@ -470,6 +905,7 @@ class FakeConsole(QMainWindow):
             'save': '保存内容',
             'show_content': '显示文件内容',
             'undo': '撤销操作',
+            'redo': '重做操作',
             'close_editor': '关闭编辑器'
         }.items():
             # 添加描述标签
@@ -537,7 +973,9 @@ class FakeConsole(QMainWindow):
             if new_dir != self.file_manager.novel_dir:
                 try:
                     self.file_manager.update_novel_directory(new_dir)
-                    self.toolbar_widget.set_root_path(new_dir)
+                    if self.toolbar_widget is not None:
+                        self.toolbar_widget.set_root_path(new_dir)
+                    self._reset_search_index(new_dir)
                     self._format_and_insert_text(f"[SUCCESS] 已更新保存目录: {new_dir}\n")
                 except Exception as e:
                     self._format_and_insert_text(f"[ERROR] 更新目录失败: {str(e)}\n")
@@ -545,7 +983,17 @@ class FakeConsole(QMainWindow):
             # 保存状态显示设置
             show_status = status_check.isChecked()
             self.settings.save_show_status(show_status)
-            self.status_label.setVisible(show_status)
+            
+            # 保存方式设置
+            try:
+                self.file_manager.set_storage_mode(
+                    'journal' if journal_check.isChecked() else 'rewrite')
+            except Exception as e:
+                self._format_and_insert_text(f"[ERROR] 切换保存方式失败: {str(e)}")
+            self.file_manager.set_fsync_policy(fsync_combo.currentData())
+            
+            # 保存省电模式设置
+            self.settings.save_power_save(power_save_check.isChecked())
             
             # 保存快捷键设置
             for action, editor in shortcut_editors.items():
@@ -584,91 +1032,96 @@ class FakeConsole(QMainWindow):
     def save_current_file(self):
         """保存当前文件"""
         if self.file_manager.current_file:
-            content = self.editor_panel.get_content()
             try:
-                with open(self.file_manager.current_file, 'w', encoding='utf-8') as f:
-                    f.write(content)
+                self.editor_save_scheduler.flush()
+                self._persist_document()
                 self._format_and_insert_text("[SUCCESS] 文件已保存\n")
             except Exception as e:
                 self._format_and_insert_text(f"[ERROR] 保存失败: {str(e)}\n")
 
-    def on_editor_content_changed(self):
-        """处理编辑器内容变化"""
-        if not hasattr(self, '_is_updating_editor'):
-            self._is_updating_editor = False
-        
-        if not self._is_updating_editor and self.file_manager.current_file:
-            try:
-                # 保存当前状态用于撤销
-                self.save_for_undo()
-                
-                # 保存编辑器内容
-                content = self.editor_panel.get_content()
-                with open(self.file_manager.current_file, 'w', encoding='utf-8') as f:
-                    f.write(content)
-            except Exception as e:
-                self._format_and_insert_text(f"[ERROR] 保存失败: {str(e)}")
+    def on_editor_content_changed(self, change):
+        """把编辑器面板的一次修改作为行增量应用到文档，持久化由保存调度器合并后进行"""
+        if self._is_updating_editor or not self.file_manager.current_file:
+            return
+        panel = self.editor_panel
+        document = self.file_manager.document
+        history = self.file_manager.undo_history
+        start = panel.window_start + change.first_line
+        try:
+            # 逐字输入时同一行的连续修改合并成一条撤销记录
+            if history is not None:
+                history.merge_next = True
+            document.update_lines(start, start + change.old_count, change.new_lines)
+        except Exception as e:
+            self._format_and_insert_text(f"[ERROR] 保存失败: {str(e)}")
+            return
+        finally:
+            if history is not None:
+                history.merge_next = False
+        panel.set_window_count(
+            panel.window_count + len(change.new_lines) - change.old_count,
+            document.line_count)
+        self.editor_save_scheduler.mark_dirty()
 
-    def save_for_undo(self):
-        """保存当前文件状态用于撤销"""
-        if self.file_manager.current_file:
-            try:
-                # 读取当前文件内容
-                try:
-                    with open(self.file_manager.current_file, 'r', encoding='utf-8') as f:
-                        current_content = f.read()
-                except:
-                    current_content = ""
-                
-                # 将当前状态保存到撤销栈
-                self.undo_stack.append(current_content)
-                # 限制撤销栈大小
-                if len(self.undo_stack) > self.max_undo_steps:
-                    self.undo_stack.pop(0)
-            except Exception as e:
-                self._format_and_insert_text(f"[ERROR] 保存撤销状态失败: {str(e)}")
+    def flush_editor_edits(self):
+        """立即保存编辑器面板中尚未保存的修改"""
+        if not self.file_manager.current_file:
+            self.editor_save_scheduler.cancel()
+            return False
+        try:
+            return self.editor_save_scheduler.flush()
+        except Exception as e:
+            self._format_and_insert_text(f"[ERROR] 保存失败: {str(e)}")
+            return False
 
     def undo_last_input(self):
         """撤销上一次操作"""
-        if not self.undo_stack:
+        history = self.file_manager.undo_history
+        if history is None or not history.can_undo():
             self._format_and_insert_text("[WARNING] 没有可撤销的操作")
             return
             
         try:
-            if self.file_manager.current_file:
-                # 获取上一个状态
-                previous_content = self.undo_stack.pop()
-                
-                # 恢复文件内容
-                with open(self.file_manager.current_file, 'w', encoding='utf-8') as f:
-                    f.write(previous_content)
-                
-                self._format_and_insert_text("[SUCCESS] 已撤销上一次操作")
-                
-                # 如果编辑器面板打开，更新显示
-                if self.editor_panel.isVisible():
-                    self._is_updating_editor = True
-                    try:
-                        self.show_current_content()
-                    finally:
-                        self._is_updating_editor = False
+            self.flush_editor_edits()
+            # 把上一次编辑的增量反向应用到文档
+            self.file_manager.undo()
+            self._persist_document()
+            
+            self._format_and_insert_text("[SUCCESS] 已撤销上一次操作")
+            self._refresh_editor_panel()
         except Exception as e:
             self._format_and_insert_text(f"[ERROR] 撤销失败: {str(e)}")
 
+    def redo_last_input(self):
+        """重做上一次撤销的操作"""
+        history = self.file_manager.undo_history
+        if history is None or not history.can_redo():
+            self._format_and_insert_text("[WARNING] 没有可重做的操作")
+            return
+            
+        try:
+            self.flush_editor_edits()
+            self.file_manager.redo()
+            self._persist_document()
+            
+            self._format_and_insert_text("[SUCCESS] 已重做上一次操作")
+            self._refresh_editor_panel()
+        except Exception as e:
+            self._format_and_insert_text(f"[ERROR] 重做失败: {str(e)}")
+
+    def _refresh_editor_panel(self):
+        """如果编辑器面板打开，更新显示"""
+        if self.editor_panel_visible():
+            self.show_current_content()
+
     def close_editor_panel(self):
         """关闭编辑器面板"""
-        if hasattr(self, 'editor_panel') and self.editor_panel.isVisible():
+        if self.editor_panel_visible():
             # 保存当前编辑器内容
             if self.file_manager.current_file:
-                content = self.editor_panel.get_content()
                 try:
-                    # 保存当前状态用于撤销
-                    self.save_for_undo()
-                    
-                    # 保存编辑器内容
-                    with open(self.file_manager.current_file, 'w', encoding='utf-8') as f:
-                        f.write(content)
-                    self._format_and_insert_text("[SUCCESS] 内容已保存")
+                    if self.editor_save_scheduler.flush():
+                        self._format_and_insert_text("[SUCCESS] 内容已保存")
                 except Exception as e:
                     self._format_and_insert_text(f"[ERROR] 保存失败: {str(e)}")
             
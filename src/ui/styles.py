@@ -5,7 +5,7 @@ MAIN_WINDOW_STYLE = """
 """
 
 CONSOLE_STYLE = """
-    QTextEdit {
+    QTextEdit, QPlainTextEdit {
         background-color: black;
         color: #ffffff;
         font-family: 'Consolas';
@@ -13,7 +13,7 @@ CONSOLE_STYLE = """
         border: none;
         padding: 10px;
     }
-    QTextEdit:vertical-scrollbar {
+    QTextEdit:vertical-scrollbar, QPlainTextEdit:vertical-scrollbar {
         width: 0px;
     }
     QScrollBar:vertical {
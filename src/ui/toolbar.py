@@ -1,9 +1,13 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QPushButton, 
-                           QTreeView, QFileSystemModel, QVBoxLayout,
-                           QMenu, QInputDialog, QMessageBox)
+                           QTreeView, QVBoxLayout,
+                           QMenu, QInputDialog, QMessageBox, QFileDialog)
 from PyQt5.QtCore import Qt, QDir
 import os
 
+from ui.file_list_model import NovelFileModel
+from core.novel_project import is_project
+from core.novel_files import FILE_SUFFIXES, DOCUMENT_SUFFIXES
+
 class ToolBar(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -59,15 +63,13 @@ class ToolBar(QWidget):
         
         # 添加文件树
         self.file_tree = QTreeView()
-        self.file_model = QFileSystemModel()
-        self.file_model.setNameFilters(['*.txt'])
-        self.file_model.setNameFilterDisables(False)
+        self.file_model = NovelFileModel(self.parent.file_manager.io, self.parent.scheduler, parent=self)
+        # 后台写回的文件（不一定是当前文件）都要重新读取大小和修改时间
+        self.parent.file_manager.file_listeners.append(self.file_model.mark_changed)
         
         self.file_tree.setModel(self.file_model)
         self.file_tree.setHeaderHidden(True)
-        self.file_tree.setColumnHidden(1, True)
-        self.file_tree.setColumnHidden(2, True)
-        self.file_tree.setColumnHidden(3, True)
+        self.file_tree.setRootIsDecorated(False)
         
         # 连接文件树的双击和右键菜单信号
         self.file_tree.doubleClicked.connect(self._on_file_double_clicked)
@@ -92,20 +94,33 @@ class ToolBar(QWidget):
     def set_root_path(self, path):
         """设置文件树的根目录"""
         if os.path.exists(path):
-            self.file_model.setRootPath(path)
-            self.file_tree.setRootIndex(self.file_model.index(path))
+            self.file_model.set_root_path(path)
         
     def _on_file_double_clicked(self, index):
         """处理文件双击事件"""
         file_path = self.file_model.filePath(index)
-        if os.path.isfile(file_path) and file_path.endswith('.txt'):
+        # 压缩文件和章节项目与 .txt 文件一样作为一个文档打开
+        if (os.path.isfile(file_path) and file_path.endswith(FILE_SUFFIXES)) or is_project(file_path):
             filename = os.path.basename(file_path)
-            if self.parent.file_manager.open_file(filename):
+            # 切换文件前先保存编辑器面板中尚未保存的修改
+            self.parent.flush_editor_edits()
+            
+            def on_loaded(error):
+                if error is not None:
+                    self.parent._format_and_insert_text(f"[ERROR] 打开文件失败: {str(error)}\n")
+                    return
                 self.parent._format_and_insert_text(f"[SUCCESS] 已切换到文件: {filename}\n")
+                self.file_model.set_hot_file(file_path)
+                self.parent.current_line_number = -1
                 self.parent.input_line.setEnabled(True)
                 self.parent.input_line.setPlaceholderText("输入内容后按回车...")
                 # 打开文件后自动显示内容
                 self.parent.show_current_content()
+            
+            # 文件在 I/O 线程中加载，加载完成前禁用输入
+            self.parent.input_line.setEnabled(False)
+            self.parent.input_line.setPlaceholderText("正在打开文件...")
+            self.parent.file_manager.open_file(filename, on_loaded)
 
     def _show_context_menu(self, position):
         """显示右键菜单"""
@@ -114,40 +129,58 @@ class ToolBar(QWidget):
         # 添加新建文件选项
         new_file_action = menu.addAction("新建文件")
         new_file_action.triggered.connect(self._create_new_file)
+        import_action = menu.addAction("导入文本文件...")
+        import_action.triggered.connect(self._import_file)
         
         # 获取当前选中的项
         index = self.file_tree.indexAt(position)
         if index.isValid():
             file_path = self.file_model.filePath(index)
-            if os.path.isfile(file_path):
+            if os.path.isfile(file_path) or is_project(file_path):
                 # 添加删除文件选项
                 delete_action = menu.addAction("删除文件")
                 delete_action.triggered.connect(lambda: self._delete_file(file_path))
         
+        # 排序方式
+        sort_menu = menu.addMenu("排序方式")
+        for key, text in [('name', '按名称'), ('mtime', '按修改时间'), ('size', '按大小')]:
+            action = sort_menu.addAction(text)
+            action.setCheckable(True)
+            action.setChecked(self.file_model.sort_key == key)
+            action.triggered.connect(lambda checked, key=key: self.file_model.set_sort_key(key))
+        
         menu.exec_(self.file_tree.viewport().mapToGlobal(position))
 
     def _create_new_file(self):
         """创建新文件"""
         filename, ok = QInputDialog.getText(
-            self, '新建文件', '请输入文件名:',
+            self, '新建文件', '请输入文件名（以 .novel 结尾时新建章节项目，以 .txz 结尾时新建压缩文件）:',
             text='新文件.txt'
         )
         
         if ok and filename:
-            if not filename.endswith('.txt'):
+            if not filename.endswith(DOCUMENT_SUFFIXES):
                 filename += '.txt'
             
+            self.parent.flush_editor_edits()
             success, filepath = self.parent.file_manager.create_file(filename)
             if success:
                 self.parent._format_and_insert_text(f"[SUCCESS] 已创建新文件: {filename}\n")
-                # 自动打开新创建的文件
-                self.parent.file_manager.open_file(filename)
+                self.file_model.set_hot_file(filepath)
+                # 新创建的文件已经自动打开
+                self.parent.current_line_number = -1
                 self.parent.show_current_content()
                 self.parent.input_line.setEnabled(True)
                 self.parent.input_line.setPlaceholderText("输入内容后按回车...")
             else:
                 self.parent._format_and_insert_text(f"[WARNING] 文件已存在: {filename}\n")
 
+    def _import_file(self):
+        """选择外部文本文件，自动识别编码后转成 UTF-8 导入小说目录"""
+        file_path, _ = QFileDialog.getOpenFileName(self, '导入文本文件', '', '文本文件 (*.txt);;所有文件 (*)')
+        if file_path:
+            self.parent.import_external_file(file_path)
+
     def _delete_file(self, file_path):
         """删除文件"""
         filename = os.path.basename(file_path)
@@ -159,14 +192,24 @@ class ToolBar(QWidget):
         )
         
         if reply == QMessageBox.Yes:
-            try:
-                os.remove(file_path)
-                self.parent._format_and_insert_text(f"[SUCCESS] 已删除文件: {filename}\n")
-                # 如果删除的是当前打开的文件，清除当前文件
-                if self.parent.file_manager.current_file == file_path:
-                    self.parent.file_manager.current_file = None
-                    self.parent.input_line.setEnabled(False)
-                    self.parent.input_line.setPlaceholderText("请先创建或打开文件")
+            file_manager = self.parent.file_manager
+            file_path = os.path.normpath(file_path)
+            # 如果删除的是当前打开的文件，关闭文件并丢弃未保存的内容
+            is_current = file_manager.current_file is not None and \
+                os.path.normpath(file_manager.current_file) == file_path
+            if is_current:
+                self.parent.editor_save_scheduler.cancel()
+                self.parent.input_line.setEnabled(False)
+                self.parent.input_line.setPlaceholderText("请先创建或打开文件")
+                if self.parent.editor_panel_visible():
                     self.parent.editor_panel.hide()
-            except Exception as e:
-                self.parent._format_and_insert_text(f"[ERROR] 删除文件失败: {str(e)}\n")
\ No newline at end of file
+                file_path = file_manager.current_file
+            
+            def on_deleted(error):
+                if error is not None:
+                    self.parent._format_and_insert_text(f"[ERROR] 删除文件失败: {str(error)}\n")
+                else:
+                    self.parent._format_and_insert_text(f"[SUCCESS] 已删除文件: {filename}\n")
+            
+            # 删除操作排在该文件所有待写入请求之后执行
+            file_manager.delete_file(file_path, on_deleted)
\ No newline at end of file
@@ -0,0 +1,85 @@
+"""测试共用的辅助代码：把 src 加入导入路径，提供不读写注册表的设置"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+
+_app = None
+
+
+def qt_app():
+    """定时器和信号需要的 Qt 应用对象，整个测试进程共用一个"""
+    global _app
+    from PyQt5.QtCore import QCoreApplication
+    if QCoreApplication.instance() is None:
+        _app = QCoreApplication(sys.argv[:1])
+    return QCoreApplication.instance()
+
+
+def wait_until(predicate, timeout_ms=2000):
+    """处理 Qt 事件直到 predicate() 为真，超时返回 False"""
+    from PyQt5.QtTest import QTest
+    deadline = time.monotonic() + timeout_ms / 1000
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        QTest.qWait(5)
+    return True
+
+
+class StubSettings:
+    """FileManager 用到的设置项，全部保存在内存中"""
+
+    def __init__(self, novel_dir, storage_mode='journal'):
+        self.novel_dir = novel_dir
+        self.storage_mode = storage_mode
+
+    def load_novel_directory(self):
+        return self.novel_dir
+
+    def load_storage_mode(self):
+        return self.storage_mode
+
+    def save_storage_mode(self, mode):
+        self.storage_mode = mode
+
+    def load_fsync_policy(self):
+        return 'batch'
+
+    def load_undo_memory_limit(self):
+        return 1
+
+    def load_document_cache_memory(self):
+        return 64
+
+    def load_compression_codec(self):
+        return 'zlib'
+
+
+class TempDirTestCase(unittest.TestCase):
+    """每个测试使用一个新的临时目录"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix='cmd_writer_test_')
+        self.addCleanup(shutil.rmtree, self.dir, True)
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    def write_bytes(self, name, data):
+        with open(self.path(name), 'wb') as f:
+            f.write(data)
+        return self.path(name)
+
+    def file_manager(self, storage_mode='journal'):
+        from core.file_manager import FileManager
+        manager = FileManager(StubSettings(self.dir, storage_mode))
+        self.addCleanup(manager.close_all)
+        return manager
@@ -0,0 +1,109 @@
+import os
+import unittest
+from unittest import mock
+
+import support
+from core import compressed_file
+from core.compressed_file import CompressedLines, CompressedWriteJob, create_compressed
+from core.document import Document
+
+
+def write(path, document):
+    job = CompressedWriteJob(path, document.snapshot(), document.edit_count)
+    job.run()
+    job.replace()
+    return job
+
+
+class CompressedWriteJobTest(support.TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(compressed_file, 'BLOCK_BYTES', 64)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.file = self.path('book.txz')
+
+    def open(self):
+        document = Document(CompressedLines.load(self.file))
+        self.addCleanup(document.close)
+        return document
+
+    def block_bytes(self):
+        return list(CompressedLines.load(self.file).entries[3::4])
+
+    def test_round_trip_with_both_codecs(self):
+        lines = [f'第{i}行 line {i}' for i in range(100)]
+        for codec in compressed_file.CODECS:
+            with self.subTest(codec=codec):
+                compressed_file.create_compressed_from(Document(lines), self.file, codec)
+                document = self.open()
+                self.assertEqual(document.original.codec, codec)
+                self.assertEqual(document.get_lines(), lines)
+                self.assertEqual(document.get_line(57), lines[57])
+
+    def test_appends_are_recompressed_into_the_last_block(self):
+        create_compressed(self.file)
+        expected = []
+        for i in range(30):
+            document = self.open()
+            document.append_line(f'line{i:02d}')
+            expected.append(f'line{i:02d}')
+            write(self.file, document)
+        self.assertEqual(self.block_bytes(), [70, 70, 70])
+        self.assertEqual(self.open().get_lines(), expected)
+
+    def test_edit_keeps_untouched_blocks(self):
+        lines = [f'line{i:02d}' for i in range(40)]
+        compressed_file.create_compressed_from(Document(lines), self.file)
+        before = CompressedLines.load(self.file).entries
+        document = self.open()
+        document.set_line(20, 'line20')
+        write(self.file, document)
+        after = CompressedLines.load(self.file).entries
+        # 第 20 行在第三块中，其余各块仍指向原来的数据
+        self.assertEqual(after[:8], before[:8])
+        self.assertEqual(after[12:], before[12:])
+        self.assertNotEqual(after[8], before[8])
+        self.assertEqual(self.open().get_lines(), lines)
+
+    def test_discard_truncates_appended_data(self):
+        compressed_file.create_compressed_from(Document(['a', 'b']), self.file)
+        size = os.path.getsize(self.file)
+        document = self.open()
+        document.append_line('c')
+        job = CompressedWriteJob(self.file, document.snapshot(), document.edit_count)
+        job.run()
+        self.assertGreater(os.path.getsize(self.file), size)
+        job.discard()
+        self.assertEqual(os.path.getsize(self.file), size)
+        self.assertEqual(self.open().get_lines(), ['a', 'b'])
+
+    def test_discard_keeps_data_written_by_a_later_job(self):
+        create_compressed(self.file)
+        document = self.open()
+        document.append_line('a')
+        first = CompressedWriteJob(self.file, document.snapshot(), document.edit_count)
+        first.run()
+        document.append_line('b')
+        write(self.file, document)
+        first.discard()
+        self.assertEqual(self.open().get_lines(), ['a', 'b'])
+
+    def test_compaction_rewrites_the_file(self):
+        lines = [f'line{i:02d}' for i in range(40)]
+        compressed_file.create_compressed_from(Document(lines), self.file)
+        with mock.patch.object(compressed_file, 'COMPACT_MIN_BYTES', 0):
+            for i in range(3):
+                document = self.open()
+                document.set_line(i * 10, f'edit{i}')
+                lines[i * 10] = f'edit{i}'
+                write(self.file, document)
+        document = self.open()
+        self.assertEqual(document.get_lines(), lines)
+        original = document.original
+        self.assertEqual(os.path.getsize(self.file),
+                         compressed_file.HEADER.size + original.data_bytes + original.entries.itemsize * len(original.entries))
+
+
+if __name__ == '__main__':
+    unittest.main()
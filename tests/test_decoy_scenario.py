@@ -0,0 +1,43 @@
+import unittest
+from datetime import datetime
+
+import support  # noqa: F401  把 src 加入导入路径
+from core.decoy_scenario import DecoyScenario, format_eta
+
+START = datetime(2024, 1, 1, 12, 0, 0)
+
+
+class DecoyScenarioTest(unittest.TestCase):
+    def test_same_seed_gives_same_output(self):
+        first = DecoyScenario(seed=7, start_time=START).take(2000)
+        second = DecoyScenario(seed=7, start_time=START).take(2000)
+        self.assertEqual(first, second)
+
+    def test_different_seed_gives_different_output(self):
+        first = DecoyScenario(seed=1, start_time=START).take(2000)
+        second = DecoyScenario(seed=2, start_time=START).take(2000)
+        self.assertNotEqual(first, second)
+
+    def test_elapsed_time_is_sum_of_delays(self):
+        scenario = DecoyScenario(seed=3, start_time=START)
+        events = scenario.take(500)
+        self.assertAlmostEqual(scenario.elapsed, sum(delay for delay, _ in events))
+        self.assertTrue(all(delay >= 0 for delay, _ in events))
+
+    def test_skip_shifts_timestamps(self):
+        def first_progress(scenario):
+            return next(text for _, text in scenario.events() if text.startswith('\r['))
+
+        plain = first_progress(DecoyScenario(seed=5, start_time=START))
+        skipped = DecoyScenario(seed=5, start_time=START)
+        skipped.skip(3600)
+        self.assertEqual(first_progress(skipped), '\r[13' + plain[4:])
+
+    def test_format_eta(self):
+        self.assertEqual(format_eta(5), '5 seconds')
+        self.assertEqual(format_eta(125), '2 minutes 5 seconds')
+        self.assertEqual(format_eta(3 * 3600 + 61), '3 hours 1 minutes')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import threading
+import unittest
+from unittest import mock
+
+import support
+from core.disk_io import PendingLines, SnapshotWriteJob
+from core.document import Document
+from core.line_index import FileLines, LineIndex
+from core.novel_project import ProjectWriteJob
+
+
+def in_thread(fn, timeout=2):
+    """在另一个线程中调用 fn，超时仍未返回时视为阻塞，返回 None"""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(fn()), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return result[0] if result else None
+
+
+class PendingLinesTest(support.TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.file = self.write_bytes('a.txt', b'one\ntwo\nthree\n')
+        index = LineIndex.build(self.file)
+        self.document = Document(FileLines(self.file, index.copy()), index)
+        self.addCleanup(self.document.close)
+        self.document.set_line(1, 'TWO')
+        self.job = SnapshotWriteJob(self.file, self.document.snapshot(), self.document.edit_count,
+                                    self.document.line_index)
+        self.job.run()
+        opened = self.job.open_lines()
+        self.lines = PendingLines(opened, self.job.fallback_lines(opened))
+        self.document.reset(self.lines)
+
+    def test_reads_before_replace_do_not_wait(self):
+        self.assertFalse(self.lines.ready.is_set())
+        self.assertEqual(in_thread(self.document.get_lines), ['one', 'TWO', 'three'])
+        self.assertEqual(in_thread(lambda: self.document.find_lines('TWO')), [1])
+        snapshot = self.document.snapshot()
+        self.addCleanup(snapshot.close)
+        self.assertEqual(in_thread(lambda: snapshot.get_line(2)), 'three')
+
+    def test_swap_switches_to_the_replaced_file(self):
+        self.document.get_lines()
+        snapshot = self.document.snapshot()
+        self.addCleanup(snapshot.close)
+        temp_path = self.job.temp_path
+        self.lines.swap(self.job.replace, temp_path)
+        self.assertTrue(self.lines.ready.is_set())
+        self.assertFalse(os.path.exists(temp_path))
+        self.assertIsNone(self.lines.stale_path)
+        self.assertEqual(self.document.get_lines(), ['one', 'TWO', 'three'])
+        self.assertEqual(snapshot.get_lines(), ['one', 'TWO', 'three'])
+        self.assertEqual(self.lines.file_path, self.file)
+
+    def test_failed_replace_keeps_reading_the_temp_file(self):
+        snapshot = self.document.snapshot()
+        self.addCleanup(snapshot.close)
+
+        def fail():
+            raise OSError('locked')
+
+        temp_path = self.job.temp_path
+        with self.assertRaises(OSError):
+            self.lines.swap(fail, temp_path)
+        self.assertTrue(self.lines.ready.is_set())
+        self.assertEqual(self.lines.stale_path, temp_path)
+        self.assertEqual(self.document.get_lines(), ['one', 'TWO', 'three'])
+        self.assertEqual(snapshot.get_lines(), ['one', 'TWO', 'three'])
+        with open(self.file, 'rb') as f:
+            self.assertEqual(f.read(), b'one\ntwo\nthree\n')
+
+
+class FailedReplaceTest(support.TempDirTestCase):
+    def test_failed_project_replace_keeps_the_document(self):
+        manager = self.file_manager('rewrite')
+        errors = []
+        manager.error_handler = errors.append
+        manager.create_file('book.novel')
+        manager.document.append_line('kept')
+        with mock.patch.object(ProjectWriteJob, 'replace', side_effect=OSError('locked')):
+            manager.save_document()
+        self.assertIsInstance(errors[0], OSError)
+        self.assertTrue(manager.document.dirty)
+        self.assertEqual(manager.document.get_lines(), ['kept'])
+        manager.save_document()
+        manager.close_all()
+        reopened = self.file_manager('rewrite')
+        reopened.open_file('book.novel')
+        self.assertEqual(reopened.document.get_lines(), ['kept'])
+
+
+if __name__ == '__main__':
+    unittest.main()
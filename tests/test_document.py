@@ -0,0 +1,71 @@
+import random
+import unittest
+
+import support  # noqa: F401  把 src 加入导入路径
+from core.document import Document
+from core.line_index import LineIndex, line_byte_length
+
+
+class DocumentTest(unittest.TestCase):
+    def test_edits_match_plain_list(self):
+        rng = random.Random(1)
+        expected = [f'line{i}' for i in range(50)]
+        document = Document(list(expected))
+        for step in range(500):
+            start = rng.randrange(len(expected) + 1)
+            count = rng.randrange(4)
+            new_lines = [f'new{step}.{i}' for i in range(rng.randrange(4))]
+            old_lines = document.replace_lines(start, count, new_lines)
+            self.assertEqual(old_lines, expected[start:start + count])
+            expected[start:start + count] = new_lines
+            self.assertEqual(document.line_count, len(expected))
+        self.assertEqual(document.get_lines(), expected)
+        self.assertEqual(list(document.iter_lines(10, 20)), expected[10:20])
+
+    def test_listener_receives_replaced_lines(self):
+        document = Document(['a', 'b', 'c'])
+        calls = []
+        document.add_listener(lambda *args: calls.append(args))
+        document.set_line(1, 'B')
+        document.insert_line(0, 'start')
+        document.delete_line(3)
+        self.assertEqual(calls, [(1, ['b'], ['B']), (0, [], ['start']), (3, ['c'], [])])
+        self.assertEqual(document.edit_count, 3)
+        self.assertTrue(document.dirty)
+
+    def test_update_lines_only_replaces_changed_middle(self):
+        document = Document(['a', 'b', 'c', 'd'])
+        calls = []
+        document.add_listener(lambda *args: calls.append(args))
+        document.update_lines(0, None, ['a', 'x', 'y', 'd'])
+        self.assertEqual(calls, [(1, ['b', 'c'], ['x', 'y'])])
+
+    def test_snapshot_is_not_affected_by_later_edits(self):
+        document = Document(['a', 'b'])
+        document.append_line('c')
+        snapshot = document.snapshot()
+        document.set_line(0, 'changed')
+        document.append_line('d')
+        self.assertEqual(snapshot.get_lines(), ['a', 'b', 'c'])
+        self.assertEqual(document.get_lines(), ['changed', 'b', 'c', 'd'])
+
+    def test_line_index_follows_edits(self):
+        lines = ['第一行', 'second', '']
+        index = LineIndex([line_byte_length(line) for line in lines])
+        document = Document(list(lines), index)
+        document.set_line(0, '改过的第一行')
+        document.insert_line(2, 'inserted')
+        document.delete_line(1)
+        expected = [line_byte_length(line) for line in document.get_lines()]
+        self.assertEqual(index.line_count, len(expected))
+        self.assertEqual(index.total_bytes, sum(expected))
+        self.assertEqual(index.line_start(2), sum(expected[:2]))
+
+    def test_find_lines(self):
+        document = Document(['天空', '大地', '天地'])
+        document.append_line('天上')
+        self.assertEqual(document.find_lines('天'), [0, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+
+import support
+from core.document import Document
+from core.document_cache import DocumentCache, OpenDocument
+
+
+def entry(name, lines=0):
+    document = Document()
+    for i in range(lines):
+        document.append_line(f'line{i}')
+    return OpenDocument(name, document)
+
+
+class DocumentCacheTest(unittest.TestCase):
+    def test_least_recently_used_is_evicted(self):
+        cache = DocumentCache(max_entries=2)
+        a, b, c = entry('a'), entry('b'), entry('c')
+        self.assertEqual(cache.put(a), [])
+        self.assertEqual(cache.put(b), [])
+        self.assertIs(cache.pop('a'), a)
+        cache.put(a)
+        self.assertEqual(cache.put(c), [b])
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+
+    def test_memory_budget(self):
+        small, large = entry('small', 1), entry('large', 10)
+        cache = DocumentCache(max_bytes=large.memory_bytes, max_entries=8)
+        cache.put(small)
+        self.assertEqual(cache.put(large), [small])
+        self.assertEqual(len(cache), 1)
+        # 单个文档就超出预算时不缓存
+        self.assertEqual(DocumentCache(max_bytes=1).put(small), [small])
+
+    def test_clear_returns_all_entries(self):
+        cache = DocumentCache()
+        a, b = entry('a'), entry('b')
+        cache.put(a)
+        cache.put(b)
+        self.assertEqual(cache.clear(), [a, b])
+        self.assertEqual(len(cache), 0)
+
+
+class FileSwitchTest(support.TempDirTestCase):
+    def read(self, name):
+        with open(self.path(name), encoding='utf-8') as f:
+            return f.read()
+
+    def test_switching_back_reuses_the_document(self):
+        manager = self.file_manager('journal')
+        manager.create_file('a')
+        manager.document.append_line('unsaved')
+        document = manager.document
+        manager.create_file('b')
+        self.assertIn(self.path('a.txt'), manager.cache)
+        manager.open_file('a')
+        self.assertIs(manager.document, document)
+        self.assertEqual(manager.document.get_lines(), ['unsaved'])
+        self.assertEqual(manager.text_stats.chars, 7)
+        manager.undo()
+        self.assertEqual(manager.document.get_lines(), [])
+        # 取回后仍然写日志
+        manager.document.append_line('again')
+        manager.sync()
+        reopened = self.file_manager('journal')
+        reopened.open_file('a')
+        self.assertEqual(reopened.document.get_lines(), ['again'])
+
+    def test_outside_change_while_cached_reloads_from_disk(self):
+        manager = self.file_manager('journal')
+        manager.create_file('a')
+        manager.document.append_line('cached')
+        document = manager.document
+        manager.create_file('b')
+        with open(self.path('a.txt'), 'w', encoding='utf-8') as f:
+            f.write('external\n')
+        manager.open_file('a')
+        self.assertIsNot(manager.document, document)
+        self.assertEqual(manager.document.get_lines(), ['external'])
+
+    def test_evicted_document_is_written_back(self):
+        manager = self.file_manager('journal')
+        manager.cache.max_entries = 1
+        manager.create_file('a')
+        manager.document.append_line('from a')
+        manager.create_file('b')
+        manager.create_file('c')
+        self.assertNotIn(self.path('a.txt'), manager.cache)
+        self.assertEqual(self.read('a.txt'), 'from a\n')
+
+    def test_rewrite_mode_writes_dirty_document_instead_of_caching(self):
+        manager = self.file_manager('rewrite')
+        manager.create_file('a')
+        manager.document.append_line('dirty')
+        manager.create_file('b')
+        self.assertNotIn(self.path('a.txt'), manager.cache)
+        self.assertEqual(self.read('a.txt'), 'dirty\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import unittest
+
+import support
+from PyQt5.QtCore import Qt
+from core.disk_io import InlineExecutor
+from core.task_scheduler import TaskScheduler
+from ui.file_list_model import NovelFileModel
+
+
+class NovelFileModelTest(support.TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        support.qt_app()
+        self.scheduler = TaskScheduler()
+        self.addCleanup(self.scheduler.cancel_all)
+        self.model = NovelFileModel(InlineExecutor(), self.scheduler)
+        self.signals = []
+        for name in ('modelReset', 'rowsInserted', 'rowsRemoved', 'dataChanged'):
+            getattr(self.model, name).connect(lambda *args, name=name: self.signals.append(name))
+
+    def write(self, name, size, mtime=None):
+        path = self.write_bytes(name, b'x' * size)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def names(self):
+        return [self.model.data(self.model.index(row)) for row in range(self.model.rowCount())]
+
+    def test_scan_lists_novel_files_only(self):
+        self.write('b.txt', 1)
+        self.write('a.txz', 1)
+        self.write('notes.md', 1)
+        os.mkdir(self.path('sub.txt'))
+        self.model.set_root_path(self.dir)
+        self.assertEqual(self.names(), ['a.txz', 'b.txt'])
+        self.assertEqual(self.model.filePath(self.model.index(1)), self.path('b.txt'))
+
+    def test_sort_keys(self):
+        self.write('a.txt', 30, mtime=1000)
+        self.write('b.txt', 10, mtime=3000)
+        self.write('c.txt', 20, mtime=2000)
+        self.model.set_root_path(self.dir)
+        self.model.set_sort_key('mtime')
+        self.assertEqual(self.names(), ['b.txt', 'c.txt', 'a.txt'])
+        self.model.set_sort_key('size')
+        self.assertEqual(self.names(), ['a.txt', 'c.txt', 'b.txt'])
+
+    def test_refresh_applies_differences_without_reset(self):
+        self.write('a.txt', 1)
+        self.write('c.txt', 1)
+        self.model.set_root_path(self.dir)
+        del self.signals[:]
+        self.write('b.txt', 1)
+        os.remove(self.path('c.txt'))
+        self.model.refresh()
+        self.assertEqual(self.names(), ['a.txt', 'b.txt'])
+        self.assertEqual(sorted(self.signals), ['rowsInserted', 'rowsRemoved'])
+
+    def test_known_files_are_restat_only_when_hot_or_marked(self):
+        self.write('a.txt', 1024)
+        self.model.set_root_path(self.dir)
+        self.write('a.txt', 2048)
+        self.model.refresh()
+        self.assertTrue(self.tooltip(0).startswith('1.0 KB'))
+        self.model.mark_changed(self.path('a.txt'))
+        self.assertTrue(self.scheduler.is_scheduled(NovelFileModel.REFRESH_TASK))
+        self.model.refresh()
+        self.assertTrue(self.tooltip(0).startswith('2.0 KB'))
+        self.assertIn('dataChanged', self.signals)
+
+        self.model.set_hot_file(self.path('a.txt'))
+        self.write('a.txt', 3072)
+        self.model.refresh()
+        self.assertTrue(self.tooltip(0).startswith('3.0 KB'))
+
+    def tooltip(self, row):
+        return self.model.data(self.model.index(row), Qt.ToolTipRole)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+import support
+
+
+class PersistentUndoTest(support.TempDirTestCase):
+    def edit_and_close(self, storage_mode):
+        manager = self.file_manager(storage_mode)
+        manager.create_file('a')
+        for i in range(5):
+            manager.document.append_line(f'line{i}')
+            manager.save_document()
+        manager.undo()
+        manager.close_all()
+
+    def check_restart(self, storage_mode):
+        self.edit_and_close(storage_mode)
+        manager = self.file_manager(storage_mode)
+        manager.open_file('a')
+        self.assertEqual(manager.document.get_lines(), [f'line{i}' for i in range(4)])
+        self.assertTrue(manager.undo_history.can_undo())
+        self.assertTrue(manager.undo_history.can_redo())
+        manager.redo()
+        self.assertEqual(manager.document.get_lines(), [f'line{i}' for i in range(5)])
+        while manager.undo_history.can_undo():
+            manager.undo()
+        self.assertEqual(manager.document.get_lines(), [])
+
+    def test_undo_and_redo_survive_restart_journal(self):
+        self.check_restart('journal')
+
+    def test_undo_and_redo_survive_restart_rewrite(self):
+        self.check_restart('rewrite')
+
+    def test_new_edit_after_undo_drops_redo(self):
+        self.edit_and_close('journal')
+        manager = self.file_manager('journal')
+        manager.open_file('a')
+        manager.undo()
+        manager.document.append_line('other')
+        manager.close_all()
+        manager = self.file_manager('journal')
+        manager.open_file('a')
+        self.assertEqual(manager.document.get_lines(), ['line0', 'line1', 'line2', 'other'])
+        self.assertFalse(manager.undo_history.can_redo())
+        manager.undo()
+        self.assertEqual(manager.document.get_lines(), ['line0', 'line1', 'line2'])
+
+    def test_history_is_dropped_when_file_changes_outside(self):
+        self.edit_and_close('journal')
+        with open(self.path('a.txt'), 'a', encoding='utf-8') as f:
+            f.write('external\n')
+        manager = self.file_manager('journal')
+        manager.open_file('a')
+        self.assertFalse(manager.undo_history.can_undo())
+        self.assertFalse(manager.undo_history.can_redo())
+
+
+if __name__ == '__main__':
+    unittest.main()
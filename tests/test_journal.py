@@ -0,0 +1,52 @@
+import os
+import unittest
+
+import support
+from core.journal import journal_path_for
+
+
+class JournalReplayTest(support.TempDirTestCase):
+    def test_unsaved_edits_are_replayed_after_crash(self):
+        manager = self.file_manager('journal')
+        manager.create_file('a')
+        for i in range(3):
+            manager.document.append_line(f'line{i}')
+        manager.document.set_line(1, 'changed')
+        manager.sync()
+        path = manager.current_file
+        self.assertTrue(os.path.exists(journal_path_for(path)))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'')
+
+        # 不关闭第一个管理器，模拟程序崩溃后重新打开
+        reopened = self.file_manager('journal')
+        reopened.open_file('a')
+        self.assertEqual(reopened.document.get_lines(), ['line0', 'changed', 'line2'])
+        self.assertTrue(reopened.document.dirty)
+
+    def test_truncated_last_record_is_ignored(self):
+        manager = self.file_manager('journal')
+        manager.create_file('a')
+        manager.document.append_line('kept')
+        manager.sync()
+        with open(journal_path_for(manager.current_file), 'a', encoding='utf-8') as f:
+            f.write('{"s": 1, "c": 0, "l": ["half')
+        reopened = self.file_manager('journal')
+        reopened.open_file('a')
+        self.assertEqual(reopened.document.get_lines(), ['kept'])
+
+    def test_stale_journal_is_not_replayed(self):
+        manager = self.file_manager('journal')
+        manager.create_file('a')
+        manager.document.append_line('from journal')
+        manager.sync()
+        # 文件在外部被修改后日志作废
+        with open(manager.current_file, 'w', encoding='utf-8') as f:
+            f.write('external\n')
+        reopened = self.file_manager('journal')
+        reopened.open_file('a')
+        self.assertEqual(reopened.document.get_lines(), ['external'])
+
+
+if __name__ == '__main__':
+    unittest.main()
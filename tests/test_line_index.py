@@ -0,0 +1,56 @@
+import os
+import random
+import unittest
+from array import array
+
+import support
+from core.line_index import LineIndex, NEWLINE_LENGTH
+
+
+class LineIndexTest(support.TempDirTestCase):
+    def assert_consistent(self, index, lengths):
+        """增量维护的块起点与从头重建的一致"""
+        rebuilt = LineIndex(lengths)
+        self.assertEqual(list(index._lengths), lengths)
+        self.assertEqual(list(index._block_starts), list(rebuilt._block_starts))
+        self.assertEqual(index.total_bytes, sum(lengths))
+
+    def test_replace_matches_rebuild(self):
+        rng = random.Random(2)
+        block = LineIndex.BLOCK_SIZE
+        lengths = [rng.randrange(1, 100) for _ in range(5 * block + 17)]
+        index = LineIndex(lengths)
+        for _ in range(300):
+            start = rng.randrange(len(lengths) + 1)
+            # 既有块内的小改动，也有跨越多个块、行数变化超过一块的改动
+            count = rng.choice((0, 1, 3, block - 1, block + 5, 2 * block))
+            new = [rng.randrange(1, 100) for _ in range(rng.choice((0, 1, 2, block, 2 * block + 3)))]
+            index.replace(start, count, new)
+            lengths[start:start + count] = new
+            self.assert_consistent(index, lengths)
+
+    def test_line_start(self):
+        lengths = [3, 5, 7] * 1000
+        index = LineIndex(lengths)
+        for line_number in (0, 1, 1023, 1024, 1025, 2999):
+            self.assertEqual(index.line_start(line_number), sum(lengths[:line_number]))
+
+    def test_build_counts_missing_final_newline(self):
+        path = self.write_bytes('a.txt', b'ab\r\ncd\nlast')
+        index = LineIndex.build(path)
+        self.assertEqual(list(index._lengths), [4, 3, 4 + NEWLINE_LENGTH])
+        self.assertEqual(index.total_bytes, os.path.getsize(path) + NEWLINE_LENGTH)
+
+    def test_write_lengths_round_trip(self):
+        index = LineIndex([1, 2, 3] * 600)
+        with open(self.path('lengths'), 'wb') as f:
+            index.write_lengths(f)
+        lengths = array('Q')
+        with open(self.path('lengths'), 'rb') as f:
+            lengths.fromfile(f, index.line_count)
+        restored = LineIndex.from_lengths(lengths)
+        self.assertEqual(list(restored._block_starts), list(index._block_starts))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import unittest
+from unittest import mock
+
+import support
+from core import novel_project
+from core.document import Document
+from core.novel_project import (ProjectLines, ProjectWriteJob, create_project,
+                                create_project_from, read_manifest)
+
+
+def write(path, document):
+    job = ProjectWriteJob(path, document.snapshot(), document.edit_count)
+    job.run()
+    job.replace()
+    return job
+
+
+class ProjectWriteJobTest(support.TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(novel_project, 'CHUNK_LINES', 5)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.project = self.path('book.novel')
+
+    def open(self):
+        document = Document(ProjectLines.load(self.project))
+        self.addCleanup(document.close)
+        return document
+
+    def chunks(self):
+        return [(chunk['lines'], chunk['title']) for chunk in read_manifest(self.project)['chunks']]
+
+    def test_chapters_start_new_chunks(self):
+        lines = ['序'] + [f'第{n}章 标题' if i == 0 else f'{n}.{i}' for n in (1, 2) for i in range(7)]
+        create_project_from(Document(lines), self.project)
+        self.assertEqual(self.chunks(), [(1, ''), (5, '第1章 标题'), (2, ''), (5, '第2章 标题'), (2, '')])
+        self.assertEqual(self.open().get_lines(), lines)
+
+    def test_edit_rewrites_only_touched_chunks(self):
+        create_project_from(Document([f'line{i}' for i in range(20)]), self.project)
+        before = read_manifest(self.project)['chunks']
+        document = self.open()
+        document.set_line(7, 'changed')
+        write(self.project, document)
+        after = read_manifest(self.project)['chunks']
+        self.assertEqual([chunk['file'] for chunk in after[:1] + after[2:]],
+                         [chunk['file'] for chunk in before[:1] + before[2:]])
+        self.assertNotEqual(after[1]['file'], before[1]['file'])
+        self.assertFalse(os.path.exists(os.path.join(self.project, before[1]['file'])))
+        self.assertEqual(self.open().get_line(7), 'changed')
+
+    def test_appends_fill_the_last_chunk(self):
+        create_project(self.project)
+        expected = []
+        for i in range(12):
+            document = self.open()
+            line = '第二章' if i == 8 else f'line{i}'
+            document.append_line(line)
+            expected.append(line)
+            write(self.project, document)
+        self.assertEqual(self.chunks(), [(5, ''), (3, ''), (4, '第二章')])
+        self.assertEqual(self.open().get_lines(), expected)
+        chunk_files = sorted(name for name in os.listdir(self.project) if name.endswith('.txt'))
+        self.assertEqual(len(chunk_files), 3)
+
+    def test_saving_again_keeps_the_layout(self):
+        create_project_from(Document([f'line{i}' for i in range(13)]), self.project)
+        document = self.open()
+        document.delete_line(2)
+        write(self.project, document)
+        layout = read_manifest(self.project)['chunks']
+        document = self.open()
+        document.set_line(0, 'line0')  # 内容不变，但会产生一次编辑
+        write(self.project, document)
+        self.assertEqual([chunk['lines'] for chunk in read_manifest(self.project)['chunks']],
+                         [chunk['lines'] for chunk in layout])
+
+    def test_discard_removes_new_chunks(self):
+        create_project_from(Document(['a', 'b']), self.project)
+        names = sorted(os.listdir(self.project))
+        document = self.open()
+        document.append_line('c')
+        job = ProjectWriteJob(self.project, document.snapshot(), document.edit_count)
+        job.run()
+        job.discard()
+        self.assertEqual(sorted(os.listdir(self.project)), names)
+        self.assertEqual(self.open().get_lines(), ['a', 'b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+
+import support
+from core.save_scheduler import SaveScheduler
+
+
+class SaveSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        support.qt_app()
+        self.writes = 0
+
+    def writer(self):
+        self.writes += 1
+
+    def make(self, **kwargs):
+        scheduler = SaveScheduler(self.writer, **kwargs)
+        self.addCleanup(scheduler.cancel)
+        return scheduler
+
+    def test_quiet_period_coalesces_edits(self):
+        scheduler = self.make(quiet_ms=30, max_delay_ms=10000)
+        for _ in range(5):
+            scheduler.mark_dirty()
+        self.assertTrue(support.wait_until(lambda: self.writes > 0))
+        self.assertEqual(self.writes, 1)
+        self.assertFalse(scheduler.dirty)
+
+    def test_continuous_typing_saves_by_max_delay(self):
+        scheduler = self.make(quiet_ms=200, max_delay_ms=50)
+        # 每次编辑都重新开始安静期计时，只有最长延迟能触发保存
+        self.assertTrue(support.wait_until(lambda: scheduler.mark_dirty() or self.writes > 0, 1000))
+        self.assertEqual(self.writes, 1)
+
+    def test_flush_writes_once(self):
+        scheduler = self.make()
+        self.assertFalse(scheduler.flush())
+        scheduler.mark_dirty()
+        self.assertTrue(scheduler.flush())
+        self.assertFalse(scheduler.flush())
+        self.assertEqual(self.writes, 1)
+        self.assertFalse(scheduler.quiet_timer.isActive())
+        self.assertFalse(scheduler.max_delay_timer.isActive())
+
+    def test_reset_and_cancel_drop_dirty_flag(self):
+        scheduler = self.make()
+        for method in (scheduler.reset, scheduler.cancel):
+            scheduler.mark_dirty()
+            method()
+            self.assertFalse(scheduler.dirty)
+            self.assertFalse(scheduler.flush())
+        self.assertEqual(self.writes, 0)
+
+    def test_failed_write_stays_dirty(self):
+        errors = []
+
+        def failing_writer():
+            raise OSError('disk full')
+
+        scheduler = SaveScheduler(failing_writer, quiet_ms=10, error_handler=errors.append)
+        self.addCleanup(scheduler.cancel)
+        scheduler.mark_dirty()
+        with self.assertRaises(OSError):
+            scheduler.flush()
+        self.assertTrue(scheduler.dirty)
+        scheduler.mark_dirty()
+        self.assertTrue(support.wait_until(lambda: errors))
+        self.assertIsInstance(errors[0], OSError)
+        self.assertTrue(scheduler.dirty)
+
+
+if __name__ == '__main__':
+    unittest.main()
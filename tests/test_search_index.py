@@ -0,0 +1,119 @@
+import os
+import random
+import shutil
+import unittest
+from unittest import mock
+
+import support
+from core import search_index
+from core.disk_io import InlineExecutor
+from core.search_index import SearchIndex
+
+
+class RecordingExecutor(InlineExecutor):
+    """记录正在执行的请求名的内联执行器"""
+
+    def __init__(self):
+        super().__init__()
+        self.running = None
+
+    def submit(self, name, fn, *args, callback=None):
+        self.running = name
+        try:
+            return super().submit(name, fn, *args, callback=callback)
+        finally:
+            self.running = None
+
+
+class SearchIndexTest(support.TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(search_index, 'BLOCK_BYTES', 256)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.rng = random.Random(3)
+        self.lines = [self.random_line() for _ in range(400)]
+        self.novel = self.path('a.txt')
+        self.write_novel()
+        self.index = SearchIndex(self.dir)
+        self.addCleanup(self.index.close)
+        self.index.sync()
+
+    def random_line(self):
+        return ''.join(self.rng.choice('天地玄黄宇宙洪荒日月盈昃ab') for _ in range(self.rng.randrange(30)))
+
+    def write_novel(self):
+        with open(self.novel, 'w', encoding='utf-8', newline='\n') as f:
+            f.write(''.join(line + '\n' for line in self.lines))
+        # 保证修改时间变化，索引能发现文件已更新
+        stat = os.stat(self.novel)
+        os.utime(self.novel, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+
+    def hits(self, index, query):
+        return sorted((hit.line_number, hit.text) for hit in index.search(query, limit=10 ** 6))
+
+    def expected_hits(self, query):
+        return [(number, line) for number, line in enumerate(self.lines) if query in line]
+
+    def test_search_finds_every_line(self):
+        for query in ('天地', '黄', 'ab', '洪荒日'):
+            self.assertEqual(self.hits(self.index, query), self.expected_hits(query))
+
+    def test_incremental_update_matches_full_index(self):
+        for step in range(60):
+            position = self.rng.randrange(len(self.lines))
+            if step % 3 == 0:
+                self.lines.insert(position, self.random_line())
+            elif step % 3 == 1:
+                del self.lines[position:position + self.rng.randrange(1, 5)]
+            else:
+                self.lines[position] = self.random_line()
+            self.write_novel()
+            self.index.refresh_file(self.novel)
+            for query in ('天地', '宇宙', 'b'):
+                self.assertEqual(self.hits(self.index, query), self.expected_hits(query))
+        # 与从头建立的索引比较
+        fresh_dir = self.path('fresh')
+        os.makedirs(fresh_dir)
+        shutil.copy(self.novel, fresh_dir)
+        fresh = SearchIndex(fresh_dir)
+        self.addCleanup(fresh.close)
+        fresh.sync()
+        for query in ('玄黄', '月', 'a'):
+            self.assertEqual(self.hits(self.index, query), self.hits(fresh, query))
+
+    def test_unchanged_blocks_are_not_tokenized_again(self):
+        self.lines.append('新的一行')
+        self.write_novel()
+        with mock.patch.object(search_index, 'bigram_codes', wraps=search_index.bigram_codes) as codes:
+            self.index.refresh_file(self.novel)
+        block_count = self.index.files['a.txt']['blocks']
+        self.assertLessEqual(codes.call_count, 2)
+        self.assertGreater(block_count, 10)
+        self.assertEqual(self.hits(self.index, '新的'), [(len(self.lines) - 1, '新的一行')])
+
+    def test_index_survives_reload(self):
+        reloaded = SearchIndex(self.dir)
+        self.addCleanup(reloaded.close)
+        self.assertTrue(reloaded.load())
+        self.assertEqual(self.hits(reloaded, '天地'), self.expected_hits('天地'))
+
+    def test_search_reads_files_in_io_requests(self):
+        io = RecordingExecutor()
+        index = SearchIndex(self.dir, io)
+        self.addCleanup(index.close)
+        index.load()
+        opened = []
+
+        def mapped_file(path):
+            opened.append(io.running)
+            return real_mapped_file(path)
+
+        real_mapped_file = search_index.MappedFile
+        with mock.patch.object(search_index, 'MappedFile', side_effect=mapped_file):
+            self.assertEqual(self.hits(index, '天地'), self.expected_hits('天地'))
+        self.assertEqual(opened, ['index_read'])
+
+
+if __name__ == '__main__':
+    unittest.main()
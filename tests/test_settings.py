@@ -0,0 +1,66 @@
+import unittest
+from unittest import mock
+
+import support
+from PyQt5.QtCore import QSettings
+from core import settings
+from core.settings import Settings
+
+
+class SettingsTest(support.TempDirTestCase):
+    """设置写入临时目录中的 ini 文件，不影响本机的真实设置"""
+
+    def setUp(self):
+        super().setUp()
+        support.qt_app()
+        self.ini_path = self.path('settings.ini')
+        patcher = mock.patch.object(settings, 'QSettings',
+                                    lambda *args: QSettings(self.ini_path, QSettings.IniFormat))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stored(self, key):
+        return QSettings(self.ini_path, QSettings.IniFormat).value(key)
+
+    def make(self, write_delay_ms=60000):
+        instance = Settings(write_delay_ms)
+        self.addCleanup(instance.flush)
+        return instance
+
+    def test_defaults(self):
+        instance = self.make()
+        self.assertEqual(instance.load_storage_mode(), 'journal')
+        self.assertEqual(instance.get('undo_memory_limit'), 32)
+        self.assertEqual(instance.get('shortcuts/save'), 'Ctrl+S')
+
+    def test_set_updates_memory_and_defers_write(self):
+        instance = self.make()
+        changes = []
+        instance.changed.connect(lambda key, value: changes.append((key, value)))
+        instance.save_storage_mode('rewrite')
+        instance.save_storage_mode('rewrite')
+        self.assertEqual(instance.load_storage_mode(), 'rewrite')
+        self.assertEqual(changes, [('storage_mode', 'rewrite')])
+        self.assertTrue(instance.write_timer.isActive())
+        self.assertIsNone(self.stored('storage_mode'))
+        instance.flush()
+        self.assertFalse(instance.write_timer.isActive())
+        self.assertEqual(self.stored('storage_mode'), 'rewrite')
+
+    def test_write_timer_flushes(self):
+        instance = self.make(write_delay_ms=10)
+        instance.set('console_scrollback', 100)
+        self.assertTrue(support.wait_until(lambda: self.stored('console_scrollback') is not None))
+
+    def test_values_are_read_back_with_their_types(self):
+        instance = self.make()
+        instance.set('undo_memory_limit', 8)
+        instance.set('show_status', False)
+        instance.flush()
+        reloaded = self.make()
+        self.assertEqual(reloaded.get('undo_memory_limit'), 8)
+        self.assertIs(reloaded.get('show_status'), False)
+
+
+if __name__ == '__main__':
+    unittest.main()
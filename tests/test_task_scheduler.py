@@ -0,0 +1,96 @@
+import unittest
+from unittest import mock
+
+import support
+from core import task_scheduler
+from core.task_scheduler import TaskScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TaskSchedulerTest(unittest.TestCase):
+    """用假时钟驱动调度器，直接调用定时器的回调模拟一次唤醒"""
+
+    def setUp(self):
+        support.qt_app()
+        self.clock = FakeClock()
+        patcher = mock.patch.object(task_scheduler.time, 'monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.scheduler = TaskScheduler(slack_ms=20, idle_slack_ms=1000)
+        self.addCleanup(self.scheduler.cancel_all)
+        self.calls = []
+
+    def callback(self, name):
+        return lambda: self.calls.append(name)
+
+    def wake_at(self, offset):
+        self.clock.now = 100.0 + offset
+        self.scheduler._on_timeout()
+
+    def test_one_shot_runs_once(self):
+        self.scheduler.call_later('a', 100, self.callback('a'))
+        self.assertTrue(self.scheduler.timer.isActive())
+        self.wake_at(0.05)
+        self.assertEqual(self.calls, [])
+        self.wake_at(0.1)
+        self.wake_at(0.2)
+        self.assertEqual(self.calls, ['a'])
+        self.assertFalse(self.scheduler.is_scheduled('a'))
+        self.assertFalse(self.scheduler.timer.isActive())
+
+    def test_call_later_again_restarts_the_delay(self):
+        self.scheduler.call_later('a', 100, self.callback('a'))
+        self.clock.now = 100.08
+        self.scheduler.call_later('a', 100, self.callback('a'))
+        self.wake_at(0.1)
+        self.assertEqual(self.calls, [])
+        self.wake_at(0.18)
+        self.assertEqual(self.calls, ['a'])
+
+    def test_tasks_within_slack_share_a_wakeup(self):
+        self.scheduler.call_later('a', 100, self.callback('a'))
+        self.scheduler.call_later('b', 110, self.callback('b'))
+        self.scheduler.call_later('c', 500, self.callback('c'))
+        self.wake_at(0.1)
+        self.assertEqual(self.calls, ['a', 'b'])
+        self.assertEqual(self.scheduler.wakeups_per_minute(), 1)
+
+    def test_repeating_task_and_cancel(self):
+        self.scheduler.call_repeating('tick', 100, self.callback('tick'))
+        for i in range(1, 4):
+            self.wake_at(0.1 * i)
+        self.assertEqual(self.scheduler.run_counts['tick'], 3)
+        self.scheduler.cancel('tick')
+        self.wake_at(1.0)
+        self.assertEqual(self.scheduler.run_counts['tick'], 3)
+        self.assertFalse(self.scheduler.timer.isActive())
+
+    def test_power_save_uses_idle_interval_or_pauses(self):
+        self.scheduler.call_repeating('slow', 100, self.callback('slow'), idle_interval_ms=2000)
+        self.scheduler.call_repeating('paused', 100, self.callback('paused'))
+        self.scheduler.set_power_save(True)
+        self.wake_at(0.1)
+        self.assertEqual(self.calls, [])
+        self.wake_at(2.0)
+        self.assertEqual(self.calls, ['slow'])
+        self.scheduler.set_power_save(False)
+        self.wake_at(2.1)
+        self.assertEqual(sorted(self.calls), ['paused', 'slow', 'slow'])
+
+    def test_callback_may_cancel_a_later_task(self):
+        self.scheduler.call_later('a', 100, lambda: self.scheduler.cancel('b'))
+        self.scheduler.call_later('b', 100, self.callback('b'))
+        self.wake_at(0.1)
+        self.assertEqual(self.calls, [])
+        self.assertEqual(self.scheduler.run_counts, {'a': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
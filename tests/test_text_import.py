@@ -0,0 +1,89 @@
+import codecs
+import os
+import unittest
+
+import support
+from core.line_index import LineIndex
+from core.text_import import SAMPLE_BYTES, detect_encoding, import_text
+
+TEXT = '第一章 开始\r\n他说：“hello”。\n\n最后一行'
+LINES = ['第一章 开始', '他说：“hello”。', '', '最后一行']
+
+
+class DetectEncodingTest(unittest.TestCase):
+    def test_boms(self):
+        self.assertEqual(detect_encoding(codecs.BOM_UTF8 + b'abc'), 'utf-8-sig')
+        self.assertEqual(detect_encoding(codecs.BOM_UTF16_LE + 'ab'.encode('utf-16-le')), 'utf-16')
+        self.assertEqual(detect_encoding(codecs.BOM_UTF16_BE + 'ab'.encode('utf-16-be')), 'utf-16')
+
+    def test_utf16_without_bom(self):
+        sample = '他说：hello world.\r\n' * 20
+        self.assertEqual(detect_encoding(sample.encode('utf-16-le')), 'utf-16-le')
+        self.assertEqual(detect_encoding(sample.encode('utf-16-be')), 'utf-16-be')
+
+    def test_utf16_chinese_prose_without_bom(self):
+        # “一”“丁”等汉字的零字节与 ASCII 字符的落在不同一侧
+        paragraph = ('第一章 一丁七万丈三上下不与丐丑专且世丘丙业丛东丝丞丢两严丧个丫中丰串临丸丹为主丽举。'
+                     '他一个人在山上住了一万年，一天下午，一只鸟飞过一片竹林，不见了。\r\n')
+        text = paragraph * 200
+        for encoding in ('utf-16-le', 'utf-16-be'):
+            with self.subTest(encoding=encoding):
+                sample = text.encode(encoding)[:SAMPLE_BYTES]
+                self.assertEqual(detect_encoding(sample), encoding)
+                self.assertEqual(detect_encoding(sample[:-1]), encoding)
+
+    def test_utf8_and_gbk(self):
+        self.assertEqual(detect_encoding(TEXT.encode('utf-8')), 'utf-8')
+        self.assertEqual(detect_encoding(TEXT.encode('gbk')), 'gb18030')
+
+    def test_truncated_utf8_sample_is_still_utf8(self):
+        self.assertEqual(detect_encoding(TEXT.encode('utf-8')[:2]), 'utf-8')
+
+
+class ImportTextTest(support.TempDirTestCase):
+    def import_bytes(self, data, encoding=None, chunk_size=7):
+        source = self.write_bytes('source.txt', data)
+        return import_text(source, self.path('target.txt'), encoding, chunk_size)
+
+    def read_target(self):
+        with open(self.path('target.txt'), 'r', encoding='utf-8', newline=None) as f:
+            return f.read().split('\n')[:-1]
+
+    def test_encodings_are_converted_to_utf8(self):
+        for encoding, data in (('utf-8', TEXT.encode('utf-8')),
+                               ('gb18030', TEXT.encode('gbk')),
+                               ('utf-16', TEXT.encode('utf-16')),
+                               ('utf-8-sig', codecs.BOM_UTF8 + TEXT.encode('utf-8'))):
+            with self.subTest(encoding=encoding):
+                result = self.import_bytes(data)
+                self.assertEqual(result.encoding, encoding)
+                self.assertEqual(self.read_target(), LINES)
+
+    def test_line_index_matches_written_file(self):
+        result = self.import_bytes(TEXT.encode('gbk'))
+        built = LineIndex.build(self.path('target.txt'))
+        self.assertEqual(list(result.index._lengths), list(built._lengths))
+        self.assertEqual(result.bytes_written, os.path.getsize(self.path('target.txt')))
+
+    def test_gbk_after_ascii_sample_falls_back_to_gb18030(self):
+        data = b'ascii line\n' * 1000 + '后面是中文\n'.encode('gbk')
+        result = self.import_bytes(data, chunk_size=4096)
+        self.assertEqual(result.encoding, 'gb18030')
+        lines = self.read_target()
+        self.assertEqual(lines[-1], '后面是中文')
+        self.assertNotIn('�', ''.join(lines))
+
+    def test_undecodable_file_is_not_written(self):
+        data = b'ascii line\n' * 1000 + b'\x80\xff\n'
+        with self.assertRaises(ValueError):
+            self.import_bytes(data)
+        self.assertEqual(os.listdir(self.dir), ['source.txt'])
+
+    def test_explicit_encoding_is_not_guessed_again(self):
+        with self.assertRaises(ValueError):
+            self.import_bytes(TEXT.encode('gbk'), encoding='utf-8')
+        self.assertFalse(os.path.exists(self.path('target.txt')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import random
+import unittest
+
+import support
+from core.document import Document
+from core.line_index import LineIndex
+from core.text_stats import TextStats, count_line, stats_path_for
+
+
+class TextStatsTest(support.TempDirTestCase):
+    def test_count_line(self):
+        self.assertEqual(count_line('第一章 Hello, world!'), (15, 5))
+        self.assertEqual(count_line('   '), (0, 0))
+
+    def test_record_matches_rebuild(self):
+        rng = random.Random(2)
+        document = Document([f'第{i}行 word{i}' for i in range(30)])
+        stats = TextStats.build(document.get_lines())
+        document.add_listener(stats.record)
+        for step in range(300):
+            start = rng.randrange(document.line_count + 1)
+            count = rng.randrange(3)
+            document.replace_lines(start, count, ['新 new'] * rng.randrange(3))
+        expected = TextStats.build(document.get_lines())
+        self.assertEqual((stats.chars, stats.words, stats.line_count),
+                         (expected.chars, expected.words, expected.line_count))
+
+    def test_sidecar_round_trip_with_line_lengths(self):
+        lines = ['第一行', 'second line', '']
+        path = self.write_bytes('a.txt', '\n'.join(lines).encode('utf-8') + b'\n')
+        index = LineIndex.build(path)
+        TextStats.build(lines).save(path, index)
+        loaded = TextStats.load(path)
+        self.assertEqual((loaded.chars, loaded.words), (13, 5))
+        self.assertEqual(loaded.line_index.total_bytes, index.total_bytes)
+
+        with open(path, 'ab') as f:
+            f.write(b'more\n')
+        self.assertIsNone(TextStats.load(path))
+
+    def test_new_files_are_counted(self):
+        for name in ('a.txt', 'b.novel', 'c.txz'):
+            with self.subTest(name=name):
+                manager = self.file_manager()
+                manager.create_file(name)
+                manager.document.append_line('你好 world')
+                manager.document.append_line('再见')
+                self.assertEqual((manager.text_stats.chars, manager.text_stats.words), (9, 5))
+                manager.document.delete_line(1)
+                self.assertEqual(manager.text_stats.line_count, 1)
+                self.assertEqual(manager.session.chars, 7)
+                manager.save_document()
+                manager.close_all()
+                self.assertTrue(os.path.exists(stats_path_for(self.path(name))))
+
+                reopened = self.file_manager()
+                reopened.open_file(name)
+                self.assertEqual((reopened.text_stats.chars, reopened.text_stats.words), (7, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+from unittest import mock
+
+import support  # noqa: F401  把 src 加入导入路径
+from core import undo
+from core.document import Document
+from core.undo import UndoHistory
+
+
+class UndoHistoryTest(unittest.TestCase):
+    def make(self, lines, **kwargs):
+        document = Document(list(lines))
+        history = UndoHistory(**kwargs)
+        document.add_listener(history.record)
+        return document, history
+
+    def test_undo_and_redo_restore_each_state(self):
+        document, history = self.make(['a', 'b', 'c'])
+        states = [document.get_lines()]
+        document.set_line(1, 'B')
+        states.append(document.get_lines())
+        document.insert_line(0, 'first')
+        states.append(document.get_lines())
+        document.delete_line(3)
+        states.append(document.get_lines())
+        for state in reversed(states[:-1]):
+            self.assertIsNotNone(history.undo(document))
+            self.assertEqual(document.get_lines(), state)
+        self.assertIsNone(history.undo(document))
+        for state in states[1:]:
+            self.assertIsNotNone(history.redo(document))
+            self.assertEqual(document.get_lines(), state)
+        self.assertIsNone(history.redo(document))
+
+    def test_applying_a_delta_is_not_recorded(self):
+        document, history = self.make(['a'])
+        document.append_line('b')
+        history.undo(document)
+        self.assertFalse(history.can_undo())
+        self.assertTrue(history.can_redo())
+
+    def test_new_edit_drops_redo(self):
+        document, history = self.make(['a'])
+        document.append_line('b')
+        history.undo(document)
+        document.append_line('c')
+        self.assertFalse(history.can_redo())
+        history.undo(document)
+        self.assertEqual(document.get_lines(), ['a'])
+
+    def test_typing_merges_within_interval(self):
+        document, history = self.make(['x'], merge_interval=60)
+        for text in ('xa', 'xab', 'xabc'):
+            history.merge_next = True
+            document.set_line(0, text)
+        history.undo(document)
+        self.assertEqual(document.get_lines(), ['x'])
+        self.assertFalse(history.can_undo())
+
+    def test_edits_are_not_merged_after_interval(self):
+        document, history = self.make(['x'], merge_interval=1.0)
+        with mock.patch.object(undo.time, 'monotonic', side_effect=[0.0, 5.0]):
+            for text in ('xa', 'xab'):
+                history.merge_next = True
+                document.set_line(0, text)
+        history.undo(document)
+        self.assertEqual(document.get_lines(), ['xa'])
+
+    def test_other_lines_are_not_merged(self):
+        document, history = self.make(['x', 'y'], merge_interval=60)
+        history.merge_next = True
+        document.set_line(0, 'x1')
+        history.merge_next = True
+        document.set_line(1, 'y1')
+        history.undo(document)
+        self.assertEqual(document.get_lines(), ['x1', 'y'])
+
+    def test_budget_drops_oldest_but_keeps_latest(self):
+        document, history = self.make([], max_bytes=200)
+        for i in range(10):
+            document.append_line(f'line{i}')
+        self.assertLessEqual(history.total_bytes, 200)
+        count = 0
+        while history.undo(document) is not None:
+            count += 1
+        self.assertLess(count, 10)
+        self.assertEqual(document.get_lines(), [f'line{i}' for i in range(10 - count)])
+
+        document, history = self.make([], max_bytes=1)
+        document.append_line('x' * 100)
+        self.assertTrue(history.can_undo())
+
+
+if __name__ == '__main__':
+    unittest.main()